@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class AuthnConfig(AppConfig):
     name = "authn"
+
+    def ready(self):
+        # register signals here
+        from authn.signals import invalidate_deleted_session  # NOQA
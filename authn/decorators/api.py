@@ -1,14 +1,12 @@
 import functools
-from typing import Optional
 
 from authlib.oauth2 import OAuth2Error
 from authlib.oauth2.rfc6749 import MissingAuthorizationError
 from django.http import JsonResponse, HttpResponse
 
-from authn.models.openid import OAuth2App
 from authn.providers.openid import oauth2_token_validator
+from authn.token_cache import get_app_by_service_token, count_api_request
 from club.exceptions import ApiException, ClubException, ApiAuthRequired
-from users.models.user import User
 
 
 def api(require_auth=True, scopes=None):
@@ -17,22 +15,7 @@ def api(require_auth=True, scopes=None):
         def wrapper(request, *args, **kwargs):
             # check auth if needed
             if require_auth:
-                # requests on behalf of apps (user == owner, for a simplicity)
-                service_token = request.headers.get("X-Service-Token") or request.GET.get("service_token")
-                if service_token:
-                    request.me = user_by_service_token(service_token)
-
-                # oauth requests for API
-                oauth_access_token = request.headers.get("Authorization")
-                if oauth_access_token:
-                    try:
-                        token = oauth2_token_validator.acquire_token(request, scopes)
-                    except MissingAuthorizationError as ex:
-                        raise ApiAuthRequired(title="Missing OAuth token", message=str(ex))
-                    except OAuth2Error as ex:
-                        raise ApiAuthRequired(title="OAuth token error", message=str(ex))
-
-                    request.me = token.user
+                _authenticate(request, scopes)
 
                 # this user can also come from other types of auth (e.g. cookies)
                 if not request.me:
@@ -59,7 +42,9 @@ def api(require_auth=True, scopes=None):
                 )
 
             # return results in expected format
-            if is_ajax(request):  # legacy, change to Content-Type check
+            if isinstance(results, HttpResponse):
+                return results  # e.g. responses with their own headers or 304 Not Modified
+            elif is_ajax(request):  # legacy, change to Content-Type check
                 return JsonResponse(data=results, status=status_code, json_dumps_params=dict(ensure_ascii=False))
             elif isinstance(results, dict):
                 return JsonResponse(data=results, status=status_code, json_dumps_params=dict(ensure_ascii=False))
@@ -76,13 +61,27 @@ def is_ajax(request):
     return bool(request.GET.get("is_ajax"))
 
 
-def user_by_service_token(service_token) -> Optional[User]:
-    app = OAuth2App.objects\
-        .filter(service_token=service_token)\
-        .select_related("owner")\
-        .first()
-
-    if not app:
-        return None  # no such app
-
-    return app.owner
+def _authenticate(request, scopes):
+    """
+    Sets request.me from a service token or an OAuth token (if there's one) and counts the request for its app
+    """
+    # requests on behalf of apps (user == owner, for a simplicity)
+    service_token = request.headers.get("X-Service-Token") or request.GET.get("service_token")
+    if service_token:
+        app = get_app_by_service_token(service_token)
+        if app:
+            request.me = app.owner
+            count_api_request(app.client_id)
+
+    # oauth requests for API
+    oauth_access_token = request.headers.get("Authorization")
+    if oauth_access_token:
+        try:
+            token = oauth2_token_validator.acquire_token(request, scopes)
+        except MissingAuthorizationError as ex:
+            raise ApiAuthRequired(title="Missing OAuth token", message=str(ex))
+        except OAuth2Error as ex:
+            raise ApiAuthRequired(title="OAuth token error", message=str(ex))
+
+        request.me = token.user
+        count_api_request(token.client_id)
@@ -5,6 +5,7 @@ from typing import Optional, Tuple
 from django.shortcuts import redirect, render
 
 from authn.models.session import Session
+from authn.session_cache import get_session
 from club import settings
 from users.models.user import User
 
@@ -31,11 +32,7 @@ def authorized_user_with_session(request) -> Tuple[Optional[User], Optional[Sess
 
 
 def user_by_token(token) -> Tuple[Optional[User], Optional[Session]]:
-    session = Session.objects\
-        .filter(token=token)\
-        .order_by()\
-        .select_related("user")\
-        .first()
+    session = get_session(token)
 
     if not session or session.expires_at <= datetime.utcnow():
         return None, None  # session is expired
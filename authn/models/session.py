@@ -5,6 +5,7 @@ from django.conf import settings
 from django.db import models
 
 from club.exceptions import RateLimitException, InvalidCode
+from common.rate_limits import is_rate_limited
 from users.models.user import User
 from utils.strings import random_string, random_number
 
@@ -51,11 +52,11 @@ class Code(models.Model):
     @classmethod
     def create_for_user(cls, user: User, recipient: str, length=6):
         recipient = recipient.lower()
-        last_codes_count = Code.objects.filter(
-            recipient=recipient,
-            created_at__gte=datetime.utcnow() - settings.AUTH_MAX_CODE_TIMEDELTA,
-        ).count()
-        if last_codes_count >= settings.AUTH_MAX_CODE_COUNT:
+        if is_rate_limited(
+            "auth_code",
+            recipient,
+            db_count=lambda since: Code.objects.filter(recipient=recipient, created_at__gte=since).count(),
+        ):
             raise RateLimitException(title="Вы запросили слишком много кодов", message="Подождите немного")
 
         return Code.objects.create(
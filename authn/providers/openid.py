@@ -4,11 +4,19 @@ from authlib.oidc.core import grants as oidc_grants, UserInfo
 from django.conf import settings
 
 from authn.models.openid import OAuth2Token, OAuth2AuthorizationCode, OAuth2App
+from authn.token_cache import get_oauth_token
 
 server = AuthorizationServer(OAuth2App, OAuth2Token)
 
+
+class CachedBearerTokenValidator(BearerTokenValidator):
+    def authenticate_token(self, token_string):
+        # expiration, revocation and scopes are still checked by the validator for cached tokens
+        return get_oauth_token(token_string)
+
+
 oauth2_token_validator = ResourceProtector()
-oauth2_token_validator.register_token_validator(BearerTokenValidator(OAuth2Token))
+oauth2_token_validator.register_token_validator(CachedBearerTokenValidator(OAuth2Token))
 
 
 class AuthorizationCodeGrant(grants.AuthorizationCodeGrant):
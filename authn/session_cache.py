@@ -0,0 +1,107 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from authn.models.session import Session
+from users.models.user import User
+
+# sessions and their users are cached separately, so user changes invalidate one key for all of their sessions
+SESSION_CACHE_KEY = "session:{token}"
+SESSION_USER_CACHE_KEY = "session:user:{user_id}"
+
+# the hottest sessions are also kept in process memory for a few seconds, other processes
+# can't invalidate it, so logouts and bans reach them only after SESSION_LOCAL_CACHE_TIMEOUT
+_local_sessions = OrderedDict()  # token -> (expires_at, user_id, pickled session with user)
+_local_sessions_lock = threading.Lock()
+
+
+def get_session(token):
+    """
+    Returns Session with its user for the token or None. Takes it from process memory, redis or DB (in this order).
+    """
+    session = _get_local_session(token)
+    if session:
+        return session
+
+    session = cache.get(SESSION_CACHE_KEY.format(token=token))
+    user = cache.get(SESSION_USER_CACHE_KEY.format(user_id=session.user_id)) if session else None
+    if session and user:
+        session.user = user
+    else:
+        session = Session.objects\
+            .filter(token=token)\
+            .order_by()\
+            .select_related("user")\
+            .first()
+
+        if not session:
+            return None
+
+        user = session.user
+        Session._meta.get_field("user").delete_cached_value(session)
+        cache.set_many({
+            SESSION_CACHE_KEY.format(token=token): session,
+            SESSION_USER_CACHE_KEY.format(user_id=user.id): user,
+        }, settings.SESSION_CACHE_TIMEOUT)
+        session.user = user
+
+    _set_local_session(token, session)
+    return session
+
+
+def get_session_user(user_id):
+    """
+    The same cached user for other kinds of auth (service and oauth tokens)
+    """
+    user = cache.get(SESSION_USER_CACHE_KEY.format(user_id=user_id))
+    if not user:
+        user = User.objects.filter(id=user_id).first()
+        if user:
+            cache.set(SESSION_USER_CACHE_KEY.format(user_id=user_id), user, settings.SESSION_CACHE_TIMEOUT)
+    return user
+
+
+def invalidate_session(token):
+    cache.delete(SESSION_CACHE_KEY.format(token=token))
+    with _local_sessions_lock:
+        _local_sessions.pop(token, None)
+
+
+def invalidate_session_user(user_id):
+    cache.delete(SESSION_USER_CACHE_KEY.format(user_id=user_id))
+    with _local_sessions_lock:
+        for token, (_, session_user_id, _) in list(_local_sessions.items()):
+            if session_user_id == user_id:
+                del _local_sessions[token]
+
+
+def _get_local_session(token):
+    with _local_sessions_lock:
+        cached = _local_sessions.get(token)
+        if not cached:
+            return None
+
+        expires_at, _, pickled_session = cached
+        if expires_at < time.monotonic():
+            del _local_sessions[token]
+            return None
+
+        _local_sessions.move_to_end(token)
+
+    # every request gets its own copy, views are free to modify request.me
+    return pickle.loads(pickled_session)
+
+
+def _set_local_session(token, session):
+    pickled_session = pickle.dumps(session)
+    with _local_sessions_lock:
+        _local_sessions[token] = (
+            time.monotonic() + settings.SESSION_LOCAL_CACHE_TIMEOUT, session.user_id, pickled_session
+        )
+        _local_sessions.move_to_end(token)
+        while len(_local_sessions) > settings.SESSION_LOCAL_CACHE_SIZE:
+            _local_sessions.popitem(last=False)
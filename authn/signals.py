@@ -0,0 +1,35 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from authn.models.openid import OAuth2App, OAuth2Token
+from authn.models.session import Session
+from authn.session_cache import invalidate_session, invalidate_session_user
+from authn.token_cache import invalidate_service_token, invalidate_oauth_token
+from users.models.user import User
+
+
+@receiver(post_delete, sender=Session)
+def invalidate_deleted_session(sender, instance, **kwargs):
+    # logouts, bans and account deletions
+    invalidate_session(instance.token)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_sessions(sender, instance, created, **kwargs):
+    # profile edits, bans, membership changes and gdpr cleanups all save the user
+    if not created:
+        invalidate_session_user(instance.id)
+
+
+@receiver(post_save, sender=OAuth2Token)
+@receiver(post_delete, sender=OAuth2Token)
+def invalidate_changed_oauth_token(sender, instance, **kwargs):
+    # revoked by openid_revoke_token or refresh, deleted with its app or user
+    invalidate_oauth_token(instance.access_token)
+
+
+@receiver(post_save, sender=OAuth2App)
+@receiver(post_delete, sender=OAuth2App)
+def invalidate_changed_app(sender, instance, **kwargs):
+    if instance.service_token:
+        invalidate_service_token(instance.service_token)
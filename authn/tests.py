@@ -1,12 +1,18 @@
+import time
 from datetime import datetime, timedelta
+from unittest import mock
 
 import django
 from django.conf import settings
+from django.core.cache import cache
 from django.test import TestCase
 
 django.setup()  # todo: how to run tests from PyCharm without this workaround?
 
-from authn.models.session import Code
+from authn.models.openid import OAuth2App
+from authn.models.session import Code, Session
+from authn.session_cache import get_session
+from authn.token_cache import get_app_by_service_token
 from club.exceptions import RateLimitException, InvalidCode
 from users.models.user import User
 
@@ -21,6 +27,9 @@ class ModelCodeTests(TestCase):
             membership_expires_at=datetime.now() + timedelta(days=5),
         )
 
+    def setUp(self):
+        cache.clear()  # rate limit windows live in redis
+
     def test_create_code_positive(self):
         recipient = "success@a.com"
 
@@ -33,8 +42,8 @@ class ModelCodeTests(TestCase):
     def test_create_code_ratelimit(self):
         recipient = "ratelimit@a.com"
 
-        # override the AUTH_MAX_CODE_TIMEDELTA setting
-        with self.settings(AUTH_MAX_CODE_COUNT=1):
+        # override the auth_code rate limit
+        with self.settings(RATE_LIMITS={**settings.RATE_LIMITS, "auth_code": (1, timedelta(hours=3))}):
             code = Code.create_for_user(user=self.new_user, recipient=recipient, length=settings.AUTH_CODE_LENGTH)
             self.assertEqual(len(code.code), settings.AUTH_CODE_LENGTH)
 
@@ -45,17 +54,16 @@ class ModelCodeTests(TestCase):
     def test_create_code_reset_ratelimit(self):
         recipient = "ratelimit@a.com"
 
-        with self.settings(AUTH_MAX_CODE_COUNT=1):
+        with self.settings(RATE_LIMITS={**settings.RATE_LIMITS, "auth_code": (1, timedelta(hours=3))}):
             code = Code.create_for_user(user=self.new_user, recipient=recipient, length=settings.AUTH_CODE_LENGTH)
             self.assertEqual(len(code.code), settings.AUTH_CODE_LENGTH)
 
-            # move creation time to deep enough past
-            code.created_at = datetime.utcnow() - settings.AUTH_MAX_CODE_TIMEDELTA - timedelta(seconds=1)
-            code.save()
-
-            # no exception raises
-            code = Code.create_for_user(user=self.new_user, recipient=recipient)
-            self.assertEqual(len(code.code), settings.AUTH_CODE_LENGTH)
+            # move to the future when the first code has left the window
+            future = time.time() + timedelta(hours=3, seconds=1).total_seconds()
+            with mock.patch("common.rate_limits.time.time", return_value=future):
+                # no exception raises
+                code = Code.create_for_user(user=self.new_user, recipient=recipient)
+                self.assertEqual(len(code.code), settings.AUTH_CODE_LENGTH)
 
     def test_check_code_positive(self):
         recipient = "success@a.com"
@@ -123,3 +131,61 @@ class ModelCodeTests(TestCase):
 
         with self.assertRaises(InvalidCode):
             Code.check_code(recipient=recipient, code=code.code)
+
+
+class SessionCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(
+            email="sessioncache@xx.com",
+            membership_started_at=datetime.now() - timedelta(days=5),
+            membership_expires_at=datetime.now() + timedelta(days=5),
+        )
+        self.session = Session.create_for_user(self.user)
+
+    def test_session_is_cached(self):
+        self.assertEqual(get_session(self.session.token).user.id, self.user.id)
+
+        with self.assertNumQueries(0):
+            session = get_session(self.session.token)
+            self.assertEqual(session.user.email, self.user.email)
+
+    def test_user_changes_invalidate_cache(self):
+        get_session(self.session.token)
+
+        self.user.full_name = "New Name"
+        self.user.save()
+
+        self.assertEqual(get_session(self.session.token).user.full_name, "New Name")
+
+    def test_deleted_session_is_not_returned(self):
+        get_session(self.session.token)
+
+        Session.objects.filter(token=self.session.token).delete()
+
+        self.assertIsNone(get_session(self.session.token))
+
+
+class ServiceTokenCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(
+            email="servicetoken@xx.com",
+            membership_started_at=datetime.now() - timedelta(days=5),
+            membership_expires_at=datetime.now() + timedelta(days=5),
+        )
+        self.app = OAuth2App.objects.create(name="Test App", owner=self.user)
+
+    def test_service_token_is_cached(self):
+        self.assertEqual(get_app_by_service_token(self.app.service_token).owner.id, self.user.id)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_app_by_service_token(self.app.service_token).owner.id, self.user.id)
+
+    def test_deleted_app_token_is_not_valid(self):
+        service_token = self.app.service_token
+        get_app_by_service_token(service_token)
+
+        self.app.delete()
+
+        self.assertIsNone(get_app_by_service_token(service_token))
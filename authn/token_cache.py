@@ -0,0 +1,89 @@
+import logging
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from authn.models.openid import OAuth2App, OAuth2Token
+from authn.session_cache import get_session_user
+
+log = logging.getLogger(__name__)
+
+# apps and tokens are cached without their users, users come from the session cache
+# which is invalidated on every user change
+SERVICE_TOKEN_CACHE_KEY = "service_token:{token}"
+OAUTH_TOKEN_CACHE_KEY = "oauth_token:{token}"
+API_REQUESTS_KEY = "api_requests:{date}"  # client_id -> number of requests that day
+API_REQUESTS_DAYS = 30
+
+
+def get_app_by_service_token(service_token):
+    cache_key = SERVICE_TOKEN_CACHE_KEY.format(token=service_token)
+    app = cache.get(cache_key)
+    if not app:
+        app = OAuth2App.objects.filter(service_token=service_token).first()
+        if not app:
+            return None  # no such app
+        cache.set(cache_key, app, settings.API_TOKEN_CACHE_TIMEOUT)
+
+    if app.owner_id:
+        app.owner = get_session_user(app.owner_id)
+    return app
+
+
+def get_oauth_token(access_token):
+    cache_key = OAUTH_TOKEN_CACHE_KEY.format(token=access_token)
+    token = cache.get(cache_key)
+    if not token:
+        token = OAuth2Token.objects.filter(access_token=access_token).first()
+        if not token:
+            return None
+
+        # expired tokens are rejected by the validator anyway, there's no point to keep them
+        expires_in = (
+            token.issued_at + timedelta(seconds=settings.OPENID_JWT_EXPIRE_SECONDS) - datetime.utcnow()
+        ).total_seconds()
+        if expires_in > 0:
+            cache.set(cache_key, token, min(settings.API_TOKEN_CACHE_TIMEOUT, int(expires_in)))
+
+    token.user = get_session_user(token.user_id)
+    return token
+
+
+def invalidate_service_token(service_token):
+    cache.delete(SERVICE_TOKEN_CACHE_KEY.format(token=service_token))
+
+
+def invalidate_oauth_token(access_token):
+    cache.delete(OAUTH_TOKEN_CACHE_KEY.format(token=access_token))
+
+
+def count_api_request(client_id):
+    key = API_REQUESTS_KEY.format(date=datetime.utcnow().date().isoformat())
+    try:
+        get_redis_connection("default").pipeline(transaction=False)\
+            .hincrby(key, client_id, 1)\
+            .expire(key, int(timedelta(days=API_REQUESTS_DAYS).total_seconds()))\
+            .execute()
+    except RedisError:
+        log.exception("API request counters are not available")
+
+
+def get_api_request_counts(client_ids, date=None):
+    """
+    Returns {client_id: number of requests} for the given day (today by default)
+    """
+    client_ids = list(client_ids)
+    if not client_ids:
+        return {}
+
+    key = API_REQUESTS_KEY.format(date=(date or datetime.utcnow().date()).isoformat())
+    try:
+        counts = get_redis_connection("default").hmget(key, client_ids)
+    except RedisError:
+        log.exception("API request counters are not available")
+        return {}
+
+    return {client_id: int(count or 0) for client_id, count in zip(client_ids, counts)}
@@ -3,12 +3,17 @@ from django.shortcuts import render, get_object_or_404, redirect
 from authn.forms import AppForm
 from authn.decorators.auth import require_auth
 from authn.models.openid import OAuth2App, OAuth2Token, OAuth2AuthorizationCode
+from authn.token_cache import get_api_request_counts
 from club.exceptions import AccessDenied
 
 
 @require_auth
 def list_apps(request):
-    user_apps = OAuth2App.objects.filter(owner=request.me).all()
+    user_apps = list(OAuth2App.objects.filter(owner=request.me).all())
+    request_counts = get_api_request_counts(app.client_id for app in user_apps)
+    for app in user_apps:
+        app.requests_today = request_counts.get(app.client_id, 0)
+
     return render(request, "openid/list_apps.html", {
         "apps": user_apps,
     })
@@ -1,9 +1,9 @@
-from django.core.cache import cache
 from django.shortcuts import redirect, render
 from django.views.decorators.http import require_http_methods
 
 from authn.decorators.auth import require_auth
 from authn.models.session import Session
+from authn.session_cache import invalidate_session
 
 
 def join(request):
@@ -28,5 +28,5 @@ def login(request):
 def logout(request):
     token = request.COOKIES.get("token")
     Session.objects.filter(token=token).delete()
-    cache.delete(f"token:{token}:session")
+    invalidate_session(token)
     return redirect("index")
@@ -2,6 +2,7 @@ from django.shortcuts import render
 
 from authn.decorators.auth import require_auth
 from common.pagination import paginate
+from posts.helpers import load_viewer_state
 from posts.models.post import Post
 
 
@@ -9,11 +10,11 @@ from posts.models.post import Post
 def bookmarks(request):
     user = request.me
 
-    posts = Post.objects_for_user(user)\
+    posts = Post.visible_objects()\
         .filter(bookmarks__user=user, deleted_at__isnull=True)\
         .order_by('-bookmarks__created_at')\
         .all()
 
     return render(request, "bookmarks.html", {
-        "posts": paginate(request, posts),
+        "posts": load_viewer_state(paginate(request, posts), user),
     })
@@ -11,7 +11,7 @@ from comments.models import Comment
 from posts.models.post import Post
 from posts.models.linked import LinkedPost
 from posts.models.views import PostView
-from search.models import SearchIndex
+from search.queue import enqueue_comment_index
 
 log = logging.getLogger(__name__)
 
@@ -75,14 +75,13 @@ def reply_to_comment(update: Update, context: CallbackContext) -> None:
             "telegram": update.to_dict()
         }
     )
-    Comment.update_post_counters(reply.post)
-    PostView.increment_unread_comments(reply)
+    Comment.increment_post_counters(reply.post)
     PostView.register_view(
         request=None,
         user=user,
         post=reply.post,
     )
-    SearchIndex.update_comment_index(reply)
+    enqueue_comment_index(reply)
     LinkedPost.create_links_from_text(reply.post, text)
 
     new_comment_url = settings.APP_HOST + reverse("show_comment", kwargs={
@@ -140,14 +139,13 @@ def comment_to_post(update: Update, context: CallbackContext) -> None:
             "telegram": update.to_dict()
         }
     )
-    Comment.update_post_counters(post)
-    PostView.increment_unread_comments(reply)
+    Comment.increment_post_counters(post)
     PostView.register_view(
         request=None,
         user=user,
         post=post,
     )
-    SearchIndex.update_comment_index(reply)
+    enqueue_comment_index(reply)
     LinkedPost.create_links_from_text(post, text)
 
     new_comment_url = settings.APP_HOST + reverse("show_comment", kwargs={
@@ -14,7 +14,7 @@ from notifications.telegram.posts import notify_post_approved, announce_in_club_
 from notifications.telegram.users import notify_user_profile_approved, notify_user_profile_rejected
 from posts.models.post import Post
 from posts.models.subscriptions import PostSubscription
-from search.models import SearchIndex
+from search.queue import enqueue_post_index, enqueue_user_index
 from users.models.user import User
 
 log = logging.getLogger(__name__)
@@ -112,7 +112,7 @@ def reject_post(update: Update, context: CallbackContext) -> None:
 
     post.unpublish()
 
-    SearchIndex.update_post_index(post)
+    enqueue_post_index(post)
 
     notify_post_rejected(post, reason)
 
@@ -158,7 +158,7 @@ def approve_user_profile(update: Update, context: CallbackContext) -> None:
 
     PostSubscription.subscribe(user, intro, type=PostSubscription.TYPE_ALL_COMMENTS)
 
-    SearchIndex.update_user_index(user)
+    enqueue_user_index(user)
 
     notify_user_profile_approved(user)
     send_welcome_drink(user)
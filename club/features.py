@@ -11,3 +11,8 @@ PRIVATE_FEED = True
 # Enable auth and payment via Patreon
 #   See settings.py for more configs (PATREON_ - prefixed)
 PATREON_AUTH_ENABLED = True
+
+# Keep feeds ordering in Redis sorted sets (see posts/feed_index.py)
+#   True — feed pages take post ids from Redis and fall back to SQL when the index is cold
+#   False — feeds are always sorted by Postgres
+FEED_INDEX_ENABLED = True
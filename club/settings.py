@@ -170,6 +170,16 @@ CACHES = {
 }
 
 LANDING_CACHE_TIMEOUT = 60 * 60 * 24
+COMMENT_THREAD_CACHE_TIMEOUT = 60 * 60  # user names, avatars and hats in threads are refreshed this often
+SESSION_CACHE_TIMEOUT = 60 * 5
+SESSION_LOCAL_CACHE_TIMEOUT = 10  # per-process copies can't be invalidated, logouts and bans wait for this
+SESSION_LOCAL_CACHE_SIZE = 1000
+MEMBER_DIRECTORY_TIMEOUT = 60 * 60  # per-process member lists are patched by published changes in between
+MEMBER_DIRECTORY_UNSUBSCRIBED_TIMEOUT = 30  # when changes can't be received
+API_TOKEN_CACHE_TIMEOUT = 60 * 5  # oauth tokens are also limited by their expiration
+PAGE_CACHE_TIMEOUT = 60  # votes, views and profiles don't invalidate anonymous pages, re-rendered this often
+PAGE_CACHE_STALE_TIMEOUT = 60 * 60 * 24  # stale pages are served while one request re-renders them
+PAGE_CACHE_LOCK_TIMEOUT = 30
 
 # Email
 
@@ -190,12 +200,12 @@ LAUNCH_DATE = datetime(2020, 4, 13)
 
 AUTH_CODE_LENGTH = 6
 AUTH_CODE_EXPIRATION_TIMEDELTA = timedelta(minutes=10)
-AUTH_MAX_CODE_TIMEDELTA = timedelta(hours=3)
-AUTH_MAX_CODE_COUNT = 3
 AUTH_MAX_CODE_ATTEMPTS = 3
 
 DEFAULT_PAGE_SIZE = 70
 SEARCH_PAGE_SIZE = 25
+SEARCH_RESULTS_CACHE_TIMEOUT = 10 * 60  # also dropped on any index change
+SEARCH_TOP_K = 1000  # only that many newest matches are ranked, 0 ranks all of them (slow on popular words)
 PEOPLE_PAGE_SIZE = 18
 PROFILE_COMMENTS_PAGE_SIZE = 100
 PROFILE_POSTS_PAGE_SIZE = 30
@@ -288,9 +298,16 @@ COMMENT_DELETABLE_TIMEDELTA = timedelta(days=10 * 365)
 COMMENT_DELETABLE_BY_POST_AUTHOR_TIMEDELTA = timedelta(days=14)
 RETRACT_VOTE_IN_HOURS = 3
 RETRACT_VOTE_TIMEDELTA = timedelta(hours=RETRACT_VOTE_IN_HOURS)
-RATE_LIMIT_POSTS_PER_DAY = 10
-RATE_LIMIT_COMMENTS_PER_DAY = 200
+RATE_LIMITS = {  # action: (max number of actions, sliding window), moderators are not limited
+    "post": (10, timedelta(hours=24)),
+    "comment": (200, timedelta(hours=24)),
+    "auth_code": (3, timedelta(hours=3)),  # per email
+    "helpdesk_question": (2, timedelta(hours=24)),
+}
 POST_VIEW_COOLDOWN_PERIOD = timedelta(days=1)  # how much time must pass before a repeat viewing of a post counts
+VOTE_COUNTERS_FLUSH_DELAY = timedelta(seconds=30)  # votes are summed up in redis and written to DB in batches
+SITEMAP_REGENERATE_DELAY = timedelta(minutes=5)  # changed sitemap shards are re-rendered in batches
+SEARCH_QUEUE_FLUSH_DELAY = timedelta(seconds=10)  # changed posts, comments and users are indexed in batches
 POST_HOTNESS_PERIOD = timedelta(days=5)  # time window for hotness recalculation script
 MAX_COMMENTS_FOR_DELETE_VS_CLEAR = 10  # number of comments after which the post cannot be deleted
 MIN_DAYS_TO_GIVE_BADGES = 35  # minimum "days" balance to buy and gift any badge
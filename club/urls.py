@@ -1,6 +1,5 @@
 from django.conf import settings
 from django.contrib import admin
-from django.contrib.sitemaps.views import sitemap
 from django.urls import path, include, re_path
 from django.views.generic import RedirectView
 
@@ -18,6 +17,7 @@ from comments.api import api_list_post_comments
 from comments.views import create_comment, edit_comment, delete_comment, show_comment, upvote_comment, \
     retract_comment_vote, pin_comment, delete_comment_thread
 from common.feature_flags import feature_switch
+from common.page_cache import anonymous_page_cache, PAGE_CACHE_TAG_POSTS
 from landing.views import landing, docs, godmode_network_settings, godmode_digest_settings, godmode_settings, \
     godmode_invite
 from misc.fun import badge_generator, mass_note
@@ -35,12 +35,12 @@ from posts.api import md_show_post, api_show_post, json_feed
 from posts.models.post import Post
 from posts.rss import NewPostsRss
 from posts.user_rss import UserPostsRss
-from posts.sitemaps import sitemaps
 from posts.views.admin_actions import admin_post, announce_post, curate_post
 from posts.views.api import toggle_post_bookmark
 from posts.views.feed import feed
 from posts.views.posts import show_post, edit_post, upvote_post, retract_post_vote, compose, compose_type, \
     toggle_post_subscription, delete_post, unpublish_post, clear_post
+from posts.views.sitemaps import sitemap_index, sitemap_shard
 from bookmarks.views import bookmarks
 from search.views import search
 from users.api import api_profile, api_profile_by_telegram_id
@@ -206,8 +206,9 @@ urlpatterns = [
     path("misc/mass_note/", mass_note, name="mass_note"),
 
     # feeds
-    path("sitemap.xml", sitemap, {"sitemaps": sitemaps}, name="sitemap"),
-    path("posts.rss", NewPostsRss(), name="rss"),
+    path("sitemap.xml", sitemap_index, name="sitemap"),
+    re_path(r"^sitemap/(?P<month>\d{4}-\d{2})\.xml$", sitemap_shard, name="sitemap_shard"),
+    path("posts.rss", anonymous_page_cache(tags=[PAGE_CACHE_TAG_POSTS])(NewPostsRss()), name="rss"),
     path("user/<slug:user_slug>/posts.rss", UserPostsRss(), name="user_rss"),
     path("feed.json", json_feed, name="json_feed"),
     re_path(r"^{}/{}/feed.json$".format(POST_TYPE_RE, ORDERING_RE), json_feed, name="json_feed_ordering"),
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CommentsConfig(AppConfig):
     name = "comments"
+
+    def ready(self):
+        # register signals here
+        from comments.signals import invalidate_thread_on_comment_change  # NOQA
@@ -0,0 +1,100 @@
+from types import SimpleNamespace
+from uuid import uuid4, UUID
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.dateformat import format as format_date
+from django.utils.safestring import mark_safe
+
+from common.vote_counters import merge_pending_upvotes
+
+COMMENT_THREAD_KEY = "comment_thread:{post_id}:{version}:{comment_count}:{updated_at}:{comment_order}:{variant}"
+COMMENT_THREAD_VERSION_KEY = "comment_thread:{post_id}:version"
+
+NOBODY_ID = UUID(int=0)  # never matches any comment author
+
+
+def comment_thread_viewer(post, user):
+    """
+    Threads are rendered once per viewer "role", not per user: everything which depends on the exact user
+    (own comments, votes, mutes, notes, new comments) is applied in browser from comment_thread_overlay().
+    Returns role name and a stand-in user to render the thread with.
+    """
+    if not user:
+        return "public", None
+
+    membership = "active" if user.is_active_membership else "inactive"
+    if user.is_moderator:
+        return f"moderator-{membership}", SimpleNamespace(
+            id=NOBODY_ID, is_moderator=True, is_active_membership=user.is_active_membership
+        )
+
+    if user.id == post.author_id:
+        # post author sees the same buttons as the real one
+        return f"author-{membership}", SimpleNamespace(
+            id=post.author_id, is_moderator=False, is_active_membership=user.is_active_membership
+        )
+
+    return f"member-{membership}", SimpleNamespace(
+        id=NOBODY_ID, is_moderator=False, is_active_membership=user.is_active_membership
+    )
+
+
+def render_comment_thread(request, post, comments, comment_order, list_context):
+    variant, viewer = comment_thread_viewer(post, request.me)
+    key = COMMENT_THREAD_KEY.format(
+        post_id=post.id,
+        version=comment_thread_version(post.id),
+        comment_count=post.comment_count,
+        updated_at=post.updated_at.timestamp() if post.updated_at else 0,
+        comment_order=comment_order,
+        variant=variant,
+    )
+
+    html = cache.get(key)
+    if html is None:
+        # no context processors here, they would query rooms and other things the thread doesn't need
+        html = render_to_string("comments/list.html", {
+            **list_context,
+            "request": request,
+            "settings": settings,
+            "post": post,
+            "comments": merge_pending_upvotes(comments),
+            "me": viewer,
+            # members' own edit/delete buttons are rendered hidden for every comment and shown by the overlay
+            "is_owner_overlay": variant.startswith("member-"),
+        }).strip()
+        cache.set(key, html, settings.COMMENT_THREAD_CACHE_TIMEOUT)
+
+    return mark_safe(html)
+
+
+def comment_thread_overlay(user, muted_user_ids, user_notes, comment_votes, last_view_at=None):
+    """
+    Viewer-specific bits of the cached thread, applied by the frontend before components are mounted
+    """
+    if not user:
+        return None
+
+    return {
+        "me": str(user.id),
+        "last_view_at": int(format_date(last_view_at, "U")) if last_view_at else None,
+        "votes": {str(comment_id): int(voted_at.timestamp() * 1000) for comment_id, voted_at in comment_votes.items()},
+        "muted": [str(user_id) for user_id in muted_user_ids],
+        "notes": {str(user_id): text for user_id, text in user_notes.items()},
+    }
+
+
+def comment_thread_version(post_id):
+    # changes with every comment edit, deletion, pin and vote of the post
+    return cache.get(COMMENT_THREAD_VERSION_KEY.format(post_id=post_id)) or 0
+
+
+def invalidate_comment_thread(post_id):
+    # version lives as long as fragments do, so fragments from before it can't come back when it expires
+    cache.set(
+        COMMENT_THREAD_VERSION_KEY.format(post_id=post_id),
+        uuid4().hex,
+        settings.COMMENT_THREAD_CACHE_TIMEOUT,
+    )
@@ -0,0 +1,87 @@
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from django.core.management import BaseCommand
+
+from comments.models import Comment
+from comments.templatetags.comments import comment_tree, TreeComment
+from posts.models.post import Post
+
+
+def generate_comment_thread(count=2000, seed=42):
+    """
+    In-memory fixture of a big discussion: ~15% top level comments, the rest are 2nd and 3rd level replies.
+    Timestamps have duplicates on purpose to check that sorting is stable.
+    """
+    rnd = random.Random(seed)
+    post = Post(id=uuid.UUID(int=rnd.getrandbits(128)), slug="benchmark", title="Benchmark")
+    started_at = datetime(2023, 1, 1)
+
+    comments = []
+    replyable = []  # 1st and 2nd level comments
+    for i in range(count):
+        reply_to = rnd.choice(replyable) if replyable and rnd.random() > 0.15 else None
+        comment = Comment(
+            id=uuid.UUID(int=rnd.getrandbits(128)),
+            post=post,
+            reply_to=reply_to,
+            text=f"Comment {i}",
+            upvotes=rnd.randint(0, 50),
+            is_pinned=reply_to is None and rnd.random() < 0.01,
+            created_at=started_at + timedelta(minutes=rnd.randint(0, count)),
+        )
+        comments.append(comment)
+        if not reply_to or not reply_to.reply_to_id:
+            replyable.append(comment)
+
+    # the same as default comment_order="-upvotes" in render_post
+    return sorted(comments, key=lambda c: (-c.upvotes, c.created_at))
+
+
+def legacy_comment_tree(comments):
+    """
+    The old quadratic builder, kept as a reference implementation
+    """
+    comments = list(comments)
+    tree = []
+    for comment in comments:
+        if not comment.reply_to:
+            replies = []
+            for reply in sorted(comments, key=lambda c: c.created_at):
+                if reply.reply_to_id == comment.id:
+                    replies.append(
+                        TreeComment(
+                            comment=reply,
+                            replies=sorted(
+                                [c for c in comments if c.reply_to_id == reply.id],
+                                key=lambda c: c.created_at
+                            )
+                        )
+                    )
+            tree.append(TreeComment(comment=comment, replies=replies))
+    return sorted(tree, key=lambda c: c.comment.is_pinned, reverse=True)
+
+
+class Command(BaseCommand):
+    help = "Compares old quadratic and new single-pass comment tree builders on a big post"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--comments", type=int, default=2000)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        comments = generate_comment_thread(options["comments"])
+
+        for name, build_tree in [("legacy", legacy_comment_tree), ("single-pass", comment_tree)]:
+            started_at = time.perf_counter()
+            for _ in range(options["repeat"]):
+                tree = build_tree(comments)
+            elapsed = (time.perf_counter() - started_at) / options["repeat"]
+            self.stdout.write(f"{name:>12}: {len(comments)} comments, {len(tree)} threads in {elapsed * 1000:.1f}ms")
+
+        if comment_tree(comments) != legacy_comment_tree(comments):
+            self.stderr.write("Trees are different!")
+
+        self.stdout.write("Done 🥙")
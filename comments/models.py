@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from uuid import uuid4
 
 from django.conf import settings
@@ -7,7 +7,11 @@ from django.db.models import F
 from simple_history.models import HistoricalRecords
 
 from club.exceptions import NotFound, BadRequest
+from common.rate_limits import is_rate_limited
 from common.request import parse_ip_address
+from common.vote_counters import increment_upvotes, decrement_upvotes
+from posts.feed_index import set_post_score
+from posts.helpers import ORDERING_ACTIVITY
 from posts.models.post import Post
 from users.models.user import User
 
@@ -90,10 +94,10 @@ class Comment(models.Model):
         self.save()
 
     def increment_vote_count(self):
-        return Comment.objects.filter(id=self.id).update(upvotes=F("upvotes") + 1)
+        return increment_upvotes(Comment, [self.id])
 
     def decrement_vote_count(self):
-        return Comment.objects.filter(id=self.id).update(upvotes=F("upvotes") - 1)
+        return decrement_upvotes(Comment, [self.id])
 
     @property
     def battle_side(self):
@@ -140,11 +144,28 @@ class Comment(models.Model):
         })
 
     @classmethod
-    def update_post_counters(cls, post, update_activity=True):
-        post.comment_count = Comment.visible_objects().filter(post=post, is_deleted=False).count()
+    def increment_post_counters(cls, post, amount=1, update_activity=True):
+        """
+        Updates comment counters of the post on comment create/delete/restore with F() expressions: no COUNT(*)
+        and no full post.save() with its signals and history. Drift is fixed by the reconcile_counters command.
+        """
+        updates = {"comment_count": F("comment_count") + amount}
+        if amount > 0:
+            # new and restored comments become unread for everyone who viewed the post before
+            updates["comment_seq"] = F("comment_seq") + amount
         if update_activity:
-            post.last_activity_at = datetime.utcnow()
-        post.save()
+            updates["last_activity_at"] = datetime.utcnow()
+
+        Post.objects.filter(id=post.id).update(**updates)
+        post.refresh_from_db(fields=["comment_count", "comment_seq"])  # so the author's view marks it as seen
+
+        if update_activity:
+            # the feed index was updated by post_save before
+            set_post_score(post, ORDERING_ACTIVITY, updates["last_activity_at"])
+
+    @classmethod
+    def decrement_post_counters(cls, post):
+        return cls.increment_post_counters(post, amount=-1, update_activity=False)
 
     @classmethod
     def find_top_comment(cls, comment):
@@ -162,16 +183,13 @@ class Comment(models.Model):
 
     @classmethod
     def check_rate_limits(cls, user):
-        if user.is_moderator:
-            return True
-
-        day_comment_count = Comment.visible_objects()\
-            .filter(
-                author=user, created_at__gte=datetime.utcnow() - timedelta(hours=24)
-            )\
-            .count()
-
-        return day_comment_count < settings.RATE_LIMIT_COMMENTS_PER_DAY
+        # counts the comment which is about to be created
+        return not is_rate_limited(
+            "comment",
+            user.id,
+            db_count=lambda since: Comment.visible_objects().filter(author=user, created_at__gte=since).count(),
+            user=user,
+        )
 
 
 class CommentVote(models.Model):
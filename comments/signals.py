@@ -0,0 +1,31 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from badges.models import UserBadge
+from comments.cache import invalidate_comment_thread
+from comments.models import Comment, CommentVote
+from common.page_cache import invalidate_page_cache
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_thread_on_comment_change(sender, instance, **kwargs):
+    # covers creating, editing, deleting/restoring (it's a save too) and pinning
+    invalidate_comment_thread(instance.post_id)
+    invalidate_page_cache(f"post:{instance.post_id}")
+
+
+@receiver(post_save, sender=CommentVote)
+@receiver(post_delete, sender=CommentVote)
+def invalidate_thread_on_vote(sender, instance, **kwargs):
+    # upvotes are updated with F() expressions and don't trigger post_save of the comment
+    invalidate_comment_thread(instance.post_id)
+
+
+@receiver(post_save, sender=UserBadge)
+def invalidate_thread_on_badge(sender, instance, created, **kwargs):
+    # badges are written to comment metadata with .update() later in the same transaction
+    if created and instance.comment_id:
+        post_id = instance.comment.post_id
+        transaction.on_commit(lambda: invalidate_comment_thread(post_id))
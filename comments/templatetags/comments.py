@@ -1,4 +1,4 @@
-from collections import namedtuple
+from collections import namedtuple, defaultdict
 
 from django import template
 from django.utils.safestring import mark_safe
@@ -11,41 +11,33 @@ from comments.forms import BattleCommentForm
 register = template.Library()
 
 TreeComment = namedtuple("TreeComment", ["comment", "replies"])
+COMMENT_TREE_DEPTH = 3
 
 
 @register.filter()
-def comment_tree(comments):
-    comments = list(comments)  # in case if it's a queryset
-    tree = []
-
-    # build reply tree (3 levels)
-    for comment in comments:
-        # find 1st level comments
-        if not comment.reply_to:
-            replies = []
-            for reply in sorted(comments, key=lambda c: c.created_at):
-                # 2nd level replies
-                if reply.reply_to_id == comment.id:
-                    replies.append(
-                        TreeComment(
-                            comment=reply,
-                            replies=sorted(  # 3rd level replies
-                                [c for c in comments if c.reply_to_id == reply.id],
-                                key=lambda c: c.created_at
-                            )
-                        )
-                    )
-            tree.append(
-                TreeComment(
-                    comment=comment,
-                    replies=replies
-                )
-            )
+def comment_tree(comments, depth=COMMENT_TREE_DEPTH):
+    """
+    Builds reply tree in one pass: comments are grouped by reply_to_id and every group is sorted once.
+    Top level comments keep the order they came in (comment_order) with pinned ones moved to the top,
+    replies are sorted by time. The last level is a plain list of comments, not TreeComments.
+    Replies deeper than `depth` and replies to comments which are not in the list are dropped.
+    """
+    replies_by_parent_id = defaultdict(list)
+    for comment in comments:  # in case if it's a queryset too
+        replies_by_parent_id[comment.reply_to_id].append(comment)
+
+    def build_replies(parent_id, level):
+        if level > depth:
+            return []
+        replies = sorted(replies_by_parent_id.get(parent_id, []), key=lambda c: c.created_at)
+        if level >= depth:
+            return replies
+        return [TreeComment(comment=reply, replies=build_replies(reply.id, level + 1)) for reply in replies]
 
     # move pinned comments to the top
-    tree = sorted(tree, key=lambda c: c.comment.is_pinned, reverse=True)
+    top_level = sorted(replies_by_parent_id.get(None, []), key=lambda c: c.is_pinned, reverse=True)
 
-    return tree
+    return [TreeComment(comment=comment, replies=build_replies(comment.id, 2)) for comment in top_level]
 
 
 @register.simple_tag(takes_context=True)
@@ -67,7 +59,8 @@ def render_comment(context, comment):
         if new_html != comment.html:
             # to not flood into history
             comment.html = new_html
-            comment.save()
+            # upvotes can have pending votes merged in, saving them would count those votes twice
+            comment.save(update_fields=["html"])
 
     return mark_safe(comment.html or "")
 
@@ -1,5 +1,10 @@
-from django.test import TestCase
+from django.test import TestCase, SimpleTestCase
 from django.test.client import RequestFactory
+from django.core.cache import cache
+from comments.cache import render_comment_thread
+from comments.management.commands.benchmark_comment_tree import generate_comment_thread, legacy_comment_tree
+from comments.templatetags.comments import comment_tree, TreeComment
+from comments.models import Comment
 from comments.views import create_comment
 from posts.models.subscriptions import PostSubscription
 
@@ -60,3 +65,75 @@ class TestComments(TestCase):
         self.assertEqual(
             not_author_subscription.type, PostSubscription.TYPE_TOP_LEVEL_ONLY
         )
+
+
+class TestCommentTree(SimpleTestCase):
+    def setUp(self):
+        self.comments = generate_comment_thread(2000)
+
+    def test_same_tree_as_legacy_builder(self):
+        for comment_order in [
+            lambda c: (-c.upvotes, c.created_at),
+            lambda c: c.created_at,
+            lambda c: (-c.created_at.timestamp(), c.created_at),
+        ]:
+            comments = sorted(self.comments, key=comment_order)
+            self.assertEqual(comment_tree(comments), legacy_comment_tree(comments))
+
+    def test_pinned_first(self):
+        tree = comment_tree(self.comments)
+        pinned = [t.comment.is_pinned for t in tree]
+        self.assertTrue(any(pinned))
+        self.assertEqual(pinned, sorted(pinned, reverse=True))
+
+    def test_depth(self):
+        tree = comment_tree(self.comments, 2)
+        self.assertTrue(any(t.replies for t in tree))
+        self.assertFalse(any(isinstance(reply, TreeComment) for t in tree for reply in t.replies))
+
+        tree = comment_tree(self.comments, 1)
+        self.assertFalse(any(t.replies for t in tree))
+
+    def test_orphan_replies_are_dropped(self):
+        top_level_ids = {c.id for c in self.comments if not c.reply_to_id}
+        without_top_level = [c for c in self.comments if c.reply_to_id]
+        self.assertEqual(comment_tree(without_top_level), [])
+        self.assertEqual(len(comment_tree(self.comments)), len(top_level_ids))
+
+
+class TestCommentThreadCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.creator = ModelCreator()
+        self.post = self.creator.create_post(is_visible=True, is_public=True)
+        self.user = self.creator.create_user()
+        self.request = RequestFactory().get(f"/post/{self.post.slug}/")
+        self.request.me = self.user
+
+    def _render(self):
+        return render_comment_thread(
+            request=self.request,
+            post=self.post,
+            comments=Comment.visible_objects(show_deleted=True).filter(post=self.post),
+            comment_order="-upvotes",
+            list_context={"type": "normal"},
+        )
+
+    def test_thread_is_cached_until_comments_change(self):
+        Comment.objects.create(post=self.post, author=self.post.author, text="first", html="<p>first</p>")
+        html = self._render()
+        self.assertIn("first", html)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self._render(), html)
+
+        Comment.objects.create(post=self.post, author=self.user, text="second", html="<p>second</p>")
+        self.assertIn("second", self._render())
+
+    def test_viewer_specific_bits_are_not_rendered(self):
+        comment = Comment.objects.create(post=self.post, author=self.user, text="mine", html="<p>mine</p>")
+        html = self._render()
+
+        # own buttons are rendered hidden for any member and shown by the overlay
+        self.assertIn(f'data-owner-only="{comment.author_id}" hidden', html)
+        self.assertNotIn("initial-is-voted", html)
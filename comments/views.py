@@ -12,12 +12,13 @@ from club.exceptions import AccessDenied, RateLimitException
 from comments.forms import CommentForm, ReplyForm, BattleCommentForm
 from comments.models import Comment, CommentVote
 from common.request import parse_ip_address, parse_useragent
+from common.vote_counters import merge_pending_upvotes
 from authn.decorators.api import api
 from posts.models.linked import LinkedPost
 from posts.models.post import Post
 from posts.models.subscriptions import PostSubscription
 from posts.models.views import PostView
-from search.models import SearchIndex
+from search.queue import enqueue_comment_index
 
 log = logging.getLogger(__name__)
 
@@ -71,14 +72,13 @@ def create_comment(request, post_slug):
 
             # update the shitload of counters :)
             request.me.update_last_activity()
-            Comment.update_post_counters(post)
-            PostView.increment_unread_comments(comment)
+            Comment.increment_post_counters(post)
             PostView.register_view(
                 request=request,
                 user=request.me,
                 post=post,
             )
-            SearchIndex.update_comment_index(comment)
+            enqueue_comment_index(comment)
             LinkedPost.create_links_from_text(post, comment.text)
             return redirect(
                 reverse("show_post", kwargs={
@@ -143,7 +143,7 @@ def edit_comment(request, comment_id):
             comment.useragent = parse_useragent(request)
             comment.save()
 
-            SearchIndex.update_comment_index(comment)
+            enqueue_comment_index(comment)
 
             return redirect("show_comment", post.slug, comment.id)
     else:
@@ -186,20 +186,18 @@ def delete_comment(request, comment_id):
     if not comment.is_deleted:
         # delete comment
         comment.delete(deleted_by=request.me)
-        PostView.decrement_unread_comments(comment)
+        Comment.decrement_post_counters(comment.post)
     else:
         # undelete comment
         if comment.deleted_by == request.me.id or request.me.is_moderator:
             comment.undelete()
-            PostView.increment_unread_comments(comment)
+            Comment.increment_post_counters(comment.post, update_activity=False)
         else:
             raise AccessDenied(
                 title="Нельзя!",
                 message="Только тот, кто удалил комментарий, может его восстановить"
             )
 
-    Comment.update_post_counters(comment.post, update_activity=False)
-
     return redirect("show_comment", comment.post.slug, comment.id)
 
 
@@ -254,9 +252,11 @@ def upvote_comment(request, comment_id):
         request=request,
     )
 
+    merge_pending_upvotes([comment])
+
     return {
         "comment": {
-            "upvotes": comment.upvotes + (1 if is_created else 0)
+            "upvotes": comment.upvotes,
         },
         "upvoted_timestamp": int(post_vote.created_at.timestamp() * 1000) if post_vote else 0
     }
@@ -273,9 +273,11 @@ def retract_comment_vote(request, comment_id):
         comment=comment,
     )
 
+    merge_pending_upvotes([comment])
+
     return {
         "success": is_retracted,
         "comment": {
-            "upvotes": comment.upvotes - (1 if is_retracted else 0)
+            "upvotes": comment.upvotes,
         }
     }
@@ -0,0 +1,66 @@
+import logging
+from datetime import datetime
+
+from django.apps import apps
+from django.db import connection, transaction
+from django_redis import get_redis_connection
+from psycopg2.extras import execute_values
+from redis.exceptions import RedisError
+
+log = logging.getLogger(__name__)
+
+# last_activity_at of users and rooms changes all the time, instead of a single-row UPDATE for every
+# active user we keep "seen at" timestamps in redis and write them with one statement by flush_activity()
+LAST_ACTIVITY_KEY = "last_activity:{table}"  # pk -> last activity timestamp
+LAST_ACTIVITY_FLUSHING_KEY = "last_activity:{table}:flushing"
+LAST_ACTIVITY_FLUSH_BATCH_SIZE = 1000
+LAST_ACTIVITY_MODELS = ["users.User", "rooms.Room"]
+
+
+def track_activity(obj, at=None):
+    at = at or datetime.utcnow()
+    try:
+        get_redis_connection("default").hset(
+            LAST_ACTIVITY_KEY.format(table=obj._meta.db_table), str(obj.pk), at.isoformat()
+        )
+    except RedisError:
+        log.exception("Activity buffer is not available, writing last activity to DB")
+        type(obj).objects.filter(pk=obj.pk).update(last_activity_at=at)
+
+
+def flush_activity(batch_size=LAST_ACTIVITY_FLUSH_BATCH_SIZE):
+    """
+    Writes buffered timestamps to last_activity_at columns, never moving them back in time.
+    Returns the number of flushed timestamps per table.
+    """
+    redis = get_redis_connection("default")
+
+    flushed = {}
+    for model_label in LAST_ACTIVITY_MODELS:
+        model = apps.get_model(model_label)
+        table = model._meta.db_table
+        pk_column = model._meta.pk.column
+        buffer_key = LAST_ACTIVITY_KEY.format(table=table)
+        flushing_key = LAST_ACTIVITY_FLUSHING_KEY.format(table=table)
+
+        # failed flush leaves its data in the "flushing" key, retry it first and take the new buffer next time
+        if not redis.exists(flushing_key) and redis.exists(buffer_key):
+            redis.rename(buffer_key, flushing_key)
+
+        # sorted, so concurrent flushes lock rows in the same order
+        activity = sorted((pk.decode(), at.decode()) for pk, at in redis.hgetall(flushing_key).items())
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            for start in range(0, len(activity), batch_size):
+                execute_values(cursor, f"""
+                    update {table}
+                    set last_activity_at = greatest({table}.last_activity_at, v.at)
+                    from (values %s) as v(pk, at)
+                    where {table}.{pk_column} = v.pk
+                """, activity[start:start + batch_size],
+                    template=f"(%s::{model._meta.pk.db_type(connection)}, %s::timestamp)")
+
+        redis.delete(flushing_key)
+        flushed[table] = len(activity)
+
+    return flushed
@@ -0,0 +1,40 @@
+import calendar
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    # weak, bodies are "the same" when the data they're rendered from is, not byte to byte
+    return 'W/"{}"'.format(hashlib.md5("|".join(str(part) for part in parts).encode()).hexdigest())
+
+
+def not_modified(request, etag=None, last_modified=None):
+    """
+    Returns 304 Not Modified if the client already has this version of the page, None otherwise.
+    Call it before rendering templates or serializing JSON, that's what it saves.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return None
+
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=_timestamp(last_modified),
+    )
+
+
+def set_validators(response, etag=None, last_modified=None):
+    if response.status_code == 200:
+        if etag:
+            response["ETag"] = etag
+        if last_modified:
+            response["Last-Modified"] = http_date(_timestamp(last_modified))
+    return response
+
+
+def _timestamp(value):
+    if value is None or isinstance(value, int):
+        return value
+    return calendar.timegm(value.utctimetuple())  # naive datetimes are UTC here
@@ -0,0 +1,28 @@
+from contextlib import contextmanager
+from uuid import uuid4
+
+from django_redis import get_redis_connection
+
+# compare-and-delete, so a run which outlived its lock doesn't release the lock of the next one
+RELEASE_LOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+@contextmanager
+def redis_lock(key, timeout):
+    """
+    Yields True if the lock is taken and False if somebody else holds it.
+    For jobs started by both cron and django-q which must not run concurrently (flushes of redis buffers).
+    """
+    redis = get_redis_connection("default")
+    token = uuid4().hex
+    is_locked = bool(redis.set(key, token, nx=True, ex=timeout))
+    try:
+        yield is_locked
+    finally:
+        if is_locked:
+            redis.register_script(RELEASE_LOCK_SCRIPT)(keys=[key], args=[token])
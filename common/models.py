@@ -1,24 +1,29 @@
 from collections import Counter
+from functools import lru_cache
 from itertools import groupby
 
-from django.forms.models import model_to_dict
-
 
 class ModelDiffMixin:
     """
     A model mixin that tracks model fields' values and provide some useful api
     to know what fields have been changed.
+
+    Initial state is a shallow copy of raw instance attributes, which is way cheaper than model_to_dict()
+    for every post and user loaded in feeds. Fields are only compared when someone asks for the diff.
     """
 
     def __init__(self, *args, **kwargs):
         super(ModelDiffMixin, self).__init__(*args, **kwargs)
-        self.__initial = self._dict
+        self.__initial = self.__dict__.copy()
 
     @property
     def diff(self):
         d1 = self.__initial
-        d2 = self._dict
-        diffs = [(k, (v, d2[k])) for k, v in d1.items() if v != d2[k]]
+        d2 = self.__dict__
+        diffs = [
+            (name, (d1[attname], d2[attname])) for name, attname in _diff_fields(self._meta)
+            if attname in d1 and attname in d2 and d1[attname] != d2[attname]  # deferred fields are skipped
+        ]
         return dict(diffs)
 
     @property
@@ -40,11 +45,13 @@ class ModelDiffMixin:
         Saves model and set initial state.
         """
         super(ModelDiffMixin, self).save(*args, **kwargs)
-        self.__initial = self._dict
+        self.__initial = self.__dict__.copy()
 
-    @property
-    def _dict(self):
-        return model_to_dict(self, fields=[field.name for field in self._meta.fields])
+
+@lru_cache(maxsize=None)
+def _diff_fields(meta):
+    # the same fields model_to_dict() returns, keyed by name but read by attname (room -> room_id)
+    return [(field.name, field.attname) for field in meta.concrete_fields if field.editable]
 
 
 def top(values, key, skip=None):
@@ -0,0 +1,117 @@
+import functools
+import time
+from urllib.parse import urlencode
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.http import parse_http_date_safe
+
+from common.conditional import not_modified
+
+# whole responses for anonymous visitors, they all see the same page for the same url
+PAGE_CACHE_KEY = "page:{path}?{query}"
+PAGE_CACHE_LOCK_KEY = "page:{path}?{query}:lock"
+PAGE_CACHE_TAG_KEY = "page:tag:{tag}"
+
+# pages with these tags depend on any post (feeds, rss, sitemap), single posts are tagged with "post:{id}"
+PAGE_CACHE_TAG_POSTS = "posts"
+
+
+def anonymous_page_cache(tags=(), query_params=(), timeout=None):
+    """
+    Caches responses of the view for anonymous visitors, see cached_anonymous_page()
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return cached_anonymous_page(
+                request,
+                render=lambda: view(request, *args, **kwargs),
+                tags=tags,
+                query_params=query_params,
+                timeout=timeout,
+            )
+        return wrapper
+    return decorator
+
+
+def cached_anonymous_page(request, render, tags=(), query_params=(), timeout=None):
+    """
+    Returns the cached response for anonymous GET requests or calls render() and caches its result.
+
+    Only query_params are a part of the cache key, everything else (utm tags, etc) is ignored.
+    Pages become stale after timeout or when one of their tags is invalidated by invalidate_page_cache(),
+    then one request re-renders the page and others are served the stale copy in the meantime.
+    """
+    if request.me or request.method not in ("GET", "HEAD"):
+        return render()
+
+    query = urlencode(sorted((param, request.GET[param]) for param in query_params if param in request.GET))
+    key = PAGE_CACHE_KEY.format(path=request.path, query=query)
+    lock_key = PAGE_CACHE_LOCK_KEY.format(path=request.path, query=query)
+
+    tag_versions = _tag_versions(tags)
+    cached = cache.get(key)
+    if cached:
+        is_fresh = cached["tag_versions"] == tag_versions \
+            and cached["cached_at"] > time.time() - (timeout or settings.PAGE_CACHE_TIMEOUT)
+        if is_fresh:
+            return _cached_response(request, cached)
+
+        # somebody is already re-rendering it
+        if not cache.add(lock_key, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+            return _cached_response(request, cached)
+
+    try:
+        response = render()
+        if hasattr(response, "render") and callable(response.render):
+            response.render()  # template responses (e.g. sitemaps) are lazy
+
+        if response.status_code == 200 and not response.streaming and not response.cookies:
+            cache.set(key, {
+                "content": response.content,
+                "status": response.status_code,
+                "headers": dict(response.items()),
+                "tag_versions": tag_versions,
+                "cached_at": time.time(),
+            }, settings.PAGE_CACHE_STALE_TIMEOUT)
+    finally:
+        if cached:
+            cache.delete(lock_key)
+
+    return response
+
+
+def invalidate_page_cache(*tags):
+    # versions live as long as pages do, so pages from before them can't come back when they expire
+    cache.set_many({
+        PAGE_CACHE_TAG_KEY.format(tag=tag): uuid4().hex for tag in tags
+    }, settings.PAGE_CACHE_STALE_TIMEOUT)
+
+
+def _tag_versions(tags):
+    if not tags:
+        return {}
+
+    versions = cache.get_many([PAGE_CACHE_TAG_KEY.format(tag=tag) for tag in tags])
+    return {tag: versions.get(PAGE_CACHE_TAG_KEY.format(tag=tag)) for tag in tags}
+
+
+def _cached_response(request, cached):
+    # validators set by the view are checked here too, the view itself is not called
+    headers = cached["headers"]
+    if "ETag" in headers or "Last-Modified" in headers:
+        response = not_modified(
+            request,
+            etag=headers.get("ETag"),
+            last_modified=parse_http_date_safe(headers.get("Last-Modified")),
+        )
+        if response:
+            return response
+
+    response = HttpResponse(cached["content"], status=cached["status"])
+    for header, value in cached["headers"].items():
+        response[header] = value
+    return response
@@ -1,8 +1,135 @@
+import base64
+import json
+from datetime import datetime
+from uuid import UUID
+
 from django.conf import settings
 from django.core.paginator import Paginator
+from django.db.models import Q
 
 
 def paginate(request, items, page_size=settings.DEFAULT_PAGE_SIZE):
     paginator = Paginator(items, page_size)
     page_number = request.GET.get("page") or 1
     return paginator.get_page(page_number)
+
+
+class CursorPage:
+    """
+    A page of keyset-paginated items. Mimics the parts of Django's Page
+    used by templates, but doesn't know (and doesn't count) the total number of items.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return bool(self.next_cursor)
+
+    def has_previous(self):
+        return bool(self.previous_cursor)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def paginate_by_cursor(request, items, keys, page_size=settings.DEFAULT_PAGE_SIZE):
+    """
+    Keyset pagination over the `keys` ordering (e.g. ["-last_activity_at", "-id"]).
+    The last key must be unique to make the order stable.
+
+    Old-style ?page=N links are still served by the regular paginator.
+    """
+    if not keys or request.GET.get("page"):
+        return paginate(request, items, page_size=page_size)
+
+    direction, values = decode_cursor(request.GET.get("cursor"), items.model, keys)
+    if direction == CURSOR_PREVIOUS:
+        # walk backwards using the reversed order and flip results back afterwards
+        reversed_keys = [key[1:] if key.startswith("-") else f"-{key}" for key in keys]
+        page_items = list(
+            items.filter(_keyset_filter(reversed_keys, values)).order_by(*reversed_keys)[:page_size + 1]
+        )
+        has_more = len(page_items) > page_size
+        page_items = list(reversed(page_items[:page_size]))
+        return CursorPage(
+            object_list=page_items,
+            next_cursor=encode_cursor(CURSOR_NEXT, page_items[-1], keys) if page_items else None,
+            previous_cursor=encode_cursor(CURSOR_PREVIOUS, page_items[0], keys) if has_more else None,
+        )
+
+    items = items.order_by(*keys)
+    if values:
+        items = items.filter(_keyset_filter(keys, values))
+
+    page_items = list(items[:page_size + 1])
+    has_more = len(page_items) > page_size
+    page_items = page_items[:page_size]
+    return CursorPage(
+        object_list=page_items,
+        next_cursor=encode_cursor(CURSOR_NEXT, page_items[-1], keys) if has_more else None,
+        previous_cursor=encode_cursor(CURSOR_PREVIOUS, page_items[0], keys) if values and page_items else None,
+    )
+
+
+CURSOR_NEXT = "n"
+CURSOR_PREVIOUS = "p"
+
+
+def encode_cursor(direction, item, keys):
+    values = [_encode_value(getattr(item, key.lstrip("-"))) for key in keys]
+    raw = json.dumps([direction, values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, model, keys):
+    """
+    Returns (direction, values) or (CURSOR_NEXT, None) for empty or broken cursors,
+    so bad links just show the first page instead of an error.
+    """
+    if not cursor:
+        return CURSOR_NEXT, None
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        direction, values = json.loads(raw)
+        if direction not in {CURSOR_NEXT, CURSOR_PREVIOUS} or len(values) != len(keys):
+            return CURSOR_NEXT, None
+
+        return direction, [
+            model._meta.get_field(key.lstrip("-")).to_python(value) for key, value in zip(keys, values)
+        ]
+    except Exception:
+        return CURSOR_NEXT, None
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def _keyset_filter(keys, values):
+    # (a, b, c) after (x, y, z) == a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+    condition = Q()
+    for index, key in enumerate(keys):
+        field = key.lstrip("-")
+        lookup = "lt" if key.startswith("-") else "gt"
+        step = Q(**{f"{field}__{lookup}": values[index]})
+        for prev_key, prev_value in zip(keys[:index], values[:index]):
+            step &= Q(**{prev_key.lstrip("-"): prev_value})
+        condition |= step
+    return condition
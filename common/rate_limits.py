@@ -0,0 +1,70 @@
+import logging
+import math
+import time
+from datetime import datetime
+from uuid import uuid4
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+log = logging.getLogger(__name__)
+
+# every subject has a sorted set of its actions scored by time, the window slides with each check
+RATE_LIMITS_KEY = "rate_limits:{action}:{subject}"
+
+# KEYS[1] - window, ARGV: now, window seconds, limit, new member, "1" to count the action if it's allowed
+RATE_LIMIT_SCRIPT = """
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", tonumber(ARGV[1]) - tonumber(ARGV[2]))
+if redis.call("ZCARD", KEYS[1]) >= tonumber(ARGV[3]) then
+    return 1
+end
+if ARGV[5] == "1" then
+    redis.call("ZADD", KEYS[1], ARGV[1], ARGV[4])
+    redis.call("EXPIRE", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def is_rate_limited(action, subject, db_count, user=None, hit=True):
+    """
+    Checks the subject (user id, email, etc) against the sliding window of settings.RATE_LIMITS[action]
+    in one redis round trip. With hit=True the action is also counted if it's allowed, use hit=False
+    to only peek and count the action later with register_action().
+
+    db_count() has to return the number of subject's actions since the given datetime,
+    it's used when redis is not available.
+    """
+    if user and user.is_moderator:
+        return False
+
+    limit, window = settings.RATE_LIMITS[action]
+    now = time.time()
+    try:
+        redis = get_redis_connection("default")
+        return bool(redis.register_script(RATE_LIMIT_SCRIPT)(
+            keys=[RATE_LIMITS_KEY.format(action=action, subject=subject)],
+            args=[now, math.ceil(window.total_seconds()), limit, _member(now), "1" if hit else "0"],
+        ))
+    except RedisError:
+        log.exception("Rate limits are not available, counting actions in DB")
+        return db_count(since=datetime.utcnow() - window) >= limit
+
+
+def register_action(action, subject):
+    _, window = settings.RATE_LIMITS[action]
+    now = time.time()
+    key = RATE_LIMITS_KEY.format(action=action, subject=subject)
+    try:
+        get_redis_connection("default").pipeline(transaction=False)\
+            .zadd(key, {_member(now): now})\
+            .expire(key, math.ceil(window.total_seconds()))\
+            .execute()
+    except RedisError:
+        log.exception("Rate limits are not available, action is not counted")
+
+
+def _member(now):
+    # two actions at the same moment must be two members of the set
+    return f"{now}:{uuid4().hex[:8]}"
@@ -0,0 +1,156 @@
+import logging
+from collections import defaultdict
+from datetime import datetime
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django_q.models import Schedule
+from django_q.tasks import schedule
+from django_redis import get_redis_connection
+from psycopg2.extras import execute_values
+from redis.exceptions import RedisError
+
+from common.locks import redis_lock
+
+log = logging.getLogger(__name__)
+
+# Votes themselves are inserted right away, but upvotes of a popular post, its author and coauthors
+# are a few hot rows every voter has to lock. Deltas are accumulated in redis hashes instead and applied
+# in bulk by flush_vote_counters(), readers add pending deltas to DB values with merge_pending_upvotes()
+VOTE_COUNTERS_KEY = "vote_counters:{table}"  # object_id -> upvotes delta
+VOTE_COUNTERS_FLUSHING_KEY = "vote_counters:{table}:flushing"
+VOTE_COUNTERS_FLUSH_SCHEDULED_KEY = "vote_counters:flush_scheduled"
+VOTE_COUNTERS_FLUSH_SCHEDULED_TTL = 600  # lost flush tasks are rescheduled by the next vote after that
+VOTE_COUNTERS_FLUSH_BATCH_SIZE = 1000
+VOTE_COUNTERS_FLUSH_LOCK_KEY = "vote_counters:flush_lock"
+VOTE_COUNTERS_FLUSH_LOCK_TIMEOUT = 10 * 60  # longer than any flush, frees the lock of a killed one
+VOTE_COUNTER_MODELS = ["posts.Post", "comments.Comment", "users.User"]
+
+
+def increment_upvotes(model, object_ids, amount=1):
+    object_ids = [str(object_id) for object_id in object_ids if object_id]
+    if not object_ids:
+        return
+
+    try:
+        pipeline = get_redis_connection("default").pipeline(transaction=False)
+        for object_id in object_ids:
+            pipeline.hincrby(VOTE_COUNTERS_KEY.format(table=model._meta.db_table), object_id, amount)
+        pipeline.set(
+            VOTE_COUNTERS_FLUSH_SCHEDULED_KEY,
+            datetime.utcnow().isoformat(),
+            nx=True,
+            ex=VOTE_COUNTERS_FLUSH_SCHEDULED_TTL,
+        )
+        *_, is_flush_needed = pipeline.execute()
+    except RedisError:
+        log.exception("Vote counters buffer is not available, writing upvotes to DB")
+        return model.objects.filter(id__in=object_ids).update(upvotes=Greatest(F("upvotes") + amount, 0))
+
+    if is_flush_needed:
+        # one delayed task per flush period, everything voted until then goes in the same batch
+        schedule(
+            "common.vote_counters.flush_vote_counters",
+            schedule_type=Schedule.ONCE,
+            next_run=datetime.utcnow() + settings.VOTE_COUNTERS_FLUSH_DELAY,
+        )
+
+
+def decrement_upvotes(model, object_ids, amount=1):
+    return increment_upvotes(model, object_ids, -amount)
+
+
+def merge_pending_upvotes(objects):
+    """
+    Adds not yet flushed deltas to upvotes of already fetched posts, comments or users (can be mixed).
+    Merged objects are for display only, saving them would write the pending delta twice.
+    """
+    objects = [obj for obj in objects if obj is not None]
+    objects_by_model = defaultdict(list)
+    for obj in objects:
+        objects_by_model[type(obj)].append(obj)
+
+    if not objects_by_model:
+        return objects
+
+    try:
+        pipeline = get_redis_connection("default").pipeline(transaction=False)
+        for model, model_objects in objects_by_model.items():
+            object_ids = [str(obj.id) for obj in model_objects]
+            pipeline.hmget(VOTE_COUNTERS_KEY.format(table=model._meta.db_table), object_ids)
+            pipeline.hmget(VOTE_COUNTERS_FLUSHING_KEY.format(table=model._meta.db_table), object_ids)
+        results = pipeline.execute()
+    except RedisError:
+        log.exception("Vote counters buffer is not available, showing DB upvotes")
+        return objects
+
+    for model_objects, buffered, flushing in zip(objects_by_model.values(), results[::2], results[1::2]):
+        for obj, buffered_delta, flushing_delta in zip(model_objects, buffered, flushing):
+            obj.upvotes = max(obj.upvotes + int(buffered_delta or 0) + int(flushing_delta or 0), 0)
+
+    return objects
+
+
+def flush_vote_counters(batch_size=VOTE_COUNTERS_FLUSH_BATCH_SIZE):
+    """
+    Applies buffered deltas to upvotes columns with one UPDATE ... FROM (VALUES) per batch.
+    Runs as a django-q task scheduled by the first vote after the previous flush.
+    Returns the number of updated rows per table.
+    """
+    redis = get_redis_connection("default")
+
+    # votes from now on schedule the next flush
+    redis.delete(VOTE_COUNTERS_FLUSH_SCHEDULED_KEY)
+
+    # django-q and cron can start flushes at the same time, both would apply the same "flushing" deltas
+    with redis_lock(VOTE_COUNTERS_FLUSH_LOCK_KEY, VOTE_COUNTERS_FLUSH_LOCK_TIMEOUT) as is_locked:
+        if not is_locked:
+            log.info("Vote counters are being flushed by somebody else")
+            return {}
+
+        return _flush_vote_counters(redis, batch_size)
+
+
+def _flush_vote_counters(redis, batch_size):
+    flushed = {}
+    for model_label in VOTE_COUNTER_MODELS:
+        table = apps.get_model(model_label)._meta.db_table
+        buffer_key = VOTE_COUNTERS_KEY.format(table=table)
+        flushing_key = VOTE_COUNTERS_FLUSHING_KEY.format(table=table)
+
+        # failed flush leaves its data in the "flushing" key, retry it first and take the new buffer next time
+        if not redis.exists(flushing_key) and redis.exists(buffer_key):
+            redis.rename(buffer_key, flushing_key)
+
+        # the same order in every flush, so concurrent flushes can't deadlock on row locks
+        deltas = sorted(
+            (object_id.decode(), int(delta)) for object_id, delta in redis.hgetall(flushing_key).items() if int(delta)
+        )
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            for start in range(0, len(deltas), batch_size):
+                execute_values(cursor, f"""
+                    update {table}
+                    set upvotes = greatest({table}.upvotes + v.delta, 0)
+                    from (values %s) as v(id, delta)
+                    where {table}.id = v.id
+                """, deltas[start:start + batch_size], template="(%s::uuid, %s)")
+
+        redis.delete(flushing_key)
+        flushed[table] = len(deltas)
+
+    return flushed
+
+
+def pending_upvote_deltas(redis, table):
+    """
+    Returns {object_id: delta} of votes which are in vote tables already but not in upvotes of the table yet
+    """
+    deltas = defaultdict(int)
+    for key in [VOTE_COUNTERS_KEY.format(table=table), VOTE_COUNTERS_FLUSHING_KEY.format(table=table)]:
+        for object_id, delta in redis.hgetall(key).items():
+            deltas[object_id.decode()] += int(delta)
+    return {object_id: delta for object_id, delta in deltas.items() if delta}
@@ -9,12 +9,13 @@ import {
     handleFormSubmissionShortcuts,
     imageUploadOptions
 } from "./common/markdown-editor";
-import { getCollapsedCommentThreadsSet } from "./common/comments";
+import { applyCommentsOverlay, getCollapsedCommentThreadsSet } from "./common/comments";
 
 const INITIAL_SYNC_DELAY = 50;
 
 const App = {
     onCreate() {
+        applyCommentsOverlay();
         this.initializeThemeSwitcher();
         this.addTargetBlankToExternalLinks();
     },
@@ -34,3 +34,76 @@ export const handleCommentThreadCollapseToggle = (wasCollapsed, commentId) => {
         [lastWeek]: lastWeekSet ? Array.from(lastWeekSet) : lastWeekCollapsedComments,
     });
 };
+
+const truncate = (text, maxLength) => (text.length > maxLength ? `${text.slice(0, maxLength - 1)}…` : text);
+
+/**
+ * Comment threads are cached on the server for all viewers of the same role,
+ * here we apply things which depend on the current user: votes, own comments, mutes, notes and new comments.
+ *
+ * Has to be called before Vue mounts, so comment-upvote components get their initial props from attributes.
+ */
+export const applyCommentsOverlay = () => {
+    const overlayElement = document.getElementById("comments-overlay");
+    if (!overlayElement) {
+        return;
+    }
+
+    const { me, last_view_at: lastViewAt, votes, muted, notes } = JSON.parse(overlayElement.textContent);
+
+    const mutedSet = new Set(muted);
+    for (const comment of document.querySelectorAll('[id^="comment-"][data-author-id]')) {
+        if (mutedSet.has(comment.dataset.authorId)) {
+            const stub = document.createElement("div");
+            stub.className = "comment";
+            stub.id = comment.id;
+            stub.innerHTML = '<div class="comment-body-muted">🔇 Комментарий от замьюченного юзера...</div>';
+            comment.replaceWith(stub);
+        }
+    }
+
+    if (lastViewAt) {
+        for (const comment of document.querySelectorAll("[data-created-at]")) {
+            if (parseInt(comment.dataset.createdAt) > lastViewAt) {
+                comment.classList.add("comment-is-new");
+            }
+        }
+    }
+
+    for (const note of document.querySelectorAll(".comment-header-author-note[data-author-id]")) {
+        const text = notes[note.dataset.authorId];
+        if (!text) {
+            continue;
+        }
+
+        note.textContent = truncate(text, parseInt(note.dataset.maxLength));
+        note.hidden = false;
+
+        const position = note.nextElementSibling;
+        if (position && position.classList.contains("comment-header-author-position")) {
+            position.hidden = true;
+        }
+    }
+
+    for (const button of document.querySelectorAll("[data-owner-only]")) {
+        button.hidden = button.dataset.ownerOnly !== me;
+    }
+
+    for (const button of document.querySelectorAll("[data-owner-hidden]")) {
+        if (button.dataset.ownerHidden === me) {
+            button.remove();
+        }
+    }
+
+    for (const upvote of document.querySelectorAll("comment-upvote[data-comment-id]")) {
+        const upvotedAt = votes[upvote.dataset.commentId];
+        if (upvotedAt) {
+            upvote.setAttribute("initial-is-voted", "");
+            upvote.setAttribute("initial-upvote-timestamp", String(upvotedAt));
+        }
+
+        if (upvote.dataset.authorId === me) {
+            upvote.setAttribute("is-disabled", "");
+        }
+    }
+};
@@ -1,6 +1,5 @@
 import os
 
-DAILY_QUESTION_LIMIT = 2
 QUESTION_TITLE_MAX_LEN = 150
 QUESTION_BODY_MAX_LEN = 2500
 
@@ -1,6 +1,5 @@
 import logging
 from dataclasses import dataclass
-from datetime import datetime, timedelta
 from enum import Enum, auto
 from typing import Dict
 
@@ -9,6 +8,7 @@ from telegram import ReplyKeyboardMarkup, ReplyKeyboardRemove, Update
 from telegram.ext import CallbackContext, ConversationHandler, CommandHandler, MessageHandler, Filters
 
 from bot.handlers.common import get_club_user
+from common.rate_limits import is_rate_limited, register_action
 from helpdeskbot import config
 from helpdeskbot.help_desk_common import get_channel_message_link, send_message, send_reply
 from helpdeskbot.models import Question, HelpDeskUser
@@ -108,14 +108,16 @@ def start(update: Update, context: CallbackContext) -> State:
         send_reply(update, "🙈 Вас забанили от пользования Вастрик Справочной")
         return ConversationHandler.END
 
-    if not user.is_moderator:
-        question_count_24h = Question.objects.filter(user=user) \
-            .filter(created_at__gte=datetime.utcnow() - timedelta(hours=24)) \
-            .count()
-
-        if question_count_24h >= config.DAILY_QUESTION_LIMIT:
-            send_reply(update, "🙅‍♂️ Упс, кажется вы превысили свой лимит вопросов в день. Приходите завтра!")
-            return ConversationHandler.END
+    # the question is counted when it's published
+    if is_rate_limited(
+        "helpdesk_question",
+        user.id,
+        db_count=lambda since: Question.objects.filter(user=user, created_at__gte=since).count(),
+        user=user,
+        hit=False,
+    ):
+        send_reply(update, "🙅‍♂️ Упс, кажется вы превысили свой лимит вопросов в день. Приходите завтра!")
+        return ConversationHandler.END
 
     context.user_data.clear()
 
@@ -250,6 +252,7 @@ def publish_question(update: Update, user_data: Dict[str, str]) -> str:
 
     question.channel_msg_id = channel_message.message_id
     question.save()
+    register_action("helpdesk_question", user.id)
 
     if room and room.chat_id:
         try:
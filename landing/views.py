@@ -9,6 +9,7 @@ from django.shortcuts import render, redirect
 
 from authn.decorators.auth import require_auth
 from club.exceptions import AccessDenied
+from common.page_cache import anonymous_page_cache
 from landing.forms import GodmodeNetworkSettingsEditForm, GodmodeDigestEditForm, GodmodeInviteForm
 from landing.models import GodSettings
 from notifications.email.invites import send_invited_email
@@ -22,6 +23,7 @@ EXISTING_DOCS = [
 ]
 
 
+@anonymous_page_cache(timeout=settings.LANDING_CACHE_TIMEOUT)
 def landing(request):
     stats = cache.get("landing_stats")
     if not stats:
@@ -10,6 +10,7 @@ from icalendar import Calendar, Event
 
 from authn.decorators.auth import require_auth
 from badges.models import UserBadge
+from common.page_cache import anonymous_page_cache
 from misc.models import NetworkGroup
 from users.models.achievements import Achievement, UserAchievement
 from users.models.user import User
@@ -100,6 +101,7 @@ def network(request):
 
 
 @require_GET
+@anonymous_page_cache(timeout=60 * 60 * 24)
 def robots(request):
     lines = [
         "User-agent: *",
@@ -12,7 +12,7 @@ from notifications.telegram.common import send_telegram_message, CLUB_CHANNEL, r
 from landing.models import GodSettings
 from notifications.email.sender import send_mass_email
 from posts.models.post import Post
-from search.models import SearchIndex
+from search.queue import enqueue_post_index
 from users.models.user import User
 
 log = logging.getLogger(__name__)
@@ -54,7 +54,7 @@ class Command(BaseCommand):
         )
 
         # make it searchable
-        SearchIndex.update_post_index(post)
+        enqueue_post_index(post)
 
         # sending emails
         subscribed_users = User.objects\
@@ -8,10 +8,11 @@ from club import settings
 from notifications.telegram.common import Chat, send_telegram_message, render_html_message, CLUB_ONLINE, ADMIN_CHAT
 from comments.models import Comment
 from common.regexp import USERNAME_RE
+from posts.hotness import update_post_hotness
 from posts.models.subscriptions import PostSubscription
+from users.directory import resolve_mentions
 from users.models.friends import Friend
 from users.models.mute import Muted
-from users.models.user import User
 
 
 @receiver(post_save, sender=Comment)
@@ -19,6 +20,7 @@ def create_or_update_comment(sender, instance, created, **kwargs):
     if not created:
         return None  # we're not interested in comment updates
 
+    async_task(update_post_hotness, instance.post_id)
     async_task(async_create_or_update_comment, instance)
 
 
@@ -101,7 +103,9 @@ def async_create_or_update_comment(comment):
                 notified_user_ids.add(friend.user_from.id)
 
     # parse @nicknames and notify their users
-    for username in USERNAME_RE.findall(comment.text):
+    usernames = USERNAME_RE.findall(comment.text)
+    mentioned_users = resolve_mentions(usernames)
+    for username in usernames:
         if username == settings.MODERATOR_USERNAME:
             send_telegram_message(
                 chat=ADMIN_CHAT,
@@ -109,7 +113,7 @@ def async_create_or_update_comment(comment):
             )
             continue
 
-        user = User.objects.filter(slug=username).first()
+        user = mentioned_users.get(username)
         if not user:
             continue
 
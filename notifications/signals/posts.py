@@ -7,8 +7,8 @@ from django_q.tasks import async_task
 from notifications.telegram.common import ADMIN_CHAT, send_telegram_message, render_html_message, CLUB_ONLINE, Chat
 from common.regexp import USERNAME_RE
 from posts.models.post import Post
+from users.directory import resolve_mentions
 from users.models.friends import Friend
-from users.models.user import User
 
 REJECT_POST_REASONS = {
     "post": [
@@ -121,8 +121,10 @@ def async_create_or_update_post(post, is_created):
         notified_user_ids = set()
 
         # parse @nicknames and notify mentioned users
-        for username in USERNAME_RE.findall(post.text):
-            user = User.objects.filter(slug=username).first()
+        usernames = USERNAME_RE.findall(post.text)
+        mentioned_users = resolve_mentions(usernames)
+        for username in usernames:
+            user = mentioned_users.get(username)
             if user and user.telegram_id and user.id not in notified_user_ids:
                 send_telegram_message(
                     chat=Chat(id=user.telegram_id),
@@ -159,8 +161,9 @@ def async_label_changed(post):
 
 
 def notify_users(users, template, post):
+    found_users = resolve_mentions(users)
     for username in users:
-        user = User.objects.filter(slug=username).first()
+        user = found_users.get(username)
         if user and user.telegram_id:
             send_telegram_message(
                 chat=Chat(id=user.telegram_id),
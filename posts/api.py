@@ -6,9 +6,13 @@ from django.urls import reverse
 from authn.helpers import check_user_permissions
 from authn.decorators.api import api
 from club.exceptions import ApiAuthRequired
-from common.pagination import paginate
+from common.conditional import not_modified, set_validators
+from common.page_cache import anonymous_page_cache, PAGE_CACHE_TAG_POSTS
+from common.pagination import CursorPage, paginate_by_cursor
+from posts.feed_index import paginate_by_feed_index
 from posts.models.post import Post
-from posts.helpers import POST_TYPE_ALL, ORDERING_ACTIVITY, sort_feed
+from posts.helpers import POST_TYPE_ALL, ORDERING_ACTIVITY, ORDERING_KEYS, sort_feed, post_validators, \
+    posts_validators
 
 
 @api(require_auth=False)
@@ -27,9 +31,16 @@ def md_show_post(request, post_type, post_slug):
         if access_denied:
             raise ApiAuthRequired()
 
+    etag, last_modified = post_validators(post)
+    response = not_modified(request, etag, last_modified)
+    if response:
+        return response
+
     post_markdown = f"""# {post.title}\n\n{post.text}"""
 
-    return HttpResponse(post_markdown, content_type="text/plain; charset=utf-8")
+    return set_validators(
+        HttpResponse(post_markdown, content_type="text/plain; charset=utf-8"), etag, last_modified
+    )
 
 
 @api(require_auth=False)
@@ -42,14 +53,19 @@ def api_show_post(request, post_type, post_slug):
     if not post.can_view(request.me):
         raise Http404()
 
-    return {
+    etag, last_modified = post_validators(post, bool(request.me))
+    response = not_modified(request, etag, last_modified)
+    if response:
+        return response
+
+    return set_validators(JsonResponse({
         "post": post.to_dict(including_private=bool(request.me))
-    }
+    }, json_dumps_params=dict(ensure_ascii=False)), etag, last_modified)
 
 
 @api(require_auth=False)
+@anonymous_page_cache(tags=[PAGE_CACHE_TAG_POSTS], query_params=["cursor", "page"])
 def json_feed(request, post_type=POST_TYPE_ALL, ordering=ORDERING_ACTIVITY):
-    page_number = int(request.GET.get("page") or 1)
     posts = Post.visible_objects()
 
     # filter posts by type
@@ -60,15 +76,35 @@ def json_feed(request, post_type=POST_TYPE_ALL, ordering=ORDERING_ACTIVITY):
     posts = sort_feed(posts, ordering)
 
     # paginate
-    posts = paginate(request, posts)
+    page = paginate_by_feed_index(request, posts, ordering, post_type)
+    if page is None:
+        page = paginate_by_cursor(request, posts, keys=ORDERING_KEYS.get(ordering))
 
-    return JsonResponse({
+    # pollers get 304 until something on their page changes
+    etag, last_modified = posts_validators(page, bool(request.me))
+    response = not_modified(request, etag, last_modified)
+    if response:
+        return response
+
+    feed = {
         "version": "https://jsonfeed.org/version/1.1",
         "title": settings.APP_NAME,
         "home_page_url": settings.APP_HOST,
         "feed_url": f"{settings.APP_HOST}{reverse('json_feed')}",
-        "next_url": f"{settings.APP_HOST}{reverse('json_feed')}?page={page_number + 1}",
         "items": [
-            post.to_dict(including_private=bool(request.me)) for post in posts
+            post.to_dict(including_private=bool(request.me)) for post in page
         ]
-    }, json_dumps_params=dict(ensure_ascii=False), content_type="application/feed+json")
+    }
+
+    # cursors don't need a total count, legacy ?page=N links still work
+    if page.has_next():
+        if isinstance(page, CursorPage):
+            feed["next_url"] = f"{settings.APP_HOST}{request.path}?cursor={page.next_cursor}"
+        else:
+            feed["next_url"] = f"{settings.APP_HOST}{request.path}?page={page.next_page_number()}"
+
+    return set_validators(
+        JsonResponse(feed, json_dumps_params=dict(ensure_ascii=False), content_type="application/feed+json"),
+        etag,
+        last_modified,
+    )
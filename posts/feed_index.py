@@ -0,0 +1,331 @@
+import logging
+from datetime import datetime
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.db.models import Q
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from club import features
+from common.vote_counters import pending_upvote_deltas
+from common.pagination import CursorPage, CURSOR_PREVIOUS, CURSOR_NEXT, decode_cursor, encode_cursor
+from posts.helpers import POST_TYPE_ALL, ORDERING_ACTIVITY, ORDERING_NEW, ORDERING_HOT, ORDERING_TOP, ORDERING_KEYS
+from posts.models.post import Post
+from posts.models.votes import PostVote
+
+log = logging.getLogger(__name__)
+
+FEED_INDEX_KEY_PREFIX = "feed_index"
+FEED_INDEX_READY_KEY = "feed_index:ready"
+FEED_INDEX_MAX_HYDRATION_ROUNDS = 5  # heavily filtered feeds (e.g. public only) are cheaper in SQL
+
+# time-windowed tops (week, month, year) are not indexed and always go to SQL
+INDEXED_ORDERINGS = {
+    ORDERING_ACTIVITY: lambda post: post.last_activity_at,
+    ORDERING_NEW: lambda post: post.published_at or post.created_at,
+    ORDERING_HOT: lambda post: post.hotness,
+    ORDERING_TOP: lambda post: post.upvotes,
+}
+
+
+def feed_index_key(ordering, post_type=POST_TYPE_ALL, room_slug=None, label_code=None):
+    return f"{FEED_INDEX_KEY_PREFIX}:{ordering}:{post_type}:{room_slug or ''}:{label_code or ''}"
+
+
+def feed_dimensions(post_type, room_slug, label_code):
+    # every post lives in the main feed, its type feed and its room and label feeds
+    dimensions = {(POST_TYPE_ALL, None, None), (post_type, None, None)}
+    if room_slug:
+        dimensions.add((POST_TYPE_ALL, room_slug, None))
+    if label_code:
+        dimensions.add((POST_TYPE_ALL, None, label_code))
+    return dimensions
+
+
+def is_feed_indexed(ordering, post_type=POST_TYPE_ALL, room_slug=None, label_code=None):
+    if not features.FEED_INDEX_ENABLED or ordering not in INDEXED_ORDERINGS:
+        return False
+
+    if post_type != POST_TYPE_ALL and post_type not in dict(Post.TYPES):
+        return False
+
+    # only single-dimension feeds exist in urls, combined ones are not indexed
+    return len([d for d in (post_type != POST_TYPE_ALL, room_slug, label_code) if d]) <= 1
+
+
+def index_post(post):
+    """
+    Puts the post into all feed sets it belongs to or removes it from there if it's not visible anymore.
+    Called on every post save so it has to be cheap: one pipeline round trip.
+    """
+    if not features.FEED_INDEX_ENABLED:
+        return
+
+    member = str(post.id)
+    dimensions = feed_dimensions(post.type, post.room_id, post.label_code)
+
+    # post could've been moved to another type, room or label, clean up old sets
+    old_type, _ = post.get_field_diff("type") or (post.type, None)
+    old_room_id, _ = post.get_field_diff("room") or (post.room_id, None)
+    old_label_code, _ = post.get_field_diff("label_code") or (post.label_code, None)
+    stale_dimensions = feed_dimensions(old_type, old_room_id, old_label_code) - dimensions
+
+    try:
+        pipeline = get_redis_connection("default").pipeline(transaction=False)
+        for ordering, score_field in INDEXED_ORDERINGS.items():
+            for dimension in stale_dimensions:
+                pipeline.zrem(feed_index_key(ordering, *dimension), member)
+
+            for dimension in dimensions:
+                if post.is_visible:
+                    pipeline.zadd(feed_index_key(ordering, *dimension), {member: _score(score_field(post))})
+                else:
+                    pipeline.zrem(feed_index_key(ordering, *dimension), member)
+        pipeline.execute()
+    except RedisError:
+        log.exception("Feed index update failed")
+
+
+def remove_post(post):
+    if not features.FEED_INDEX_ENABLED:
+        return
+
+    member = str(post.id)
+    try:
+        pipeline = get_redis_connection("default").pipeline(transaction=False)
+        for ordering in INDEXED_ORDERINGS:
+            for dimension in feed_dimensions(post.type, post.room_id, post.label_code):
+                pipeline.zrem(feed_index_key(ordering, *dimension), member)
+        pipeline.execute()
+    except RedisError:
+        log.exception("Feed index removal failed")
+
+
+def increment_post_score(post, ordering, amount=1):
+    """
+    For counters updated with F() expressions (votes) where post.save() and its signal are not called
+    """
+    if not features.FEED_INDEX_ENABLED or not post.is_visible:
+        return
+
+    member = str(post.id)
+    try:
+        pipeline = get_redis_connection("default").pipeline(transaction=False)
+        for dimension in feed_dimensions(post.type, post.room_id, post.label_code):
+            pipeline.zincrby(feed_index_key(ordering, *dimension), amount, member)
+        pipeline.execute()
+    except RedisError:
+        log.exception("Feed index increment failed")
+
+
+def set_post_score(post, ordering, score):
+    """
+    For scores recalculated in bulk SQL (hotness) where post.save() and its signal are not called
+    """
+    if not features.FEED_INDEX_ENABLED or not post.is_visible:
+        return
+
+    member = str(post.id)
+    try:
+        pipeline = get_redis_connection("default").pipeline(transaction=False)
+        for dimension in feed_dimensions(post.type, post.room_id, post.label_code):
+            pipeline.zadd(feed_index_key(ordering, *dimension), {member: _score(score)})
+        pipeline.execute()
+    except RedisError:
+        log.exception("Feed index score update failed")
+
+
+def rebuild_feed_index(orderings=None):
+    """
+    Rebuilds all sets of given orderings from scratch. Sets are written under temporary keys
+    and renamed when ready, so feeds keep working (or fall back to SQL) during the rebuild.
+    """
+    orderings = orderings or list(INDEXED_ORDERINGS.keys())
+    redis = get_redis_connection("default")
+    started_at = datetime.utcnow()
+
+    sets = {}
+    for row in _index_rows(Post.objects.filter(is_visible=True)).iterator(chunk_size=5000):
+        post = SimpleNamespace(**row)  # full models are too heavy here
+        for ordering in orderings:
+            score = _score(INDEXED_ORDERINGS[ordering](post))
+            for dimension in feed_dimensions(post.type, post.room_id, post.label_code):
+                sets.setdefault(feed_index_key(ordering, *dimension), {})[str(post.id)] = score
+
+    for key, members in sets.items():
+        tmp_key = f"{key}:rebuilding"
+        redis.delete(tmp_key)
+        items = list(members.items())
+        for start in range(0, len(items), 5000):
+            redis.zadd(tmp_key, dict(items[start:start + 5000]))
+
+    keys = set(sets.keys())
+    keys |= _reindex_changed_posts(redis, keys, orderings, started_at)
+
+    for key in keys:
+        tmp_key = f"{key}:rebuilding"
+        if redis.exists(tmp_key):
+            redis.rename(tmp_key, key)
+        else:
+            redis.delete(key)  # changed posts have left it empty
+
+    # drop sets of removed rooms, labels and post types
+    for ordering in orderings:
+        for key in redis.scan_iter(match=f"{FEED_INDEX_KEY_PREFIX}:{ordering}:*"):
+            if key.decode() not in keys:
+                redis.delete(key)
+
+    redis.set(FEED_INDEX_READY_KEY, datetime.utcnow().isoformat())
+    return len(keys)
+
+
+def _reindex_changed_posts(redis, keys, orderings, started_at):
+    """
+    Signals have been updating live sets while the new ones were built from a DB snapshot,
+    the same posts are indexed again from fresh rows before the new sets replace live ones.
+    Votes are not in DB upvotes until vote counters are flushed, pending ones are added here.
+    Returns keys of sets which didn't exist before.
+    """
+    voted_post_ids = PostVote.objects.filter(created_at__gte=started_at).values("post_id")
+    pending_post_ids = list(pending_upvote_deltas(redis, Post._meta.db_table))
+    is_changed = Q(updated_at__gte=started_at) | Q(last_activity_at__gte=started_at)
+    is_voted = Q(id__in=voted_post_ids) | Q(id__in=pending_post_ids)
+    rows = list(_index_rows(Post.objects.filter(is_changed | is_voted)))
+    pending_upvotes = pending_upvote_deltas(redis, Post._meta.db_table)
+
+    new_keys = set()
+    pipeline = redis.pipeline(transaction=False)
+    for row in rows:
+        post = SimpleNamespace(**row)
+        post.upvotes += pending_upvotes.get(str(post.id), 0)
+        member = str(post.id)
+        for ordering in orderings:
+            # post could've been moved to another type, room or label
+            for key in keys:
+                if key.startswith(f"{FEED_INDEX_KEY_PREFIX}:{ordering}:"):
+                    pipeline.zrem(f"{key}:rebuilding", member)
+
+            if not post.is_visible:
+                continue
+
+            for dimension in feed_dimensions(post.type, post.room_id, post.label_code):
+                key = feed_index_key(ordering, *dimension)
+                pipeline.zadd(f"{key}:rebuilding", {member: _score(INDEXED_ORDERINGS[ordering](post))})
+                if key not in keys:
+                    new_keys.add(key)
+    pipeline.execute()
+
+    return new_keys
+
+
+def _index_rows(posts):
+    return posts.order_by().values(
+        "id", "type", "room_id", "label_code", "is_visible",
+        "last_activity_at", "published_at", "created_at", "hotness", "upvotes",
+    )
+
+
+def paginate_by_feed_index(request, posts, ordering, post_type=POST_TYPE_ALL, room_slug=None, label_code=None,
+                           page_size=settings.DEFAULT_PAGE_SIZE):
+    """
+    Takes page ids from the sorted set and hydrates them with a single id__in query over the already filtered
+    `posts` queryset. Returns None if the index can't serve this feed, callers fall back to SQL pagination then.
+    """
+    if not is_feed_indexed(ordering, post_type, room_slug, label_code) or request.GET.get("page"):
+        return None
+
+    keys = ORDERING_KEYS[ordering]
+    key = feed_index_key(ordering, post_type, room_slug, label_code)
+    direction, values = decode_cursor(request.GET.get("cursor"), Post, keys)
+
+    try:
+        redis = get_redis_connection("default")
+        if not redis.exists(FEED_INDEX_READY_KEY):
+            return None  # cold index
+
+        rank = _cursor_rank(redis, key, direction, values)
+        page = _read_page(redis, key, posts.order_by(), direction, rank, page_size)
+    except RedisError:
+        log.exception("Feed index read failed, falling back to SQL")
+        return None
+
+    if page is None:
+        return None  # too many posts were filtered out, SQL will do it better
+
+    page_items, has_more = page
+    if direction == CURSOR_PREVIOUS:
+        page_items = page_items[-page_size:]
+        return CursorPage(
+            object_list=page_items,
+            next_cursor=encode_cursor(CURSOR_NEXT, page_items[-1], keys) if page_items else None,
+            previous_cursor=encode_cursor(CURSOR_PREVIOUS, page_items[0], keys) if has_more else None,
+        )
+
+    page_items = page_items[:page_size]
+    return CursorPage(
+        object_list=page_items,
+        next_cursor=encode_cursor(CURSOR_NEXT, page_items[-1], keys) if has_more else None,
+        previous_cursor=encode_cursor(CURSOR_PREVIOUS, page_items[0], keys) if values and page_items else None,
+    )
+
+
+def _cursor_rank(redis, key, direction, values):
+    """
+    Rank of the cursor post in the set, -1 for the first page
+    """
+    if not values:
+        return -1
+
+    rank = redis.zrevrank(key, str(values[-1]))
+    if rank is None:
+        # cursor post has left the index, continue from its last known score
+        rank = redis.zcount(key, f"({_score(values[0])}", "+inf")
+        if direction == CURSOR_NEXT:
+            rank -= 1
+    return rank
+
+
+def _read_page(redis, key, posts, direction, rank, page_size):
+    """
+    Reads ids next to the rank in batches until there's more than a page of them left after filtering.
+    Returns (posts, has_more) or None if that takes too many rounds.
+    """
+    page_items = []
+    batch_size = page_size * 2
+    for _ in range(FEED_INDEX_MAX_HYDRATION_ROUNDS):
+        if direction == CURSOR_PREVIOUS:
+            start, end = max(rank - batch_size, 0), rank - 1
+            if end < 0:
+                return page_items, False
+            ids = redis.zrevrange(key, start, end)
+            page_items = _hydrate(posts, ids) + page_items
+            rank = start
+            is_exhausted = start == 0
+        else:
+            ids = redis.zrevrange(key, rank + 1, rank + batch_size)
+            page_items += _hydrate(posts, ids)
+            rank += len(ids)
+            is_exhausted = len(ids) < batch_size
+
+        if len(page_items) > page_size:
+            return page_items, True
+
+        if is_exhausted:
+            return page_items, False
+
+    return None
+
+
+def _hydrate(posts, ids):
+    ids = [post_id.decode() for post_id in ids]
+    if not ids:
+        return []
+    posts_by_id = {str(post.id): post for post in posts.filter(id__in=ids)}
+    return [posts_by_id[post_id] for post_id in ids if post_id in posts_by_id]
+
+
+def _score(value):
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return value or 0
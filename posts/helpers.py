@@ -3,7 +3,11 @@ from datetime import datetime, timedelta
 
 from django.http import Http404
 
+from common.conditional import make_etag
+from common.vote_counters import merge_pending_upvotes
 from posts.models.post import Post
+from posts.models.views import PostView
+from posts.models.votes import PostVote
 
 POST_TYPE_ALL = "all"
 
@@ -15,6 +19,17 @@ ORDERING_TOP_WEEK = "top_week"
 ORDERING_TOP_MONTH = "top_month"
 ORDERING_TOP_YEAR = "top_year"
 
+# keyset pagination keys for each feed ordering, "-id" makes them unique
+ORDERING_KEYS = {
+    ORDERING_ACTIVITY: ["-last_activity_at", "-id"],
+    ORDERING_NEW: ["-published_at", "-created_at", "-id"],
+    ORDERING_HOT: ["-hotness", "-id"],
+    ORDERING_TOP: ["-upvotes", "-id"],
+    ORDERING_TOP_WEEK: ["-upvotes", "-id"],
+    ORDERING_TOP_MONTH: ["-upvotes", "-id"],
+    ORDERING_TOP_YEAR: ["-upvotes", "-id"],
+}
+
 MARKDOWN_IMAGES_RE = re.compile(r"!\[*\]\((.+)\)")
 
 
@@ -29,29 +44,84 @@ def extract_any_image(post):
     return None
 
 
+def post_validators(post, *extra):
+    """
+    ETag and Last-Modified for conditional GET of everything rendered from the post.
+    View counters are not a part of them, a page with a slightly outdated counter is still the same page.
+    """
+    return (
+        make_etag(*_post_version(post), *extra),
+        max(post.updated_at, post.last_activity_at),
+    )
+
+
+def posts_validators(posts, *extra):
+    posts = list(posts)
+    return (
+        make_etag(*[_post_version(post) for post in posts], *extra),
+        max((max(post.updated_at, post.last_activity_at) for post in posts), default=None),
+    )
+
+
+def _post_version(post):
+    # comments only bump last_activity_at and comment_count, votes only touch upvotes
+    return post.id, post.updated_at, post.last_activity_at, post.comment_count, post.upvotes
+
+
 def sort_feed(posts, ordering):
     if not ordering:
         return posts
 
-    if ordering == ORDERING_ACTIVITY:
-        return posts.order_by("-last_activity_at")
-    elif ordering == ORDERING_NEW:
-        return posts.order_by("-published_at", "-created_at")
-    elif ordering == ORDERING_TOP:
-        return posts.order_by("-upvotes")
-    elif ordering == ORDERING_HOT:
-        return posts.order_by("-hotness")
-    elif ordering == ORDERING_TOP_WEEK:
-        return posts.filter(
-            published_at__gte=datetime.utcnow() - timedelta(days=7)
-        ).order_by("-upvotes")
+    if ordering not in ORDERING_KEYS:
+        raise Http404()
+
+    if ordering == ORDERING_TOP_WEEK:
+        posts = posts.filter(published_at__gte=datetime.utcnow() - timedelta(days=7))
     elif ordering == ORDERING_TOP_MONTH:
-        return posts.filter(
-            published_at__gte=datetime.utcnow() - timedelta(days=31)
-        ).order_by("-upvotes")
+        posts = posts.filter(published_at__gte=datetime.utcnow() - timedelta(days=31))
     elif ordering == ORDERING_TOP_YEAR:
-        return posts.filter(
-            published_at__gte=datetime.utcnow() - timedelta(days=365)
-        ).order_by("-upvotes")
-    else:
-        raise Http404()
+        posts = posts.filter(published_at__gte=datetime.utcnow() - timedelta(days=365))
+
+    return posts.order_by(*ORDERING_KEYS[ordering])
+
+
+def load_viewer_state(posts, user):
+    """
+    Attaches is_voted, upvoted_at and unread_comments of the user to an already fetched page of posts
+    and adds not yet flushed votes to their upvotes.
+    Replaces correlated subqueries of Post.objects_for_user with one query per table for the whole page.
+    """
+    if hasattr(posts, "object_list"):
+        # paginator pages keep posts in object_list, evaluate it once and mutate in place
+        posts.object_list = load_viewer_state(posts.object_list, user)
+        return posts
+
+    posts = list(posts)
+    if not posts:
+        return posts
+
+    merge_pending_upvotes(posts)
+
+    if not user:
+        return posts
+
+    post_ids = [post.id for post in posts]
+    votes = dict(
+        PostVote.objects.filter(user=user, post_id__in=post_ids).values_list("post_id", "created_at")
+    )
+    seen_comment_seqs = dict(
+        PostView.objects.filter(user=user, post_id__in=post_ids).values_list("post_id", "seen_comment_seq")
+    )
+
+    # views of the last minute are still in the redis buffer, otherwise a just read post shows "+N new"
+    for post_id, seen_comment_seq in PostView.buffered_seen_comment_seqs(user, post_ids).items():
+        seen_comment_seqs[post_id] = max(seen_comment_seqs.get(post_id) or 0, seen_comment_seq)
+
+    for post in posts:
+        voted_at = votes.get(post.id)
+        post.is_voted = 1 if voted_at else None
+        post.upvoted_at = int(voted_at.timestamp() * 1000) if voted_at else None
+        seen_comment_seq = seen_comment_seqs.get(post.id)
+        post.unread_comments = max(post.comment_seq - seen_comment_seq, 0) if seen_comment_seq is not None else None
+
+    return posts
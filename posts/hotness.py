@@ -0,0 +1,107 @@
+import logging
+from datetime import datetime
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from posts.feed_index import set_post_score
+from posts.helpers import ORDERING_HOT
+from posts.models.post import Post
+
+log = logging.getLogger(__name__)
+
+HOTNESS_BATCH_SIZE = 500
+
+# Same formula update_hotness always used: every distinct commenter during the hotness period
+# adds ((period - comment age) in hours) ^ 1.3, so fresh discussions weigh more.
+# Posts outside the period (or hidden) have zero hotness.
+HOTNESS_SQL = """
+    case when posts.is_visible = true and posts.last_activity_at > %(since)s then coalesce(
+        (
+            select round(sum(
+                pow(
+                    greatest(%(period)s - abs(extract(epoch from age(c.created_at, now()))), 0) / 3600,
+                    1.3
+                )
+            ))
+            from (
+                select distinct on (author_id) created_at
+                from comments
+                where comments.post_id = posts.id
+                    and is_deleted = false
+                    and created_at > %(since)s
+                order by author_id, created_at desc
+            ) as c
+        )
+    , 0) else 0 end
+"""
+
+
+def update_posts_hotness(post_ids):
+    """
+    Recalculates hotness of given posts only and writes the rows which actually changed.
+    Returns number of updated posts.
+    """
+    post_ids = list(post_ids)
+    if not post_ids:
+        return 0
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            update posts
+            set hotness = fresh.hotness
+            from (
+                select posts.id, {HOTNESS_SQL} as hotness
+                from posts
+                where posts.id = any(%(post_ids)s::uuid[])
+            ) as fresh
+            where posts.id = fresh.id
+                and posts.hotness <> fresh.hotness
+            returning posts.id, posts.hotness, posts.type, posts.room_id, posts.label_code, posts.is_visible
+        """, {
+            **_hotness_params(),
+            "post_ids": [str(post_id) for post_id in post_ids],
+        })
+        changed = cursor.fetchall()
+
+    for post_id, hotness, post_type, room_id, label_code, is_visible in changed:
+        set_post_score(
+            SimpleNamespace(id=post_id, type=post_type, room_id=room_id, label_code=label_code, is_visible=is_visible),
+            ORDERING_HOT,
+            hotness,
+        )
+
+    return len(changed)
+
+
+def update_post_hotness(post_id):
+    return update_posts_hotness([post_id])
+
+
+def decay_hotness(batch_size=HOTNESS_BATCH_SIZE):
+    """
+    Applies time decay to all "hot" posts in small batches. Only posts which are still in the hotness period
+    or still have non-zero hotness are touched, and only changed rows are written.
+    """
+    since = datetime.utcnow() - settings.POST_HOTNESS_PERIOD
+    post_ids = list(
+        Post.objects
+        .filter(Q(is_visible=True, last_activity_at__gt=since) | ~Q(hotness=0))
+        .order_by()
+        .values_list("id", flat=True)
+    )
+
+    updated = 0
+    for start in range(0, len(post_ids), batch_size):
+        updated += update_posts_hotness(post_ids[start:start + batch_size])
+
+    return len(post_ids), updated
+
+
+def _hotness_params():
+    return {
+        "period": settings.POST_HOTNESS_PERIOD.total_seconds(),
+        "since": datetime.utcnow() - settings.POST_HOTNESS_PERIOD,
+    }
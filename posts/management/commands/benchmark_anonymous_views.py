@@ -0,0 +1,69 @@
+import random
+import time
+from types import SimpleNamespace
+from uuid import uuid4
+
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django_redis import get_redis_connection
+
+from posts.models.post import Post
+from posts.models.views import PostView, POST_VIEW_COUNTS_KEY, ANONYMOUS_VIEWS_KEY
+
+
+class Command(BaseCommand):
+    help = "Compares per-ip post_views rows vs redis HyperLogLog deduplication for anonymous views"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--views", type=int, default=10000, help="anonymous views per simulated minute")
+        parser.add_argument("--unique-ips", type=int, default=3000)
+        parser.add_argument("--posts", type=int, default=10)
+
+    def handle(self, *args, **options):
+        posts = list(Post.visible_objects().filter(is_public=True).order_by("-last_activity_at")[:options["posts"]])
+        if not posts:
+            self.stderr.write("No public posts to view")
+            return
+
+        ips = [f"10.{random.randint(0, 255)}.{random.randint(0, 255)}.{i % 256}" for i in range(options["unique_ips"])]
+        views = [(random.choice(posts), random.choice(ips)) for _ in range(options["views"])]
+        factory = RequestFactory()
+
+        # real posts are needed for post_views rows, nobody should see these rows and counters though
+        with transaction.atomic():
+            started_at = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                for post, ip in views:
+                    PostView.register_anonymous_view_in_db(factory.get("/", REMOTE_ADDR=ip), post)
+            db_elapsed = time.perf_counter() - started_at
+            db_writes = len([q for q in queries if not q["sql"].lstrip().lower().startswith("select")])
+            transaction.set_rollback(True)
+
+        # redis can't roll back, so the buffered way counts views of made-up post ids
+        synthetic_posts = {post.id: SimpleNamespace(id=uuid4()) for post in posts}
+        started_at = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            for post, ip in views:
+                PostView.register_buffered_anonymous_view(ip, synthetic_posts[post.id])
+        redis_elapsed = time.perf_counter() - started_at
+        redis_queries = len(queries)
+
+        for name, elapsed, queries_count in [
+            ("post_views rows", db_elapsed, f"{db_writes} writes"),
+            ("hyperloglog", redis_elapsed, f"{redis_queries} queries"),
+        ]:
+            self.stdout.write(
+                f"{name:>16}: {len(views)} views in {elapsed:.3f}s "
+                f"({len(views) / elapsed:.0f} views/sec), postgres: {queries_count}"
+            )
+
+        # cleanup
+        redis = get_redis_connection("default")
+        for post in synthetic_posts.values():
+            redis.hdel(POST_VIEW_COUNTS_KEY, str(post.id))
+            for key in redis.scan_iter(match=ANONYMOUS_VIEWS_KEY.format(post_id=post.id, window="*")):
+                redis.delete(key)
+
+        self.stdout.write("Done 🥙")
@@ -0,0 +1,59 @@
+import time
+from datetime import datetime
+
+from django.core.management import BaseCommand
+from django.test import RequestFactory
+
+from posts.api import json_feed
+from posts.models.post import Post
+
+
+class Command(BaseCommand):
+    help = "Measures bytes sent to a json_feed poller with and without conditional GET (ETag / Last-Modified)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--polls", type=int, default=100)
+        parser.add_argument(
+            "--change-every", type=int, default=0,
+            help="bump last_activity_at of the newest post every N polls to simulate new comments (writes to DB!)"
+        )
+
+    def handle(self, *args, **options):
+        for name, is_conditional in [("plain", False), ("conditional", True)]:
+            sent_bytes, not_modified_count, elapsed = self.poll(
+                options["polls"], options["change_every"], is_conditional
+            )
+            self.stdout.write(
+                f"{name:>11}: {options['polls']} polls in {elapsed:.3f}s, {sent_bytes} bytes sent, "
+                f"{not_modified_count} x 304"
+            )
+
+        self.stdout.write("Done 🥙")
+
+    def poll(self, polls, change_every, is_conditional):
+        factory = RequestFactory()
+        validators = {}
+        sent_bytes = 0
+        not_modified_count = 0
+
+        started_at = time.perf_counter()
+        for i in range(polls):
+            if change_every and i and i % change_every == 0:
+                newest_post = Post.visible_objects().order_by("-last_activity_at").first()
+                Post.objects.filter(id=newest_post.id).update(last_activity_at=datetime.utcnow())
+
+            request = factory.get("/feed.json", **(validators if is_conditional else {}))
+            request.me = None
+            response = json_feed(request)
+
+            sent_bytes += len(response.content)
+            if response.status_code == 304:
+                not_modified_count += 1
+            else:
+                validators = {
+                    "HTTP_IF_NONE_MATCH": response["ETag"],
+                    "HTTP_IF_MODIFIED_SINCE": response["Last-Modified"],
+                }
+        elapsed = time.perf_counter() - started_at
+
+        return sent_bytes, not_modified_count, elapsed
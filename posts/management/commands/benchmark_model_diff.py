@@ -0,0 +1,62 @@
+import time
+import uuid
+from datetime import datetime
+
+from django.core.management import BaseCommand
+from django.forms.models import model_to_dict
+
+from posts.models.post import Post
+from users.models.user import User
+
+
+class Command(BaseCommand):
+    help = "Measures construction cost of ModelDiffMixin models vs the old model_to_dict() snapshot"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        now = datetime.utcnow()
+
+        for model, make_row in [
+            (Post, lambda i: dict(
+                id=uuid.uuid4(), slug=f"post{i}", type=Post.TYPE_POST, title=f"Post {i}", text="Hello",
+                author_id=uuid.uuid4(), created_at=now, updated_at=now, last_activity_at=now, published_at=now,
+                coauthors=[], upvotes=i, hotness=i, is_visible=True,
+            )),
+            (User, lambda i: dict(
+                id=uuid.uuid4(), slug=f"user{i}", email=f"user{i}@example.com", full_name=f"User {i}",
+                created_at=now, updated_at=now, last_activity_at=now, membership_expires_at=now,
+            )),
+        ]:
+            fields = model._meta.concrete_fields
+            field_names = [field.name for field in model._meta.fields]
+            attnames = [field.attname for field in fields]
+            db_rows = []
+            for i in range(rows):
+                row = make_row(i)
+                db_rows.append([row.get(field.attname, field.get_default()) for field in fields])
+
+            # the same path querysets use to build instances
+            started_at = time.perf_counter()
+            instances = [model.from_db("default", attnames, row) for row in db_rows]
+            construction = time.perf_counter() - started_at
+
+            started_at = time.perf_counter()
+            for instance in instances:
+                model_to_dict(instance, fields=field_names)
+            legacy_snapshot = time.perf_counter() - started_at
+
+            started_at = time.perf_counter()
+            for instance in instances:
+                instance.has_changed
+            diff = time.perf_counter() - started_at
+
+            self.stdout.write(
+                f"{model.__name__:>5}: {rows} instances in {construction:.3f}s, "
+                f"old model_to_dict() snapshot would add {legacy_snapshot:.3f}s, "
+                f"diff on every instance {diff:.3f}s"
+            )
+
+        self.stdout.write("Done 🥙")
@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db.models import Q
+
+from posts.helpers import load_viewer_state
+from posts.models.post import Post
+from users.models.user import User
+
+
+class Command(BaseCommand):
+    help = "Compares feed rows/sec of correlated .extra() subqueries vs batched viewer state loading"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=str, required=True, help="slug or email of the viewer")
+        parser.add_argument("--pages", type=int, default=20)
+        parser.add_argument("--page-size", type=int, default=settings.DEFAULT_PAGE_SIZE)
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(Q(slug=options["user"]) | Q(email=options["user"])).first()
+        if not user:
+            self.stderr.write(f"No such user: {options['user']}")
+            return
+
+        pages = options["pages"]
+        page_size = options["page_size"]
+
+        def extra_path(offset):
+            return list(Post.objects_for_user(user).order_by("-last_activity_at")[offset:offset + page_size])
+
+        def batched_path(offset):
+            posts = Post.visible_objects().order_by("-last_activity_at")[offset:offset + page_size]
+            return load_viewer_state(posts, user)
+
+        for name, fetch_page in [("extra()", extra_path), ("batched", batched_path)]:
+            rows = 0
+            started_at = time.perf_counter()
+            for page in range(pages):
+                rows += len(fetch_page(page * page_size))
+            elapsed = time.perf_counter() - started_at
+            self.stdout.write(f"{name:>10}: {rows} rows in {elapsed:.3f}s = {rows / elapsed:.0f} rows/sec")
+
+        self.stdout.write("Done 🥙")
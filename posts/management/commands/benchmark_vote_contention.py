@@ -0,0 +1,81 @@
+import statistics
+import threading
+import time
+
+from django.core.management import BaseCommand
+from django.db import connection
+from django.db.models import F
+
+from common.vote_counters import flush_vote_counters
+from posts.models.post import Post
+from users.models.user import User
+
+
+def direct_vote(post, amount):
+    # what every vote did before: locks the post, author and coauthor rows until the update is done
+    User.objects.filter(slug__in=post.coauthors).update(upvotes=F("upvotes") + amount)
+    Post.objects.filter(id=post.id).update(upvotes=F("upvotes") + amount)
+    User.objects.filter(id=post.author_id).update(upvotes=F("upvotes") + amount)
+
+
+def buffered_vote(post, amount):
+    if amount > 0:
+        post.increment_vote_count()
+        post.author.increment_vote_count()
+    else:
+        post.decrement_vote_count()
+        post.author.decrement_vote_count()
+
+
+class Command(BaseCommand):
+    help = "Compares vote counter latency of row updates vs redis deltas with many voters hitting one post " \
+           "(postgres max_connections must allow one connection per voter)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--post", type=str, required=True, help="slug of the post to vote for")
+        parser.add_argument("--voters", type=int, default=200)
+        parser.add_argument("--rounds", type=int, default=5, help="upvote + retract pairs per voter")
+
+    def handle(self, *args, **options):
+        post = Post.objects.filter(slug=options["post"]).select_related("author").first()
+        if not post:
+            self.stderr.write(f"No such post: {options['post']}")
+            return
+
+        for name, vote in [("row updates", direct_vote), ("redis deltas", buffered_vote)]:
+            latencies, elapsed = self.run_voters(post, vote, options["voters"], options["rounds"])
+            latencies.sort()
+            self.stdout.write(
+                f"{name:>12}: {len(latencies)} votes in {elapsed:.3f}s ({len(latencies) / elapsed:.0f} votes/sec), "
+                f"p50 {statistics.median(latencies) * 1000:.1f}ms, "
+                f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms"
+            )
+
+        # every voter retracted its votes, so the flush doesn't change the counters
+        flush_vote_counters()
+
+        self.stdout.write("Done 🥙")
+
+    def run_voters(self, post, vote, voters, rounds):
+        latencies = []
+        barrier = threading.Barrier(voters)
+
+        def voter():
+            try:
+                barrier.wait()
+                for _ in range(rounds):
+                    for amount in (1, -1):
+                        started_at = time.perf_counter()
+                        vote(post, amount)
+                        latencies.append(time.perf_counter() - started_at)
+            finally:
+                connection.close()  # every thread has its own connection
+
+        threads = [threading.Thread(target=voter) for _ in range(voters)]
+        started_at = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return latencies, time.perf_counter() - started_at
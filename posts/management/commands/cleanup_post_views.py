@@ -10,7 +10,7 @@ class Command(BaseCommand):
     help = "Cleans up old and useless post views and history to save DB space"
 
     def handle(self, *args, **options):
-        # cleanup anonymous post_views older than 3 days
+        # cleanup anonymous post_views older than 3 days (new anonymous views are deduplicated in redis)
         with connection.cursor() as cursor:
             cursor.execute("""
                 delete from post_views where user_id is null and last_view_at < now() - interval '3 days'
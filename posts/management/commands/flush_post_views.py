@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from posts.models.views import PostView
+
+
+class Command(BaseCommand):
+    help = "Writes buffered post views from Redis to the database"
+
+    def handle(self, *args, **options):
+        view_count, view_count_delta = PostView.flush_buffered_views()
+        self.stdout.write(f"Flushed {view_count} views, +{view_count_delta} to view counters")
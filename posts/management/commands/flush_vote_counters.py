@@ -0,0 +1,13 @@
+from django.core.management import BaseCommand
+
+from common.vote_counters import flush_vote_counters
+
+
+class Command(BaseCommand):
+    help = "Writes buffered vote counters from Redis to the database"
+
+    def handle(self, *args, **options):
+        # normally done by a django-q task scheduled on votes, this is a safety net for lost tasks
+        flushed = flush_vote_counters()
+        for table, count in flushed.items():
+            self.stdout.write(f"Flushed {count} {table} counters")
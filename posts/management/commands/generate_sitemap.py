@@ -0,0 +1,16 @@
+from django.core.management import BaseCommand
+
+from posts.sitemaps import regenerate_sitemap
+
+
+class Command(BaseCommand):
+    help = "Regenerates sitemap shards of changed months (or all of them with --full) and the sitemap index"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="regenerate every month, e.g. after bulk updates")
+
+    def handle(self, *args, **options):
+        # changed months are normally regenerated by a django-q task scheduled on post changes
+        months = regenerate_sitemap(full=options["full"])
+        self.stdout.write(f"Regenerated {len(months)} sitemap shards")
+        self.stdout.write("Done 🥙")
@@ -0,0 +1,20 @@
+import logging
+
+from django.core.management import BaseCommand
+
+from posts.feed_index import rebuild_feed_index, INDEXED_ORDERINGS
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Rebuilds Redis feed index from scratch (use it for recovery or after bulk updates)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ordering", type=str, choices=list(INDEXED_ORDERINGS.keys()), required=False)
+
+    def handle(self, *args, **options):
+        orderings = [options["ordering"]] if options.get("ordering") else None
+        set_count = rebuild_feed_index(orderings=orderings)
+        self.stdout.write(f"Rebuilt {set_count} feed sets")
+        self.stdout.write("Done 🥙")
@@ -0,0 +1,112 @@
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from django_redis import get_redis_connection
+
+from common.locks import redis_lock
+from common.vote_counters import VOTE_COUNTERS_FLUSH_LOCK_KEY, VOTE_COUNTERS_FLUSH_LOCK_TIMEOUT, \
+    VOTE_COUNTERS_FLUSH_BATCH_SIZE, _flush_vote_counters, pending_upvote_deltas
+
+# counter name -> (table, column, query returning fresh (id, value) for every row)
+# upvotes columns are buffered by common.vote_counters, votes counted here can still wait there
+COUNTERS = {
+    "post_comments": ("posts", "comment_count", """
+        select posts.id, count(comments.id) as value
+        from posts
+        left join comments on comments.post_id = posts.id
+            and comments.is_visible = true
+            and comments.is_deleted = false
+            and comments.deleted_by is null
+        group by posts.id
+    """),
+    "post_upvotes": ("posts", "upvotes", """
+        select posts.id, count(post_votes.id) as value
+        from posts
+        left join post_votes on post_votes.post_id = posts.id
+        group by posts.id
+    """),
+    "comment_upvotes": ("comments", "upvotes", """
+        select comments.id, count(comment_votes.id) as value
+        from comments
+        left join comment_votes on comment_votes.comment_id = comments.id
+        group by comments.id
+    """),
+    # the same votes PostVote.upvote() and CommentVote.upvote() give to authors and coauthors
+    "user_upvotes": ("users", "upvotes", """
+        with received as (
+            select posts.author_id as user_id, count(*) as votes
+            from post_votes join posts on posts.id = post_votes.post_id
+            group by posts.author_id
+            union all
+            select users.id as user_id, count(*) as votes
+            from post_votes
+                join posts on posts.id = post_votes.post_id
+                join users on users.slug = any(posts.coauthors)
+            group by users.id
+            union all
+            select comments.author_id as user_id, count(*) as votes
+            from comment_votes join comments on comments.id = comment_votes.comment_id
+            group by comments.author_id
+        )
+        select users.id, coalesce(sum(received.votes), 0) as value
+        from users
+        left join received on received.user_id = users.id
+        group by users.id
+    """),
+}
+
+
+class Command(BaseCommand):
+    help = "Fixes drift of incrementally updated counters: post comments and upvotes, comment and user upvotes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--counter", choices=list(COUNTERS.keys()), action="append", help="default: all")
+        parser.add_argument("--dry-run", action="store_true", help="only count drifted rows")
+
+    def handle(self, *args, **options):
+        redis = get_redis_connection("default")
+
+        # a flush in the middle would add deltas of votes which are counted already
+        with redis_lock(VOTE_COUNTERS_FLUSH_LOCK_KEY, VOTE_COUNTERS_FLUSH_LOCK_TIMEOUT) as is_locked:
+            if is_locked and not options["dry_run"]:
+                _flush_vote_counters(redis, VOTE_COUNTERS_FLUSH_BATCH_SIZE)
+
+            for name in options["counter"] or COUNTERS.keys():
+                table, column, fresh_sql = COUNTERS[name]
+
+                pending = {}
+                if column == "upvotes":
+                    if not is_locked:
+                        self.stdout.write(f"{name}: skipped, vote counters are being flushed")
+                        continue
+                    # votes since the flush above are counted and will be added by the next flush too
+                    pending = pending_upvote_deltas(redis, table)
+
+                drifted = self.reconcile(table, column, fresh_sql, pending, options["dry_run"])
+                self.stdout.write(f"{name}: {drifted} {'drifted' if options['dry_run'] else 'fixed'}")
+
+        self.stdout.write("Done 🥙")
+
+    def reconcile(self, table, column, fresh_sql, pending, is_dry_run):
+        fresh_sql = f"""
+            select fresh.id, fresh.value - coalesce(pending.delta, 0) as value
+            from ({fresh_sql}) as fresh
+            left join unnest(%s::uuid[], %s::int[]) as pending(id, delta) on pending.id = fresh.id
+        """
+        params = [list(pending.keys()), list(pending.values())]
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            if is_dry_run:
+                cursor.execute(f"""
+                    select count(*)
+                    from {table} join ({fresh_sql}) as fresh on fresh.id = {table}.id
+                    where {table}.{column} <> fresh.value
+                """, params)
+                return cursor.fetchone()[0]
+
+            cursor.execute(f"""
+                update {table}
+                set {column} = fresh.value
+                from ({fresh_sql}) as fresh
+                where {table}.id = fresh.id and {table}.{column} <> fresh.value
+            """, params)
+            return cursor.rowcount
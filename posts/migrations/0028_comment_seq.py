@@ -0,0 +1,38 @@
+# Generated by Django 3.2.13 on 2023-08-14 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0027_auto_20230731_1014'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_seq',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='postview',
+            name='seen_comment_seq',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunSQL(
+            sql="""
+                update posts set comment_seq = comment_count;
+                update post_views set seen_comment_seq = greatest(posts.comment_seq - post_views.unread_comments, 0)
+                from posts where posts.id = post_views.post_id and post_views.user_id is not null;
+            """,
+            reverse_sql="""
+                update post_views set unread_comments = greatest(posts.comment_seq - post_views.seen_comment_seq, 0)
+                from posts where posts.id = post_views.post_id and post_views.user_id is not null;
+            """
+        ),
+        migrations.RemoveField(
+            model_name='postview',
+            name='unread_comments',
+        ),
+    ]
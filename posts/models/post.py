@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from uuid import uuid4
 
 from django.conf import settings
@@ -12,6 +12,8 @@ from simple_history.models import HistoricalRecords
 
 from common.data.labels import LABELS
 from common.models import ModelDiffMixin
+from common.rate_limits import is_rate_limited
+from common.vote_counters import increment_upvotes, decrement_upvotes
 from rooms.models import Room
 from users.models.user import User
 from utils.slug import generate_unique_slug
@@ -95,6 +97,7 @@ class Post(models.Model, ModelDiffMixin):
     deleted_at = models.DateTimeField(null=True)
 
     comment_count = models.IntegerField(default=0)
+    comment_seq = models.IntegerField(default=0)  # grows on every new comment, see PostView.seen_comment_seq
     view_count = models.IntegerField(default=0)
     upvotes = models.IntegerField(default=0, db_index=True)
     hotness = models.IntegerField(default=0, db_index=True)
@@ -117,6 +120,7 @@ class Post(models.Model, ModelDiffMixin):
             "last_activity_at",
             "published_at",
             "comment_count",
+            "comment_seq",
             "view_count",
             "upvotes",
             "hotness",
@@ -183,18 +187,18 @@ class Post(models.Model, ModelDiffMixin):
     def increment_vote_count(self):
         if self.coauthors:
             self.increment_coauthors_vote_count()
-        return Post.objects.filter(id=self.id).update(upvotes=F("upvotes") + 1)
+        return increment_upvotes(Post, [self.id])
 
     def decrement_vote_count(self):
         if self.coauthors:
             self.decrement_coauthors_vote_count()
-        return Post.objects.filter(id=self.id).update(upvotes=F("upvotes") - 1)
+        return decrement_upvotes(Post, [self.id])
 
     def increment_coauthors_vote_count(self):
-        return User.objects.filter(slug__in=self.coauthors).update(upvotes=F("upvotes") + 1)
+        return increment_upvotes(User, User.objects.filter(slug__in=self.coauthors).values_list("id", flat=True))
 
     def decrement_coauthors_vote_count(self):
-        return User.objects.filter(slug__in=self.coauthors, upvotes__gt=0).update(upvotes=F("upvotes") - 1)
+        return decrement_upvotes(User, User.objects.filter(slug__in=self.coauthors).values_list("id", flat=True))
 
     def can_edit(self, user):
         if not user:
@@ -289,21 +293,21 @@ class Post(models.Model, ModelDiffMixin):
                 "upvoted_at": "select ROUND(extract(epoch from created_at) * 1000) from post_votes "
                               "where post_votes.post_id = posts.id "
                               f"and post_votes.user_id = '{user.id}'",
-                "unread_comments": f"select unread_comments from post_views "
+                "unread_comments": f"select greatest(posts.comment_seq - seen_comment_seq, 0) from post_views "
                                    f"where post_views.post_id = posts.id "
                                    f"and post_views.user_id = '{user.id}'"
             })  # TODO: i've been trying to use .annotate() here for 2 hours and I have no idea why it's not working
 
     @classmethod
     def check_rate_limits(cls, user):
-        if user.is_moderator:
-            return True
-
-        day_post_count = Post.visible_objects()\
-            .filter(author=user, created_at__gte=datetime.utcnow() - timedelta(hours=24))\
-            .count()
-
-        return day_post_count < settings.RATE_LIMIT_POSTS_PER_DAY
+        # published posts are counted by posts.signals
+        return not is_rate_limited(
+            "post",
+            user.id,
+            db_count=lambda since: Post.visible_objects().filter(author=user, created_at__gte=since).count(),
+            user=user,
+            hit=False,
+        )
 
     @classmethod
     def get_user_intro(cls, user):
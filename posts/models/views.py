@@ -1,14 +1,47 @@
+import logging
 from datetime import datetime
 from uuid import uuid4
 
 from django.conf import settings
-from django.db import models
-from django.db.models import F
+from django.db import models, connection, transaction
+from django_redis import get_redis_connection
+from psycopg2.extras import execute_values
+from redis.exceptions import RedisError
 
+from common.locks import redis_lock
 from common.request import parse_ip_address
 from posts.models.post import Post
 from users.models.user import User
 
+log = logging.getLogger(__name__)
+
+# views are buffered in redis and written to post_views in bulk by flush_post_views
+POST_VIEWS_BUFFER_KEY = "post_views:buffer"  # "{post_id}:{user_id}" -> "{last_view_at}|{registered_view_at}|{seq}"
+POST_VIEWS_FLUSHING_KEY = "post_views:buffer:flushing"
+POST_VIEW_COUNTS_KEY = "post_views:counts"  # post_id -> view_count delta
+POST_VIEW_COUNTS_FLUSHING_KEY = "post_views:counts:flushing"
+POST_VIEWS_FLUSH_BATCH_SIZE = 1000
+POST_VIEWS_FLUSH_LOCK_KEY = "post_views:flush_lock"
+POST_VIEWS_FLUSH_LOCK_TIMEOUT = 10 * 60  # longer than any flush, frees the lock of a killed one
+
+# anonymous views are deduplicated by ip with a HyperLogLog per post and cooldown window,
+# view_count grows by the increase of its estimated cardinality (Lua keeps it atomic)
+ANONYMOUS_VIEWS_KEY = "post_views:anonymous:{post_id}:{window}"
+ANONYMOUS_VIEWS_SCRIPT = """
+if redis.call("PFADD", KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+local count = redis.call("PFCOUNT", KEYS[1])
+local counted = tonumber(redis.call("GET", KEYS[2]) or "0")
+redis.call("EXPIRE", KEYS[1], ARGV[3])
+if count <= counted then
+    return 0
+end
+redis.call("SET", KEYS[2], count, "EX", ARGV[3])
+redis.call("HINCRBY", KEYS[3], ARGV[2], count - counted)
+return count - counted
+"""
+
 
 class PostView(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
@@ -22,7 +55,8 @@ class PostView(models.Model):
     registered_view_at = models.DateTimeField(auto_now_add=True)
     last_view_at = models.DateTimeField(auto_now=True)
 
-    unread_comments = models.IntegerField(default=0)
+    # unread comments = post.comment_seq - seen_comment_seq, new comments don't touch post_views at all
+    seen_comment_seq = models.IntegerField(default=0)
 
     class Meta:
         db_table = "post_views"
@@ -30,6 +64,87 @@ class PostView(models.Model):
 
     @classmethod
     def register_view(cls, request, user, post):
+        try:
+            return cls.register_buffered_view(user, post)
+        except RedisError:
+            log.exception("Post views buffer is not available, writing view to DB")
+            return cls.register_view_in_db(user, post)
+
+    @classmethod
+    def register_buffered_view(cls, user, post):
+        redis = get_redis_connection("default")
+        buffer_field = f"{post.id}:{user.id}"
+        now = datetime.utcnow()
+
+        # the latest state is in the buffer (or in the flush in progress), DB has it only after the flush
+        buffered_view, flushing_view = redis.pipeline(transaction=False)\
+            .hget(POST_VIEWS_BUFFER_KEY, buffer_field)\
+            .hget(POST_VIEWS_FLUSHING_KEY, buffer_field)\
+            .execute()
+        buffered_view = buffered_view or flushing_view
+        if buffered_view:
+            last_view_at, registered_view_at, _ = _decode_buffered_view(buffered_view)
+            post_view = PostView(
+                user=user, post=post, last_view_at=last_view_at, registered_view_at=registered_view_at
+            )
+        else:
+            post_view = PostView.objects.filter(user=user, post=post).first()
+
+        is_view_created = post_view is None
+        if is_view_created:
+            post_view = PostView(user=user, post=post, first_view_at=now, registered_view_at=now, last_view_at=now)
+
+        # save last view timestamp to highlight comments
+        last_view_at = post_view.last_view_at
+
+        pipeline = redis.pipeline(transaction=False)
+
+        # increment view counter for new views or for re-opens after cooldown period
+        if is_view_created or post_view.registered_view_at < now - settings.POST_VIEW_COOLDOWN_PERIOD:
+            post_view.registered_view_at = now
+            pipeline.hincrby(POST_VIEW_COUNTS_KEY, str(post.id), 1)
+
+        # mark all comments as seen and store last view
+        post_view.seen_comment_seq = post.comment_seq
+        post_view.last_view_at = now
+        pipeline.hset(
+            POST_VIEWS_BUFFER_KEY,
+            buffer_field,
+            _encode_buffered_view(post_view.last_view_at, post_view.registered_view_at, post_view.seen_comment_seq),
+        )
+        pipeline.execute()
+
+        return post_view, last_view_at
+
+    @classmethod
+    def buffered_seen_comment_seqs(cls, user, post_ids):
+        """
+        Returns {post_id: seen_comment_seq} of views which are still in the buffer (not flushed to DB yet)
+        """
+        buffer_fields = [f"{post_id}:{user.id}" for post_id in post_ids]
+        if not buffer_fields:
+            return {}
+
+        try:
+            buffered_views, flushing_views = get_redis_connection("default").pipeline(transaction=False)\
+                .hmget(POST_VIEWS_BUFFER_KEY, buffer_fields)\
+                .hmget(POST_VIEWS_FLUSHING_KEY, buffer_fields)\
+                .execute()
+        except RedisError:
+            log.exception("Post views buffer is not available, using seen comments from DB")
+            return {}
+
+        seen_comment_seqs = {}
+        for post_id, buffered_view, flushing_view in zip(post_ids, buffered_views, flushing_views):
+            buffered_view = buffered_view or flushing_view
+            if buffered_view:
+                _, _, seen_comment_seq = _decode_buffered_view(buffered_view)
+                if seen_comment_seq is not None:
+                    seen_comment_seqs[post_id] = seen_comment_seq
+        return seen_comment_seqs
+
+    @classmethod
+    def register_view_in_db(cls, user, post):
         post_view, is_view_created = PostView.objects.get_or_create(
             user=user,
             post=post,
@@ -43,17 +158,105 @@ class PostView(models.Model):
             post_view.registered_view_at = datetime.utcnow()
             post.increment_view_count()
 
-        # reset counters and store last view
+        # mark all comments as seen and store last view
+        post_view.seen_comment_seq = post.comment_seq
         if not is_view_created:
-            post_view.unread_comments = 0
             post_view.last_view_at = datetime.utcnow()
 
         post_view.save()
 
         return post_view, last_view_at
 
+    @classmethod
+    def flush_buffered_views(cls, batch_size=POST_VIEWS_FLUSH_BATCH_SIZE):
+        """
+        Moves buffered views from redis to post_views and posts.view_count in bulk statements.
+        Returns the number of flushed views and the total view_count increment.
+        """
+        # cron runs every minute and a slow flush can still be running, two flushes of the same
+        # "flushing" keys would add view counts twice
+        with redis_lock(POST_VIEWS_FLUSH_LOCK_KEY, POST_VIEWS_FLUSH_LOCK_TIMEOUT) as is_locked:
+            if not is_locked:
+                log.info("Post views are being flushed by somebody else")
+                return 0, 0
+
+            return cls._flush_buffered_views(batch_size)
+
+    @classmethod
+    def _flush_buffered_views(cls, batch_size):
+        redis = get_redis_connection("default")
+
+        # failed flush leaves its data in "flushing" keys, retry it first and take the new buffer next time
+        for buffer_key, flushing_key in [
+            (POST_VIEWS_BUFFER_KEY, POST_VIEWS_FLUSHING_KEY),
+            (POST_VIEW_COUNTS_KEY, POST_VIEW_COUNTS_FLUSHING_KEY),
+        ]:
+            if not redis.exists(flushing_key) and redis.exists(buffer_key):
+                redis.rename(buffer_key, flushing_key)
+
+        views = []
+        for buffer_field, buffered_view in redis.hgetall(POST_VIEWS_FLUSHING_KEY).items():
+            post_id, user_id = buffer_field.decode().split(":", 1)
+            last_view_at, registered_view_at, seen_comment_seq = _decode_buffered_view(buffered_view)
+            views.append((str(uuid4()), user_id, post_id, registered_view_at, last_view_at, seen_comment_seq))
+
+        view_counts = [
+            (post_id.decode(), int(count)) for post_id, count in redis.hgetall(POST_VIEW_COUNTS_FLUSHING_KEY).items()
+        ]
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            for start in range(0, len(views), batch_size):
+                execute_values(cursor, """
+                    insert into post_views as pv
+                        (id, user_id, post_id, first_view_at, registered_view_at, last_view_at, seen_comment_seq)
+                    select
+                        v.id, v.user_id, v.post_id, v.registered_view_at, v.registered_view_at, v.last_view_at,
+                        coalesce(v.seen_comment_seq, posts.comment_seq)
+                    from (values %s) as v(id, user_id, post_id, registered_view_at, last_view_at, seen_comment_seq)
+                    join posts on posts.id = v.post_id
+                    join users on users.id = v.user_id
+                    on conflict (user_id, post_id) do update set
+                        registered_view_at = greatest(pv.registered_view_at, excluded.registered_view_at),
+                        last_view_at = greatest(pv.last_view_at, excluded.last_view_at),
+                        seen_comment_seq = greatest(pv.seen_comment_seq, excluded.seen_comment_seq)
+                """, views[start:start + batch_size],
+                    template="(%s::uuid, %s::uuid, %s::uuid, %s::timestamp, %s::timestamp, %s::integer)")
+
+            for start in range(0, len(view_counts), batch_size):
+                execute_values(cursor, """
+                    update posts
+                    set view_count = posts.view_count + v.delta
+                    from (values %s) as v(id, delta)
+                    where posts.id = v.id
+                """, view_counts[start:start + batch_size], template="(%s::uuid, %s)")
+
+        redis.delete(POST_VIEWS_FLUSHING_KEY, POST_VIEW_COUNTS_FLUSHING_KEY)
+
+        return len(views), sum(count for _, count in view_counts)
+
     @classmethod
     def register_anonymous_view(cls, request, post):
+        try:
+            return cls.register_buffered_anonymous_view(parse_ip_address(request), post)
+        except RedisError:
+            log.exception("Anonymous views deduplication is not available, view is not counted")
+            return 0
+
+    @classmethod
+    def register_buffered_anonymous_view(cls, ipaddress, post):
+        cooldown = int(settings.POST_VIEW_COOLDOWN_PERIOD.total_seconds())
+        window = int(datetime.utcnow().timestamp()) // cooldown
+        views_key = ANONYMOUS_VIEWS_KEY.format(post_id=post.id, window=window)
+
+        redis = get_redis_connection("default")
+        return redis.register_script(ANONYMOUS_VIEWS_SCRIPT)(
+            keys=[views_key, f"{views_key}:counted", POST_VIEW_COUNTS_KEY],
+            args=[ipaddress, str(post.id), cooldown * 2],
+        )
+
+    @classmethod
+    def register_anonymous_view_in_db(cls, request, post):
+        # old way: one post_views row per (post, ip), kept for benchmarks and comparison
         is_view_created = False
         post_view = PostView.objects.filter(
             post=post,
@@ -75,12 +278,15 @@ class PostView(models.Model):
 
         return post_view
 
-    @classmethod
-    def increment_unread_comments(cls, comment):
-        PostView.objects.filter(post=comment.post, last_view_at__lt=comment.created_at, user__isnull=False)\
-            .update(unread_comments=F("unread_comments") + 1)
 
-    @classmethod
-    def decrement_unread_comments(cls, comment):
-        PostView.objects.filter(post=comment.post, last_view_at__lt=comment.created_at, user__isnull=False)\
-            .update(unread_comments=F("unread_comments") - 1)
+def _encode_buffered_view(last_view_at, registered_view_at, seen_comment_seq):
+    return f"{last_view_at.timestamp()}|{registered_view_at.timestamp()}|{seen_comment_seq}"
+
+
+def _decode_buffered_view(value):
+    last_view_at, registered_view_at, *seen_comment_seq = value.decode().split("|")
+    return (
+        datetime.fromtimestamp(float(last_view_at)),
+        datetime.fromtimestamp(float(registered_view_at)),
+        int(seen_comment_seq[0]) if seen_comment_seq else None,  # buffered before comment_seq existed
+    )
@@ -1,5 +1,7 @@
 from django.contrib.syndication.views import Feed
 
+from common.conditional import not_modified, set_validators
+from posts.helpers import posts_validators
 from posts.models.post import Post
 
 
@@ -9,6 +11,16 @@ class NewPostsRss(Feed):
     description = ""
     limit = 20
 
+    def __call__(self, request, *args, **kwargs):
+        # feed readers poll all the time, answer them before building the feed
+        items = self._get_dynamic_attr("items", self.get_object(request, *args, **kwargs))
+        etag, last_modified = posts_validators(
+            # visible_objects() joins rooms and authors, .only() can't defer fields of a model it joins
+            items.select_related(None).only("id", "updated_at", "last_activity_at", "comment_count", "upvotes")
+        )
+        return not_modified(request, etag, last_modified) \
+            or set_validators(super().__call__(request, *args, **kwargs), etag, last_modified)
+
     def items(self):
         return Post.visible_objects()\
            .filter(is_approved_by_moderator=True)\
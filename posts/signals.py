@@ -0,0 +1,48 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from common.page_cache import invalidate_page_cache, PAGE_CACHE_TAG_POSTS
+from common.rate_limits import register_action
+from posts.feed_index import index_post, remove_post, increment_post_score
+from posts.helpers import ORDERING_TOP
+from posts.models.post import Post
+from posts.models.votes import PostVote
+from posts.sitemaps import mark_sitemap_shard
+
+
+@receiver(post_save, sender=Post)
+def update_feed_index(sender, instance, created, **kwargs):
+    # covers publishing and editing, new comments update counters with .update() and bump activity scores
+    # themselves in Comment.increment_post_counters()
+    index_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_post_for_rate_limits(sender, instance, created, **kwargs):
+    # the limit is for published posts like its DB fallback counts them, saving drafts doesn't count
+    if instance.is_visible and (created or "is_visible" in instance.changed_fields):
+        register_action("post", instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    invalidate_page_cache(PAGE_CACHE_TAG_POSTS, f"post:{instance.id}")
+    mark_sitemap_shard(instance)
+
+
+@receiver(post_delete, sender=Post)
+def delete_from_feed_index(sender, instance, **kwargs):
+    remove_post(instance)
+
+
+@receiver(post_save, sender=PostVote)
+def add_vote_to_feed_index(sender, instance, created, **kwargs):
+    # vote counters are updated with F() expressions and don't trigger post_save of the post itself
+    if created:
+        increment_post_score(instance.post, ORDERING_TOP, 1)
+
+
+@receiver(post_delete, sender=PostVote)
+def retract_vote_from_feed_index(sender, instance, **kwargs):
+    increment_post_score(instance.post, ORDERING_TOP, -1)
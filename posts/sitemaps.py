@@ -1,11 +1,47 @@
+import html
+import logging
+from datetime import datetime
+
+from django.conf import settings
 from django.contrib.sitemaps import Sitemap
+from django.urls import reverse
+from django_q.models import Schedule
+from django_q.tasks import schedule
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
 
 from posts.models.post import Post
 
+log = logging.getLogger(__name__)
+
+# sitemap is pre-generated into one shard per month of published_at and an index of them,
+# only shards with changed posts are re-rendered and crawlers get them as ready bytes
+SITEMAP_INDEX_KEY = "sitemap:index"
+SITEMAP_INDEX_LASTMOD_KEY = "sitemap:index:lastmod"
+SITEMAP_SHARD_KEY = "sitemap:shard:{month}"
+SITEMAP_SHARDS_KEY = "sitemap:shards"  # month -> when its content has changed last time
+SITEMAP_DIRTY_KEY = "sitemap:dirty"  # months to regenerate
+SITEMAP_REGENERATING_KEY = "sitemap:dirty:regenerating"
+SITEMAP_REGENERATE_SCHEDULED_KEY = "sitemap:regenerate_scheduled"
+SITEMAP_REGENERATE_SCHEDULED_TTL = 60 * 60  # lost tasks are rescheduled by the next post change after that
+
+SITEMAP_URLSET = """<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+{}</urlset>
+"""
+SITEMAP_INDEX = """<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+{}</sitemapindex>
+"""
+
+
+def public_posts():
+    return Post.visible_objects().filter(is_public=True)
+
 
 class PublicPostsSitemap(Sitemap):
     def items(self):
-        return Post.visible_objects().filter(is_public=True)
+        return public_posts()
 
     def lastmod(self, obj: Post):
         return obj.updated_at
@@ -14,3 +50,154 @@ class PublicPostsSitemap(Sitemap):
 sitemaps = {
     "public_posts": PublicPostsSitemap,
 }
+
+
+def sitemap_month(post):
+    return post.published_at.strftime("%Y-%m") if post.published_at else None
+
+
+def mark_sitemap_shard(post):
+    months = {sitemap_month(post)}
+
+    # a post moved to another month has to leave the old shard
+    published_at_diff = post.get_field_diff("published_at")
+    if published_at_diff and published_at_diff[0]:
+        months.add(published_at_diff[0].strftime("%Y-%m"))
+
+    months.discard(None)  # drafts are not in the sitemap
+    if not months:
+        return
+
+    try:
+        pipeline = get_redis_connection("default").pipeline(transaction=False)
+        pipeline.sadd(SITEMAP_DIRTY_KEY, *months)
+        pipeline.set(
+            SITEMAP_REGENERATE_SCHEDULED_KEY,
+            datetime.utcnow().isoformat(),
+            nx=True,
+            ex=SITEMAP_REGENERATE_SCHEDULED_TTL,
+        )
+        _, is_regenerate_needed = pipeline.execute()
+    except RedisError:
+        log.exception("Sitemap shards are not available, the change will be picked up by a full rebuild")
+        return
+
+    if is_regenerate_needed:
+        # one delayed task for all changes until then
+        schedule(
+            "posts.sitemaps.regenerate_sitemap",
+            schedule_type=Schedule.ONCE,
+            next_run=datetime.utcnow() + settings.SITEMAP_REGENERATE_DELAY,
+        )
+
+
+def regenerate_sitemap(full=False):
+    """
+    Re-renders shards of the months marked by mark_sitemap_shard() (or all of them) and the index.
+    Returns the list of regenerated months.
+    """
+    redis = get_redis_connection("default")
+    redis.delete(SITEMAP_REGENERATE_SCHEDULED_KEY)
+
+    if full:
+        months = {
+            month.strftime("%Y-%m") for month in public_posts().dates("published_at", "month")
+        } | {month.decode() for month in redis.hkeys(SITEMAP_SHARDS_KEY)}
+    else:
+        # failed run leaves its months in the "regenerating" key, retry them first and take new ones next time
+        if not redis.exists(SITEMAP_REGENERATING_KEY) and redis.exists(SITEMAP_DIRTY_KEY):
+            redis.rename(SITEMAP_DIRTY_KEY, SITEMAP_REGENERATING_KEY)
+        months = {month.decode() for month in redis.smembers(SITEMAP_REGENERATING_KEY)}
+
+    for month in sorted(months):
+        _regenerate_shard(redis, month)
+
+    shards = sorted(
+        (month.decode(), lastmod.decode()) for month, lastmod in redis.hgetall(SITEMAP_SHARDS_KEY).items()
+    )
+    index = SITEMAP_INDEX.format("".join(
+        f"<sitemap><loc>{settings.APP_HOST}{reverse('sitemap_shard', args=(month,))}</loc>"
+        f"<lastmod>{lastmod}+00:00</lastmod></sitemap>\n"
+        for month, lastmod in shards
+    ))
+    # removed shards change the index too, lastmods of the rest can't tell about it
+    if redis.get(SITEMAP_INDEX_KEY) != index.encode():
+        redis.pipeline()\
+            .set(SITEMAP_INDEX_KEY, index)\
+            .set(SITEMAP_INDEX_LASTMOD_KEY, datetime.utcnow().isoformat())\
+            .execute()
+
+    if not full:
+        redis.delete(SITEMAP_REGENERATING_KEY)
+
+    return sorted(months)
+
+
+def _regenerate_shard(redis, month):
+    year, month_number = map(int, month.split("-"))
+    posts = list(
+        public_posts()
+        .filter(published_at__year=year, published_at__month=month_number)
+        .order_by("published_at")
+        .only("type", "slug", "updated_at")
+    )
+
+    if not posts:
+        redis.pipeline()\
+            .delete(SITEMAP_SHARD_KEY.format(month=month))\
+            .hdel(SITEMAP_SHARDS_KEY, month)\
+            .execute()
+        return
+
+    shard = SITEMAP_URLSET.format("".join(
+        f"<url><loc>{html.escape(settings.APP_HOST + post.get_absolute_url())}</loc>"
+        f"<lastmod>{post.updated_at.strftime('%Y-%m-%d')}</lastmod></url>\n"
+        for post in posts
+    ))
+    old_shard, old_lastmod = redis.pipeline(transaction=False)\
+        .get(SITEMAP_SHARD_KEY.format(month=month))\
+        .hget(SITEMAP_SHARDS_KEY, month)\
+        .execute()
+    if old_shard == shard.encode() and old_lastmod:
+        return
+
+    # deleted, unpublished and hidden posts change the shard without leaving their updated_at in it,
+    # so it's the time of the change, not of the newest post there
+    lastmod = datetime.utcnow() if old_shard else max(post.updated_at for post in posts)
+    redis.pipeline()\
+        .set(SITEMAP_SHARD_KEY.format(month=month), shard)\
+        .hset(SITEMAP_SHARDS_KEY, month, lastmod.isoformat())\
+        .execute()
+
+
+def get_sitemap_index():
+    """
+    Returns (xml, lastmod) of the index or None if it hasn't been generated yet
+    """
+    try:
+        index, lastmod = get_redis_connection("default").pipeline(transaction=False)\
+            .get(SITEMAP_INDEX_KEY)\
+            .get(SITEMAP_INDEX_LASTMOD_KEY)\
+            .execute()
+    except RedisError:
+        log.exception("Sitemap shards are not available")
+        return None
+
+    if index is None:
+        return None
+    return index, datetime.fromisoformat(lastmod.decode()) if lastmod else None
+
+
+def get_sitemap_shard(month):
+    try:
+        shard, lastmod = get_redis_connection("default").pipeline(transaction=False)\
+            .get(SITEMAP_SHARD_KEY.format(month=month))\
+            .hget(SITEMAP_SHARDS_KEY, month)\
+            .execute()
+    except RedisError:
+        log.exception("Sitemap shards are not available")
+        return None
+
+    if shard is None:
+        return None
+    return shard, datetime.fromisoformat(lastmod.decode()) if lastmod else None
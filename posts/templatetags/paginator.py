@@ -1,10 +1,19 @@
 from django import template
 
+from common.pagination import CursorPage
+
 register = template.Library()
 
 
 @register.inclusion_tag("common/paginator.html")
 def paginator(items):
+    if isinstance(items, CursorPage):
+        # keyset pages don't know their numbers, only neighbours
+        return {
+            "items": items,
+            "is_cursor": True,
+        }
+
     adjacent_pages = 4
     num_pages = items.paginator.num_pages
     page = items.number
@@ -42,7 +42,8 @@ def render_post(context, post):
         if new_html != post.html:
             # to not flood into history
             post.html = new_html
-            post.save()
+            # upvotes can have pending votes merged in, saving them would count those votes twice
+            post.save(update_fields=["html"])
 
     return mark_safe(post.html or "")
 
@@ -1,7 +1,21 @@
 from datetime import datetime
+from unittest import mock
 
+from django.core.cache import cache
 from django.test import TestCase
+from django.test.client import RequestFactory
+from django.urls import reverse
+from django_redis import get_redis_connection
 
+from comments.models import Comment
+from common.pagination import paginate_by_cursor
+from common.vote_counters import flush_vote_counters
+from posts import feed_index
+from posts.feed_index import feed_index_key, increment_post_score, paginate_by_feed_index, rebuild_feed_index
+from posts.helpers import ORDERING_ACTIVITY, ORDERING_KEYS, ORDERING_NEW, ORDERING_TOP, ORDERING_TOP_WEEK, \
+    POST_TYPE_ALL, sort_feed
+from posts.models.post import Post
+from posts.models.votes import PostVote
 from posts.tests.test_views import ModelCreator
 
 
@@ -37,3 +51,153 @@ class TestApi(TestCase):
         )
         converted_post = post.to_dict()
         self.assertIsNotNone(converted_post["content_text"])
+
+
+class TestCursorPagination(TestCase):
+    def setUp(self):
+        self.creator = ModelCreator()
+        self.posts = [
+            self.creator.create_post(is_visible=True, is_public=True) for _ in range(5)
+        ]
+        self.factory = RequestFactory()
+
+    def _page(self, cursor=None):
+        request = self.factory.get("/feed/", data={"cursor": cursor} if cursor else {})
+        posts = sort_feed(Post.visible_objects(), ORDERING_ACTIVITY)
+        return paginate_by_cursor(request, posts, keys=ORDERING_KEYS[ORDERING_ACTIVITY], page_size=2)
+
+    def test_walk_forward_and_back(self):
+        expected = list(sort_feed(Post.visible_objects(), ORDERING_ACTIVITY))
+
+        first = self._page()
+        self.assertEqual(list(first), expected[:2])
+        self.assertFalse(first.has_previous())
+
+        second = self._page(first.next_cursor)
+        self.assertEqual(list(second), expected[2:4])
+
+        third = self._page(second.next_cursor)
+        self.assertEqual(list(third), expected[4:])
+        self.assertFalse(third.has_next())
+
+        back = self._page(third.previous_cursor)
+        self.assertEqual(list(back), expected[2:4])
+
+    def test_broken_cursor_shows_first_page(self):
+        self.assertEqual(list(self._page("garbage")), list(self._page()))
+
+
+class TestConditionalGet(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.creator = ModelCreator()
+        self.post = self.creator.create_post(is_visible=True, is_public=True)
+
+    def test_unchanged_feed_is_not_modified(self):
+        response = self.client.get(reverse("json_feed"))
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(reverse("json_feed"), HTTP_IF_NONE_MATCH=response["ETag"])
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_changed_post_is_modified(self):
+        url = reverse("api_show_post", args=(self.post.type, self.post.slug))
+        etag = self.client.get(url)["ETag"]
+
+        self.post.title = "new title"
+        self.post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "new title")
+
+
+class TestFeedIndex(TestCase):
+    def setUp(self):
+        self.creator = ModelCreator()
+        self.redis = get_redis_connection("default")
+        self.factory = RequestFactory()
+
+    def _score(self, post, ordering=ORDERING_NEW, post_type=POST_TYPE_ALL):
+        return self.redis.zscore(feed_index_key(ordering, post_type), str(post.id))
+
+    def test_post_is_indexed_on_save(self):
+        post = self.creator.create_post(is_visible=True, is_public=True)
+
+        self.assertEqual(self._score(post), (post.published_at or post.created_at).timestamp())
+        self.assertIsNotNone(self._score(post, post_type=post.type))
+        self.assertEqual(self._score(post, ORDERING_TOP), post.upvotes)
+
+    def test_hidden_and_deleted_posts_are_removed(self):
+        hidden = self.creator.create_post(is_visible=True, is_public=True)
+        hidden.is_visible = False
+        hidden.save()
+        self.assertIsNone(self._score(hidden))
+
+        deleted = self.creator.create_post(is_visible=True, is_public=True)
+        deleted_id = deleted.id
+        deleted.delete()
+        self.assertIsNone(self.redis.zscore(feed_index_key(ORDERING_NEW), str(deleted_id)))
+
+    def test_score_increments(self):
+        post = self.creator.create_post(is_visible=True, is_public=True)
+        increment_post_score(post, ORDERING_TOP, 3)
+        increment_post_score(post, ORDERING_TOP, -1)
+
+        self.assertEqual(self._score(post, ORDERING_TOP), post.upvotes + 2)
+
+    def test_new_comments_bump_activity_score(self):
+        post = self.creator.create_post(is_visible=True, is_public=True)
+        score = self._score(post, ORDERING_ACTIVITY)
+
+        Comment.increment_post_counters(post)
+
+        self.assertGreater(self._score(post, ORDERING_ACTIVITY), score)
+
+    def test_rebuild_keeps_changes_made_meanwhile(self):
+        flush_vote_counters()
+        voted = self.creator.create_post(is_visible=True, is_public=True)
+        hidden = self.creator.create_post(is_visible=True, is_public=True)
+        published = []
+        reindex_changed_posts = feed_index._reindex_changed_posts
+
+        def change_posts_and_reindex(*args):
+            # the snapshot is written already, signals only update live sets
+            published.append(self.creator.create_post(is_visible=True, is_public=True))
+            PostVote.upvote(self.creator.create_user(), voted)
+            hidden.is_visible = False
+            hidden.save()
+            return reindex_changed_posts(*args)
+
+        with mock.patch("posts.feed_index._reindex_changed_posts", change_posts_and_reindex):
+            rebuild_feed_index()
+
+        self.assertIsNotNone(self._score(published[0]))
+        self.assertIsNotNone(self._score(published[0], ORDERING_ACTIVITY))
+        self.assertEqual(self._score(voted, ORDERING_TOP), 1)
+        self.assertIsNone(self._score(hidden))
+
+    def test_paginate_by_feed_index(self):
+        posts = [self.creator.create_post(is_visible=True, is_public=True) for _ in range(3)]
+        rebuild_feed_index(orderings=[ORDERING_NEW])
+
+        request = self.factory.get("/feed/new/")
+        page = paginate_by_feed_index(request, Post.visible_objects(), ORDERING_NEW, page_size=100)
+
+        page_ids = [post.id for post in page]
+        self.assertEqual(
+            [post_id for post_id in page_ids if post_id in {post.id for post in posts}],
+            [post.id for post in reversed(posts)],
+        )
+
+    def test_paginate_by_feed_index_falls_back_to_sql(self):
+        posts = Post.visible_objects()
+
+        # old-style page links, not indexed orderings and combined filters go to SQL
+        self.assertIsNone(paginate_by_feed_index(self.factory.get("/", data={"page": 2}), posts, ORDERING_NEW))
+        self.assertIsNone(paginate_by_feed_index(self.factory.get("/"), posts, ORDERING_TOP_WEEK))
+        self.assertIsNone(paginate_by_feed_index(
+            self.factory.get("/"), posts, ORDERING_NEW, post_type=Post.TYPE_POST, room_slug="room"
+        ))
@@ -1,12 +1,39 @@
 import itertools
 from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
 
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.urls import reverse
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django_redis import get_redis_connection
 
+from bookmarks.models import PostBookmark
+from comments.models import Comment, CommentVote
+from common.locks import redis_lock
+from common.rate_limits import RATE_LIMITS_KEY
+from common.vote_counters import increment_upvotes, decrement_upvotes, merge_pending_upvotes, flush_vote_counters, \
+    VOTE_COUNTERS_FLUSH_LOCK_KEY
 from debug.helpers import HelperClient
+from users.models.mute import Muted
+from users.models.notes import UserNote
 from users.models.user import User
+from posts.helpers import load_viewer_state
 from posts.models.post import Post
+from posts.models.subscriptions import PostSubscription
+from posts.models.views import PostView, POST_VIEWS_BUFFER_KEY, POST_VIEWS_FLUSHING_KEY, POST_VIEW_COUNTS_KEY, \
+    POST_VIEW_COUNTS_FLUSHING_KEY, POST_VIEWS_FLUSH_LOCK_KEY
+from posts.models.votes import PostVote
+from posts.templatetags.posts import render_post
+from posts.sitemaps import regenerate_sitemap, SITEMAP_INDEX_KEY, SITEMAP_SHARDS_KEY, SITEMAP_DIRTY_KEY, \
+    SITEMAP_REGENERATING_KEY, SITEMAP_INDEX_LASTMOD_KEY
+from posts.viewer_context import PostViewerContext
+
+POST_PAGE_QUERY_BUDGET = 30
 
 class ModelCreator:
     _exist_posts = 0
@@ -18,7 +45,7 @@ class ModelCreator:
             type=Post.TYPE_POST,
             slug='test_{}'.format(self._exist_posts),
             title='title_{}'.format(self._exist_posts),
-            author=self.create_user(),
+            author=kwargs.pop("author", None) or self.create_user(),
             **kwargs,
         )
 
@@ -81,3 +108,303 @@ class TestPaymentModel(TestCase):
         if user is not None:
             client.authorise()
         return client
+
+
+class TestPostPageQueries(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.creator = ModelCreator()
+        self.user = self.creator.create_user()
+        self.client = HelperClient(self.user)
+        self.client.authorise()
+
+    def _post_page_queries(self, comment_count):
+        post = self.creator.create_post(is_visible=True, is_public=True)
+        for i in range(comment_count):
+            comment = Comment.objects.create(
+                post=post, author=self.creator.create_user(), text=f"comment {i}", html=f"<p>comment {i}</p>"
+            )
+            CommentVote.objects.create(user=self.user, comment=comment, post=post)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("show_post", args=(post.type, post.slug)))
+
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_post_page_queries_dont_depend_on_thread_size(self):
+        small_thread_queries = self._post_page_queries(comment_count=1)
+        big_thread_queries = self._post_page_queries(comment_count=30)
+
+        self.assertEqual(small_thread_queries, big_thread_queries)
+        self.assertLessEqual(big_thread_queries, POST_PAGE_QUERY_BUDGET)
+
+    def test_viewer_context_is_loaded_with_one_query(self):
+        post = self.creator.create_post(is_visible=True, is_public=True)
+        other_user = self.creator.create_user()
+        comment = Comment.objects.create(post=post, author=other_user, text="comment", html="<p>comment</p>")
+        PostVote.objects.create(user=self.user, post=post)
+        PostBookmark.objects.create(user=self.user, post=post)
+        PostSubscription.objects.create(user=self.user, post=post, type=PostSubscription.TYPE_ALL_COMMENTS)
+        CommentVote.objects.create(user=self.user, comment=comment, post=post)
+        Muted.objects.create(user_from=self.user, user_to=other_user)
+        UserNote.objects.create(user_from=self.user, user_to=other_user, text="note")
+
+        with self.assertNumQueries(1):
+            viewer = PostViewerContext.load(post, self.user)
+
+        self.assertTrue(viewer.is_voted)
+        self.assertTrue(viewer.is_bookmark)
+        self.assertEqual(viewer.subscription.type, PostSubscription.TYPE_ALL_COMMENTS)
+        self.assertEqual(list(viewer.comment_votes.keys()), [comment.id])
+        self.assertEqual(viewer.muted_user_ids, [other_user.id])
+        self.assertEqual(viewer.user_notes, {other_user.id: "note"})
+        self.assertIsNone(viewer.collectible_tag)
+
+    def test_anonymous_viewer_context_has_no_queries(self):
+        post = self.creator.create_post(is_visible=True, is_public=True)
+
+        with self.assertNumQueries(0):
+            viewer = PostViewerContext.load(post, None)
+
+        self.assertFalse(viewer.is_voted)
+        self.assertIsNone(viewer.subscription)
+
+
+class TestAnonymousPageCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.creator = ModelCreator()
+        self.post = self.creator.create_post(is_visible=True, is_public=True)
+        self.url = reverse("show_post", args=(self.post.type, self.post.slug))
+
+    def test_anonymous_post_page_is_rendered_once(self):
+        self.client.get(self.url)
+
+        # only the post itself is selected to check its visibility
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {"utm_source": "test"})
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_comment_invalidates_anonymous_post_page(self):
+        self.client.get(self.url)
+        Comment.objects.create(
+            post=self.post, author=self.creator.create_user(), text="fresh comment", html="<p>fresh comment</p>"
+        )
+
+        response = self.client.get(self.url)
+
+        self.assertContains(response, "fresh comment")
+
+    def test_comment_edit_changes_etag(self):
+        comment = Comment.objects.create(
+            post=self.post, author=self.creator.create_user(), text="old comment", html="<p>old comment</p>"
+        )
+        etag = self.client.get(self.url)["ETag"]
+
+        comment.text, comment.html = "edited comment", "<p>edited comment</p>"
+        comment.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "edited comment")
+
+
+class TestRss(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.creator = ModelCreator()
+        self.post = self.creator.create_post(
+            is_visible=True, is_public=True, is_approved_by_moderator=True, published_at=datetime.utcnow(),
+        )
+
+    def test_new_posts_rss(self):
+        response = self.client.get(reverse("rss"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, self.post.title)
+
+        response = self.client.get(reverse("rss"), HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_user_posts_rss(self):
+        response = self.client.get(reverse("user_rss", args=(self.post.author.slug,)))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, self.post.title)
+
+
+class TestPostRateLimits(TestCase):
+    def setUp(self):
+        self.creator = ModelCreator()
+        self.user = self.creator.create_user()
+        get_redis_connection("default").delete(RATE_LIMITS_KEY.format(action="post", subject=self.user.id))
+
+    def test_only_published_posts_are_counted(self):
+        with self.settings(RATE_LIMITS={**settings.RATE_LIMITS, "post": (1, timedelta(hours=24))}):
+            draft = self.creator.create_post(author=self.user, is_visible=False)
+            self.creator.create_post(author=self.user, is_visible=False)
+            self.assertTrue(Post.check_rate_limits(self.user))
+
+            draft.is_visible = True
+            draft.save()
+            self.assertFalse(Post.check_rate_limits(self.user))
+
+
+class TestSitemap(TestCase):
+    def setUp(self):
+        get_redis_connection("default").delete(
+            SITEMAP_INDEX_KEY, SITEMAP_INDEX_LASTMOD_KEY, SITEMAP_SHARDS_KEY, SITEMAP_DIRTY_KEY,
+            SITEMAP_REGENERATING_KEY,
+        )
+        self.creator = ModelCreator()
+        self.post = self.creator.create_post(is_visible=True, is_public=True)
+
+    def test_changed_months_are_regenerated(self):
+        month = self.post.published_at.strftime("%Y-%m")
+
+        self.assertEqual(regenerate_sitemap(), [month])
+
+        index = self.client.get(reverse("sitemap"))
+        self.assertContains(index, reverse("sitemap_shard", args=(month,)))
+
+        shard = self.client.get(reverse("sitemap_shard", args=(month,)))
+        self.assertContains(shard, self.post.get_absolute_url())
+
+        shard = self.client.get(
+            reverse("sitemap_shard", args=(month,)), HTTP_IF_MODIFIED_SINCE=shard["Last-Modified"]
+        )
+        self.assertEqual(shard.status_code, 304)
+
+        # nothing has changed since the last run
+        self.assertEqual(regenerate_sitemap(), [])
+
+    def test_hidden_post_changes_shard_lastmod(self):
+        other_post = self.creator.create_post(is_visible=True, is_public=True, published_at=self.post.published_at)
+        month = self.post.published_at.strftime("%Y-%m")
+        regenerate_sitemap()
+
+        # as if the shard was generated yesterday
+        yesterday = datetime.utcnow() - timedelta(days=1)
+        get_redis_connection("default").hset(SITEMAP_SHARDS_KEY, month, yesterday.isoformat())
+        last_modified = self.client.get(reverse("sitemap_shard", args=(month,)))["Last-Modified"]
+
+        self.post.is_visible = False
+        self.post.save()
+        regenerate_sitemap()
+
+        shard = self.client.get(reverse("sitemap_shard", args=(month,)), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(shard.status_code, 200)
+        self.assertNotContains(shard, self.post.get_absolute_url())
+        self.assertContains(shard, other_post.get_absolute_url())
+
+    def test_post_moved_to_another_month_leaves_old_shard(self):
+        old_month = self.post.published_at.strftime("%Y-%m")
+        regenerate_sitemap()
+
+        self.post.published_at = self.post.published_at - timedelta(days=40)
+        self.post.save()
+        new_month = self.post.published_at.strftime("%Y-%m")
+
+        self.assertEqual(regenerate_sitemap(), sorted([old_month, new_month]))
+        self.assertEqual(self.client.get(reverse("sitemap_shard", args=(old_month,))).status_code, 404)
+        self.assertContains(
+            self.client.get(reverse("sitemap_shard", args=(new_month,))), self.post.get_absolute_url()
+        )
+
+
+class TestPostViewsFlush(TestCase):
+    def setUp(self):
+        self.creator = ModelCreator()
+        self.post = self.creator.create_post(is_visible=True, is_public=True)
+        self.user = self.creator.create_user()
+        get_redis_connection("default").delete(
+            POST_VIEWS_BUFFER_KEY, POST_VIEWS_FLUSHING_KEY, POST_VIEW_COUNTS_KEY, POST_VIEW_COUNTS_FLUSHING_KEY,
+            POST_VIEWS_FLUSH_LOCK_KEY,
+        )
+
+    def test_buffered_views_are_written_once(self):
+        view_count = self.post.view_count
+
+        PostView.register_buffered_view(self.user, self.post)
+        self.assertFalse(PostView.objects.filter(post=self.post).exists())
+
+        self.assertEqual(PostView.flush_buffered_views(), (1, 1))
+        self.assertEqual(PostView.flush_buffered_views(), (0, 0))
+
+        post_view = PostView.objects.get(post=self.post, user=self.user)
+        self.assertEqual(post_view.seen_comment_seq, self.post.comment_seq)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, view_count + 1)
+
+    def test_concurrent_flush_is_skipped(self):
+        PostView.register_buffered_view(self.user, self.post)
+
+        with redis_lock(POST_VIEWS_FLUSH_LOCK_KEY, 60):
+            self.assertEqual(PostView.flush_buffered_views(), (0, 0))
+
+        self.assertEqual(PostView.flush_buffered_views(), (1, 1))
+
+    def test_buffered_view_marks_comments_as_read(self):
+        PostView.objects.create(user=self.user, post=self.post, seen_comment_seq=2)
+        Post.objects.filter(id=self.post.id).update(comment_seq=5)
+        self.post.refresh_from_db()
+
+        PostView.register_buffered_view(self.user, self.post)
+        post, = load_viewer_state([self.post], self.user)
+
+        self.assertEqual(post.unread_comments, 0)
+
+
+class TestVoteCounters(TestCase):
+    def setUp(self):
+        self.creator = ModelCreator()
+        self.post = self.creator.create_post(is_visible=True, is_public=True, text="text")
+        redis = get_redis_connection("default")
+        redis.delete(VOTE_COUNTERS_FLUSH_LOCK_KEY)
+        flush_vote_counters()
+
+    def test_rendering_merged_post_doesnt_save_pending_votes(self):
+        increment_upvotes(Post, [self.post.id], 3)
+        post = merge_pending_upvotes([Post.objects.get(id=self.post.id)])[0]
+        self.assertEqual(post.upvotes, 3)
+
+        Post.objects.filter(id=self.post.id).update(html=None)
+        post.html = None
+        render_post({}, post)
+        flush_vote_counters()
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.upvotes, 3)
+
+    def test_reconcile_doesnt_count_buffered_votes_twice(self):
+        PostVote.upvote(self.creator.create_user(), self.post)
+
+        call_command("reconcile_counters", stdout=StringIO())
+        flush_vote_counters()
+
+        self.post.refresh_from_db()
+        self.post.author.refresh_from_db()
+        self.assertEqual(self.post.upvotes, 1)
+        self.assertEqual(self.post.author.upvotes, 1)
+
+    def test_reconcile_leaves_votes_after_its_flush_to_the_next_one(self):
+        PostVote.upvote(self.creator.create_user(), self.post)
+
+        # as if the vote came right after the flush made by reconcile
+        with mock.patch("posts.management.commands.reconcile_counters._flush_vote_counters"):
+            call_command("reconcile_counters", "--counter", "post_upvotes", stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.upvotes, 0)
+
+        flush_vote_counters()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.upvotes, 1)
+
+    def test_upvotes_never_go_below_zero(self):
+        decrement_upvotes(Post, [self.post.id], 2)
+        flush_vote_counters()
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.upvotes, 0)
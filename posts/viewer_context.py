@@ -0,0 +1,93 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from django.db import connection
+
+from posts.models.subscriptions import PostSubscription
+from tags.models import Tag
+
+# every per-viewer bit of the post page in one round trip, it used to be 8 separate queries
+POST_VIEWER_CONTEXT_SQL = """
+    select
+        exists(
+            select 1 from post_bookmarks where post_id = %(post_id)s and user_id = %(user_id)s
+        ) as is_bookmark,
+        vote.created_at,
+        subscription.id,
+        subscription.type,
+        array(select user_to_id from muted where user_from_id = %(user_id)s) as muted_user_ids,
+        notes.user_ids,
+        notes.texts,
+        tag.code,
+        tag."group",
+        tag.name,
+        exists(
+            select 1 from user_tags where tag_id = tag.code and user_id = %(user_id)s
+        ) as is_collectible_tag_collected,
+        comment_votes.comment_ids,
+        comment_votes.created_at
+    from (select 1) as viewer
+    left join post_votes as vote on vote.post_id = %(post_id)s and vote.user_id = %(user_id)s
+    left join lateral (
+        select id, type from post_subscriptions where post_id = %(post_id)s and user_id = %(user_id)s limit 1
+    ) as subscription on true
+    left join lateral (
+        select array_agg(user_to_id) as user_ids, array_agg(text) as texts
+        from (select user_to_id, text from user_notes where user_from_id = %(user_id)s limit 100) as user_notes
+    ) as notes on true
+    left join tags as tag on tag.code = %(tag_code)s
+    left join lateral (
+        select array_agg(comment_id) as comment_ids, array_agg(created_at) as created_at
+        from comment_votes where post_id = %(post_id)s and user_id = %(user_id)s
+    ) as comment_votes on true
+"""
+
+
+@dataclass
+class PostViewerContext:
+    is_bookmark: bool = False
+    voted_at: Optional[datetime] = None
+    subscription: Optional[PostSubscription] = None
+    muted_user_ids: list = field(default_factory=list)
+    user_notes: dict = field(default_factory=dict)
+    collectible_tag: Optional[Tag] = None
+    is_collectible_tag_collected: bool = False
+    comment_votes: dict = field(default_factory=dict)  # comment_id -> voted_at
+
+    @property
+    def is_voted(self):
+        return self.voted_at is not None
+
+    @property
+    def upvoted_at(self):
+        return int(self.voted_at.timestamp() * 1000) if self.voted_at else None
+
+    @classmethod
+    def load(cls, post, user):
+        if not user:
+            return cls()
+
+        with connection.cursor() as cursor:
+            cursor.execute(POST_VIEWER_CONTEXT_SQL, {
+                "post_id": post.id,
+                "user_id": user.id,
+                "tag_code": post.collectible_tag_code,
+            })
+            (
+                is_bookmark, voted_at, subscription_id, subscription_type, muted_user_ids, note_user_ids, note_texts,
+                tag_code, tag_group, tag_name, is_collectible_tag_collected, comment_ids, comment_voted_at
+            ) = cursor.fetchone()
+
+        return cls(
+            is_bookmark=is_bookmark,
+            voted_at=voted_at,
+            subscription=PostSubscription(
+                id=subscription_id, user=user, post=post, type=subscription_type
+            ) if subscription_id else None,
+            muted_user_ids=muted_user_ids,
+            user_notes=dict(zip(note_user_ids or [], note_texts or [])),
+            collectible_tag=Tag(code=tag_code, group=tag_group, name=tag_name) if tag_code else None,
+            is_collectible_tag_collected=is_collectible_tag_collected,
+            comment_votes=dict(zip(comment_ids or [], comment_voted_at or [])),
+        )
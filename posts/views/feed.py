@@ -6,8 +6,10 @@ from django.shortcuts import get_object_or_404, render
 from authn.decorators.auth import require_auth
 from club import features
 from common.feature_flags import feature_switch, noop
-from common.pagination import paginate
-from posts.helpers import POST_TYPE_ALL, ORDERING_ACTIVITY, ORDERING_NEW, sort_feed
+from common.pagination import paginate_by_cursor
+from posts.feed_index import paginate_by_feed_index
+from posts.helpers import POST_TYPE_ALL, ORDERING_ACTIVITY, ORDERING_NEW, ORDERING_KEYS, sort_feed, \
+    load_viewer_state
 from posts.models.post import Post
 from rooms.models import Room
 from users.models.mute import Muted
@@ -19,9 +21,8 @@ def feed(request, post_type=POST_TYPE_ALL, room_slug=None, label_code=None, orde
 
     if request.me:
         request.me.update_last_activity()
-        posts = Post.objects_for_user(request.me)
-    else:
-        posts = Post.visible_objects()
+
+    posts = Post.visible_objects()
 
     # filter posts by type
     if post_type != POST_TYPE_ALL:
@@ -65,15 +66,20 @@ def feed(request, post_type=POST_TYPE_ALL, room_slug=None, label_code=None, orde
     # for main page — add pinned posts
     pinned_posts = []
     if ordering == ORDERING_ACTIVITY:
-        pinned_posts = posts.filter(is_pinned_until__gte=datetime.utcnow())
+        pinned_posts = load_viewer_state(posts.filter(is_pinned_until__gte=datetime.utcnow()), request.me)
         posts = posts.exclude(id__in=[p.id for p in pinned_posts])
 
+    # take page from redis index if possible, sort in SQL otherwise
+    page = paginate_by_feed_index(request, posts, ordering, post_type, room_slug, label_code)
+    if page is None:
+        page = paginate_by_cursor(request, posts, keys=ORDERING_KEYS.get(ordering))
+
     return render(request, "feed.html", {
         "post_type": post_type or POST_TYPE_ALL,
         "ordering": ordering,
         "room": room,
         "label_code": label_code,
-        "posts": paginate(request, posts),
+        "posts": load_viewer_state(page, request.me),
         "pinned_posts": pinned_posts,
         "date_month_ago": datetime.utcnow() - timedelta(days=30),
     })
@@ -7,15 +7,20 @@ from django.views.decorators.http import require_http_methods
 from authn.helpers import check_user_permissions
 from authn.decorators.auth import require_auth
 from club.exceptions import AccessDenied, ContentDuplicated, RateLimitException
+from comments.cache import comment_thread_version
+from common.conditional import not_modified, set_validators
+from common.page_cache import cached_anonymous_page
+from common.vote_counters import merge_pending_upvotes
 from authn.decorators.api import api
 from posts.forms.compose import POST_TYPE_MAP, PostTextForm
+from posts.helpers import post_validators
 from posts.models.linked import LinkedPost
 from posts.models.post import Post
 from posts.models.subscriptions import PostSubscription
 from posts.models.views import PostView
 from posts.models.votes import PostVote
 from posts.renderers import render_post
-from search.models import SearchIndex
+from search.queue import enqueue_post_index
 
 
 def show_post(request, post_type, post_slug):
@@ -36,7 +41,6 @@ def show_post(request, post_type, post_slug):
             return access_denied
 
     # record a new view
-    last_view_at = None
     if request.me:
         request.me.update_last_activity()
         post_view, last_view_at = PostView.register_view(
@@ -44,12 +48,32 @@ def show_post(request, post_type, post_slug):
             user=request.me,
             post=post,
         )
-    else:
-        PostView.register_anonymous_view(
-            request=request,
-            post=post,
-        )
+        return render_post(request, post, {
+            "post_last_view_at": last_view_at,
+            "linked_posts": visible_linked_posts(post),
+        })
+
+    PostView.register_anonymous_view(
+        request=request,
+        post=post,
+    )
+
+    # the rest of the page is the same for all anonymous visitors, crawlers get 304 until the post changes
+    comment_order = request.GET.get("comment_order")
+    etag, _ = post_validators(post, comment_order, comment_thread_version(post.id))
+    # comment edits, pins and votes don't touch the post, so there's no Last-Modified to give, only the ETag
+    last_modified = None
+    return not_modified(request, etag, last_modified) or cached_anonymous_page(
+        request,
+        render=lambda: set_validators(render_post(request, post, {
+            "linked_posts": visible_linked_posts(post),
+        }), etag, last_modified),
+        tags=[f"post:{post.id}"],
+        query_params=["comment_order"],
+    )
+
 
+def visible_linked_posts(post):
     # find linked posts and sort them by upvotes
     linked_posts = sorted({
         link.post_to if link.post_to != post else link.post_from
@@ -57,12 +81,7 @@ def show_post(request, post_type, post_slug):
     }, key=lambda p: p.upvotes, reverse=True)
 
     # force cleanup deleted/hidden posts from linked
-    linked_posts = [p for p in linked_posts if p.is_visible]
-
-    return render_post(request, post, {
-        "post_last_view_at": last_view_at,
-        "linked_posts": linked_posts,
-    })
+    return [p for p in linked_posts if p.is_visible]
 
 
 @require_auth
@@ -122,9 +141,11 @@ def upvote_post(request, post_slug):
         request=request,
     )
 
+    merge_pending_upvotes([post])
+
     return {
         "post": {
-            "upvotes": post.upvotes + (1 if is_vote_created else 0),
+            "upvotes": post.upvotes,
         },
         "upvoted_timestamp": int(post_vote.created_at.timestamp() * 1000) if post_vote else 0
     }
@@ -141,10 +162,12 @@ def retract_post_vote(request, post_slug):
         post=post,
     )
 
+    merge_pending_upvotes([post])
+
     return {
         "success": is_retracted,
         "post": {
-            "upvotes": post.upvotes - (1 if is_retracted else 0)
+            "upvotes": post.upvotes,
         }
     }
 
@@ -244,7 +267,7 @@ def create_or_edit(request, post_type, post=None, mode="create"):
             if post.room:
                 post.room.update_last_activity()
 
-            SearchIndex.update_post_index(post)
+            enqueue_post_index(post)
             LinkedPost.create_links_from_text(post, post.text)
 
         action = request.POST.get("action")
@@ -0,0 +1,27 @@
+from django.contrib.sitemaps.views import sitemap
+from django.http import Http404, HttpResponse
+
+from common.conditional import not_modified, set_validators
+from posts.sitemaps import get_sitemap_index, get_sitemap_shard, sitemaps
+
+
+def sitemap_index(request):
+    index = get_sitemap_index()
+    if not index:
+        # not generated yet, render it the old way
+        return sitemap(request, sitemaps=sitemaps)
+
+    xml, lastmod = index
+    return not_modified(request, last_modified=lastmod) \
+        or set_validators(HttpResponse(xml, content_type="application/xml"), last_modified=lastmod)
+
+
+def sitemap_shard(request, month):
+    shard = get_sitemap_shard(month)
+    if not shard:
+        raise Http404()
+
+    # crawlers re-download only the months with changed posts
+    xml, lastmod = shard
+    return not_modified(request, last_modified=lastmod) \
+        or set_validators(HttpResponse(xml, content_type="application/xml"), last_modified=lastmod)
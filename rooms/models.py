@@ -4,6 +4,8 @@ from datetime import datetime, timedelta
 from django.db import models
 from django.urls import reverse
 
+from common.activity import track_activity
+
 
 class Room(models.Model):
     slug = models.CharField(primary_key=True, max_length=32, unique=True)
@@ -49,7 +51,9 @@ class Room(models.Model):
     def update_last_activity(self):
         now = datetime.utcnow()
         if self.last_activity_at < now - timedelta(minutes=5):
-            return Room.objects.filter(slug=self.slug).update(last_activity_at=now)
+            # written to DB in bulk by flush_activity
+            self.last_activity_at = now
+            track_activity(self, now)
 
     def get_private_url(self):
         if self.url or self.chat_url:
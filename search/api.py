@@ -2,7 +2,7 @@ from django.http import Http404, JsonResponse
 
 from authn.decorators.api import api
 from tags.models import Tag
-from users.models.user import User
+from users.directory import get_member_directory
 
 MIN_PREFIX_LENGTH = 3
 MAX_PREFIX_LENGTH = 15
@@ -20,7 +20,7 @@ def api_search_users(request):
             "users": []
         })
 
-    suggested_users = User.registered_members().filter(slug__startswith=prefix)[:5]
+    suggested_users = get_member_directory().autocomplete(prefix, limit=5)
 
     return JsonResponse({
         "users": [{
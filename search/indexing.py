@@ -0,0 +1,104 @@
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+
+from comments.models import Comment
+from posts.models.post import Post
+from search.models import SearchIndex, comment_search_vector, post_search_vector, user_search_vector, \
+    intro_search_vector
+from users.models.user import User
+
+# postgres 12 has no gen_random_uuid() without pgcrypto
+RANDOM_UUID_SQL = "md5(random()::text || clock_timestamp()::text)::uuid"
+
+# columns of search_index in the order index_rows_sql() selects them
+INDEX_COLUMNS = "id, type, {object_column}, tags, created_at, updated_at, index, index_simple, index_russian"
+
+# vectors selected by rows() for the index columns: vector -> index, vector_simple -> index_simple, ...
+VECTOR_SUFFIXES = {"": None, "_simple": "simple", "_russian": "russian"}
+
+
+class IndexSource:
+    """
+    Everything that has to be in the search index of one type, as one SELECT.
+    Set-based indexers (bulk rebuild, indexing queue) select rows with it instead of one object at a time.
+    """
+
+    def __init__(self, index_type, object_column, rows, vector_sql="q.vector{suffix}", tags_sql="null"):
+        self.index_type = index_type
+        self.object_column = object_column
+        self.rows = rows  # () -> queryset of id, indexed_at, vectors and whatever vector_sql and tags_sql need
+        self.vector_sql = vector_sql
+        self.tags_sql = tags_sql
+
+    @property
+    def columns(self):
+        return INDEX_COLUMNS.format(object_column=self.object_column)
+
+    def index_rows_sql(self, queryset, updated_at):
+        select_sql, params = queryset.query.sql_with_params()
+        vectors_sql = ", ".join(self.vector_sql.format(suffix=suffix) for suffix in VECTOR_SUFFIXES)
+        return f"""
+            select {RANDOM_UUID_SQL}, %s, q.id, {self.tags_sql}, q.indexed_at, %s, {vectors_sql}
+            from ({select_sql}) as q
+        """, [self.index_type, updated_at, *params]
+
+
+def indexable_comments():
+    comment_vectors = vectors(comment_search_vector)
+    return Comment.visible_objects()\
+        .filter(is_deleted=False, post__is_visible=True)\
+        .annotate(**comment_vectors, indexed_at=F("created_at"))\
+        .values("id", "indexed_at", *comment_vectors)
+
+
+def indexable_posts():
+    post_vectors = vectors(post_search_vector)
+    return Post.visible_objects()\
+        .filter(is_shadow_banned=False)\
+        .annotate(**post_vectors, indexed_at=Coalesce("published_at", "created_at"))\
+        .values("id", "indexed_at", *post_vectors)
+
+
+def indexable_users():
+    user_vectors = vectors(user_search_vector)
+    intro_vectors = {
+        name: Subquery(
+            Post.objects
+            .filter(author=OuterRef("pk"), type=Post.TYPE_INTRO)
+            .annotate(vector=vector)
+            .values("vector")[:1],
+            output_field=SearchVectorField(),
+        )
+        for name, vector in vectors(intro_search_vector, prefix="intro_vector").items()
+    }
+
+    return User.objects\
+        .filter(moderation_status=User.MODERATION_STATUS_APPROVED)\
+        .annotate(
+            **user_vectors,
+            **intro_vectors,
+            indexed_at=F("created_at"),
+            tag_codes=RawSQL(
+                f"array(select tag_id from user_tags where user_id = {User._meta.db_table}.id limit 100)", []
+            ),
+        )\
+        .values("id", "indexed_at", *user_vectors, *intro_vectors, "tag_codes")
+
+
+def vectors(search_vector, prefix="vector"):
+    return {
+        f"{prefix}{suffix}": search_vector(config=config) for suffix, config in VECTOR_SUFFIXES.items()
+    }
+
+
+INDEX_SOURCES = {
+    SearchIndex.TYPE_COMMENT: IndexSource(SearchIndex.TYPE_COMMENT, "comment_id", indexable_comments),
+    SearchIndex.TYPE_POST: IndexSource(SearchIndex.TYPE_POST, "post_id", indexable_posts),
+    SearchIndex.TYPE_USER: IndexSource(
+        SearchIndex.TYPE_USER, "user_id", indexable_users,
+        vector_sql="q.vector{suffix} || coalesce(q.intro_vector{suffix}, ''::tsvector)",
+        tags_sql="q.tag_codes",
+    ),
+}
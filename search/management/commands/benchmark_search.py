@@ -0,0 +1,100 @@
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+
+from search.indexing import RANDOM_UUID_SQL
+from search.models import SearchIndex
+
+# frequent words come first, rows pick words closer to the start of the vocabulary more often
+POPULAR_WORDS = [
+    "работа", "деньги", "город", "жизнь", "проект", "команда", "компания", "время", "код", "дом",
+    "книга", "путешествие", "здоровье", "стартап", "ипотека", "переезд", "собака", "велосипед",
+]
+VOCABULARY_SIZE = 20000
+
+QUERIES = [
+    POPULAR_WORDS[0],
+    POPULAR_WORDS[-1],
+    f"{POPULAR_WORDS[1]} {POPULAR_WORDS[2]}",
+    f"{POPULAR_WORDS[3]} OR {POPULAR_WORDS[4]}",
+    f"слово{VOCABULARY_SIZE - 1}",
+]
+
+
+class Command(BaseCommand):
+    help = "Compares exact and top-k search on a synthetic index. Rows are inserted in a transaction and rolled back"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--words-per-row", type=int, default=40)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write(f"Generating {options['rows']} synthetic index rows...")
+            started_at = time.perf_counter()
+            self.generate_rows(options["rows"], options["words_per_row"])
+            self.stdout.write(f"Generated in {time.perf_counter() - started_at:.1f}s")
+
+            for query in QUERIES:
+                exact_seconds, exact_count = self.measure(self.search_all, query, options["repeat"])
+                top_seconds, top_count = self.measure(self.search_top, query, options["repeat"])
+                self.stdout.write(
+                    f"«{query}»: exact {exact_seconds * 1000:.0f}ms ({exact_count} results), "
+                    f"top-{settings.SEARCH_TOP_K} {top_seconds * 1000:.0f}ms (~{top_count} results)"
+                )
+
+            # nobody should see the synthetic rows
+            transaction.set_rollback(True)
+
+        self.stdout.write("Done 🥙")
+
+    def generate_rows(self, rows, words_per_row):
+        vocabulary = POPULAR_WORDS + [f"слово{i}" for i in range(len(POPULAR_WORDS), VOCABULARY_SIZE)]
+
+        with connection.cursor() as cursor:
+            # "where g > 0" makes postgres pick new words for every row instead of reusing the first text
+            cursor.execute(f"""
+                insert into {SearchIndex._meta.db_table}
+                    (id, type, created_at, updated_at, index, index_simple, index_russian)
+                with vocabulary as (
+                    select %s::text[] as words, %s::int as size
+                )
+                select
+                    {RANDOM_UUID_SQL}, %s, now() - g * interval '1 minute', now(),
+                    setweight(to_tsvector('russian', text), 'B') || setweight(to_tsvector('simple', text), 'B'),
+                    setweight(to_tsvector('simple', text), 'B'),
+                    setweight(to_tsvector('russian', text), 'B')
+                from (
+                    select g, (
+                        select string_agg(words[1 + floor(power(random(), 4) * size)::int], ' ')
+                        from generate_series(1, %s)
+                        where g > 0
+                    ) as text
+                    from generate_series(1, %s) as g, vocabulary
+                ) as synthetic
+            """, [vocabulary, len(vocabulary), SearchIndex.TYPE_POST, words_per_row, rows])
+            cursor.execute(f"analyze {SearchIndex._meta.db_table}")
+
+    def measure(self, search, query, repeat):
+        timings = []
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            count = search(query)
+            timings.append(time.perf_counter() - started_at)
+        return min(timings), count
+
+    def search_all(self, query):
+        # what search.views.search_all() does: first page and an exact count
+        results = SearchIndex.search(query).order_by("-rank")
+        list(results.values_list("id", flat=True)[:settings.SEARCH_PAGE_SIZE])
+        return results.count()
+
+    def search_top(self, query):
+        matches = SearchIndex.matching(query)
+        result_ids = SearchIndex.top(matches, query, limit=settings.SEARCH_TOP_K)
+        if len(result_ids) < settings.SEARCH_TOP_K:
+            return len(result_ids)
+        return SearchIndex.estimate_count(matches)
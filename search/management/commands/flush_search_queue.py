@@ -0,0 +1,21 @@
+from django.core.management import BaseCommand
+
+from search.queue import flush_search_queue, search_queue_stats
+
+
+class Command(BaseCommand):
+    help = "Indexes objects waiting in the search indexing queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stats", action="store_true", help="only show queue depth and lag")
+
+    def handle(self, *args, **options):
+        stats = search_queue_stats()
+        self.stdout.write(f"Queue depth: {stats['depth']}, lag: {stats['lag']:.0f}s")
+        if options["stats"]:
+            return
+
+        # normally done by a django-q task scheduled on changes, this is a safety net for lost tasks
+        indexed = flush_search_queue()
+        for index_type, count in indexed.items():
+            self.stdout.write(f"Indexed {count} {index_type}s")
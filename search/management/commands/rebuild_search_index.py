@@ -6,6 +6,7 @@ from django.db import OperationalError
 from comments.models import Comment
 from posts.models.post import Post
 from search.models import SearchIndex
+from search.rebuild import rebuild_search_index_in_bulk, REBUILD_BATCH_SIZE
 from users.models.user import User
 from utils.queryset import chunked_queryset
 
@@ -15,7 +16,20 @@ log = logging.getLogger(__name__)
 class Command(BaseCommand):
     help = "Rebuild search index for posts and users"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--bulk", action="store_true",
+            help="build a new index table in batches and swap it with the live one, search keeps working meanwhile"
+        )
+        parser.add_argument("--batch-size", type=int, default=REBUILD_BATCH_SIZE)
+
     def handle(self, *args, **options):
+        if options["bulk"]:
+            self.rebuild_in_bulk(options["batch_size"])
+        else:
+            self.rebuild_one_by_one()
+
+    def rebuild_one_by_one(self):
         SearchIndex.objects.all().delete()
         indexed_comment_count = 0
         indexed_post_count = 0
@@ -73,3 +87,17 @@ class Command(BaseCommand):
             f"Done 🥙 "
             f"Comments: {indexed_comment_count} Posts: {indexed_post_count} Users: {indexed_user_count}"
         )
+
+    def rebuild_in_bulk(self, batch_size):
+        stats = rebuild_search_index_in_bulk(batch_size=batch_size, log=self.stdout.write)
+
+        for index_type, row_count in stats["rows"].items():
+            seconds = stats["seconds"][index_type]
+            self.stdout.write(
+                f"{index_type}: {row_count} rows in {seconds:.1f}s ({row_count / (seconds or 1):.0f} rows/sec)"
+            )
+        self.stdout.write(f"Indexes built in {stats['seconds']['indexes']:.1f}s")
+
+        # the old index was searchable during the whole rebuild, only the swap makes queries wait
+        self.stdout.write(f"Downtime: 0s, tables swapped in {stats['swap_seconds'] * 1000:.0f}ms")
+        self.stdout.write("Done 🥙")
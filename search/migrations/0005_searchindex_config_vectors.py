@@ -0,0 +1,37 @@
+# Generated by Django 3.2.13 on 2026-10-18 21:18
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0004_alter_searchindex_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchindex',
+            name='index_russian',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='searchindex',
+            name='index_simple',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='searchindex',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fastupdate=False, fields=['index_simple'], name='search_inde_index_s_fb13e6_gin'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='searchindex',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fastupdate=False, fields=['index_russian'], name='search_inde_index_r_d20449_gin'
+            ),
+        ),
+    ]
@@ -1,14 +1,17 @@
+import json
 from datetime import datetime
 from uuid import uuid4
 
+from django.conf import settings
 from django.contrib.postgres.fields import ArrayField
 from django.contrib.postgres.indexes import GinIndex
 from django.contrib.postgres.search import SearchVectorField, SearchVector, SearchRank, SearchQuery
 from django.db import models
-from django.db.models import F
+from django.db.models import F, Q
 
 from comments.models import Comment
 from posts.models.post import Post
+from search.results_cache import bump_search_generation
 from users.models.user import User
 from tags.models import UserTag
 
@@ -37,11 +40,17 @@ class SearchIndex(models.Model):
 
     index = SearchVectorField(null=False, editable=False)
 
+    # the same vector split by config, so top() can match and rank each of them with its own query
+    index_simple = SearchVectorField(null=True, editable=False)
+    index_russian = SearchVectorField(null=True, editable=False)
+
     class Meta:
         db_table = "search_index"
         ordering = ["-created_at"]
         indexes = [
             GinIndex(fields=["index"], fastupdate=False),
+            GinIndex(fields=["index_simple"], fastupdate=False),
+            GinIndex(fields=["index_russian"], fastupdate=False),
         ]
 
     @classmethod
@@ -54,82 +63,99 @@ class SearchIndex(models.Model):
             .filter(index=sq_simple | sq_stemmed, rank__gte=0.1)
 
     @classmethod
-    def update_comment_index(cls, comment):
-        vector = _multi_search_vector("text", weight="B") \
-                 + _multi_search_vector("author__slug", weight="C")
+    def matching(cls, query):
+        """
+        Everything matching the query, without ranking. Filter it and pass to top() and estimate_count()
+        """
+        sq_simple = SearchQuery(query, config="simple", search_type="websearch")
+        sq_stemmed = SearchQuery(query, config="russian", search_type="websearch")
+        return SearchIndex.objects.filter(Q(index_simple=sq_simple) | Q(index_russian=sq_stemmed))
 
+    @classmethod
+    def top(cls, matches, query, ordering="-rank", limit=settings.SEARCH_TOP_K):
+        """
+        Faster search(): only the newest `limit` matches are ranked (with ts_rank_cd),
+        so popular words don't make postgres rank the whole index.
+        Returns ids in the given ordering, there are no more than `limit` of them.
+        """
+        if ordering != "-rank":
+            return list(matches.order_by(ordering).values_list("id", flat=True)[:limit])
+
+        sq_simple = SearchQuery(query, config="simple", search_type="websearch")
+        sq_stemmed = SearchQuery(query, config="russian", search_type="websearch")
+        rank_simple = SearchRank(F("index_simple"), sq_simple, cover_density=True)
+        rank_stemmed = SearchRank(F("index_russian"), sq_stemmed, cover_density=True)
+        candidates = matches.order_by("-created_at").values("id")[:limit]
+
+        return list(
+            SearchIndex.objects
+            .filter(id__in=candidates)
+            .annotate(rank=rank_simple * 2 + rank_stemmed)
+            .filter(rank__gte=0.1)
+            .order_by("-rank", "-created_at")
+            .values_list("id", flat=True)
+        )
+
+    @classmethod
+    def estimate_count(cls, matches):
+        """
+        Number of matches as postgres planner sees it, without counting them
+        """
+        plan = json.loads(matches.order_by().explain(format="json"))
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    @classmethod
+    def update_comment_index(cls, comment):
         SearchIndex.objects.update_or_create(
             comment=comment,
             defaults=dict(
                 type=SearchIndex.TYPE_COMMENT,
-                index=Comment.objects
-                .annotate(vector=vector)
-                .filter(id=comment.id)
-                .values_list("vector", flat=True)
-                .first(),
+                **search_vectors(Comment.objects.filter(id=comment.id), comment_search_vector),
                 created_at=comment.created_at,
                 updated_at=datetime.utcnow(),
             )
         )
+        bump_search_generation()
 
     @classmethod
     def update_post_index(cls, post):
-        vector = _multi_search_vector("title", weight="A") \
-                 + _multi_search_vector("text", weight="B") \
-                 + _multi_search_vector("author__slug", weight="C") \
-                 + _multi_search_vector("room__title", weight="C")
-
         if post.is_searchable:
             SearchIndex.objects.update_or_create(
                 post=post,
                 defaults=dict(
                     type=SearchIndex.TYPE_POST,
-                    index=Post.objects
-                    .annotate(vector=vector)
-                    .filter(id=post.id)
-                    .values_list("vector", flat=True)
-                    .first(),
+                    **search_vectors(Post.objects.filter(id=post.id), post_search_vector),
                     created_at=post.published_at or post.created_at,
                     updated_at=datetime.utcnow(),
                 )
             )
         else:
             SearchIndex.objects.filter(post=post).delete()
+        bump_search_generation()
 
     @classmethod
     def update_user_index(cls, user):
-        vector = _multi_search_vector("slug", weight="A") \
-                 + _multi_search_vector("full_name", weight="A") \
-                 + _multi_search_vector("email", weight="A") \
-                 + _multi_search_vector("bio", weight="B") \
-                 + _multi_search_vector("company", weight="B") \
-                 + _multi_search_vector("country", weight="C") \
-                 + _multi_search_vector("city", weight="C") \
-                 + _multi_search_vector("contact", weight="C")
-
-        user_index = User.objects\
-            .annotate(vector=vector)\
-            .filter(id=user.id)\
-            .values_list("vector", flat=True)\
-            .first()
-
-        intro_index = Post.objects.filter(author=user, type=Post.TYPE_INTRO)\
-            .annotate(vector=_multi_search_vector("text", weight="B"))\
-            .values_list("vector", flat=True)\
-            .first()
+        user_vectors = search_vectors(User.objects.filter(id=user.id), user_search_vector)
+        intro_vectors = search_vectors(
+            Post.objects.filter(author=user, type=Post.TYPE_INTRO), intro_search_vector
+        )
 
         if user.moderation_status == User.MODERATION_STATUS_APPROVED:
             SearchIndex.objects.update_or_create(
                 user=user,
                 defaults=dict(
                     type=SearchIndex.TYPE_USER,
-                    index=(user_index or "") + " " + (intro_index or ""),
+                    **{
+                        field: (user_vectors[field] or "") + " " + (intro_vectors[field] or "")
+                        for field in user_vectors
+                    },
                     created_at=user.created_at,
                     updated_at=datetime.utcnow(),
                 )
             )
         else:
             SearchIndex.objects.filter(user=user).delete()
+        bump_search_generation()
 
     @classmethod
     def update_user_tags(cls, user):
@@ -139,7 +165,58 @@ class SearchIndex(models.Model):
             )
 
 
-def _multi_search_vector(*expressions, weight=None):
+def comment_search_vector(config=None):
+    return _multi_search_vector("text", weight="B", config=config) \
+        + _multi_search_vector("author__slug", weight="C", config=config)
+
+
+def post_search_vector(config=None):
+    return _multi_search_vector("title", weight="A", config=config) \
+        + _multi_search_vector("text", weight="B", config=config) \
+        + _multi_search_vector("author__slug", weight="C", config=config) \
+        + _multi_search_vector("room__title", weight="C", config=config)
+
+
+def user_search_vector(config=None):
+    return _multi_search_vector("slug", weight="A", config=config) \
+        + _multi_search_vector("full_name", weight="A", config=config) \
+        + _multi_search_vector("email", weight="A", config=config) \
+        + _multi_search_vector("bio", weight="B", config=config) \
+        + _multi_search_vector("company", weight="B", config=config) \
+        + _multi_search_vector("country", weight="C", config=config) \
+        + _multi_search_vector("city", weight="C", config=config) \
+        + _multi_search_vector("contact", weight="C", config=config)
+
+
+def intro_search_vector(config=None):
+    # added to the user's own vector
+    return _multi_search_vector("text", weight="B", config=config)
+
+
+def search_vectors(queryset, search_vector):
+    """
+    Values of all vector fields of SearchIndex for the first object in the queryset
+    """
+    vectors = queryset\
+        .annotate(
+            vector=search_vector(),
+            vector_simple=search_vector(config="simple"),
+            vector_russian=search_vector(config="russian"),
+        )\
+        .values("vector", "vector_simple", "vector_russian")\
+        .first() or {}
+
+    return dict(
+        index=vectors.get("vector"),
+        index_simple=vectors.get("vector_simple"),
+        index_russian=vectors.get("vector_russian"),
+    )
+
+
+def _multi_search_vector(*expressions, weight=None, config=None):
+    if config:
+        return SearchVector(*expressions, weight=weight, config=config)
+
     return (
         SearchVector(*expressions, weight=weight, config="russian") +
         SearchVector(*expressions, weight=weight, config="simple")
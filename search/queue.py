@@ -0,0 +1,160 @@
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+from django_q.models import Schedule
+from django_q.tasks import schedule
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from common.locks import redis_lock
+from search.indexing import INDEX_SOURCES
+from search.models import SearchIndex
+from search.results_cache import bump_search_generation
+
+log = logging.getLogger(__name__)
+
+# Request handlers only put changed objects into the queue, flush_search_queue() computes their vectors
+# later with one statement per batch. Objects changed several times before the flush are indexed once.
+SEARCH_QUEUE_KEY = "search_queue"  # "type:id" -> time it was queued
+SEARCH_QUEUE_FLUSHING_KEY = "search_queue:flushing"
+SEARCH_QUEUE_FLUSH_SCHEDULED_KEY = "search_queue:flush_scheduled"
+SEARCH_QUEUE_FLUSH_SCHEDULED_TTL = 600  # lost flush tasks are rescheduled by the next change after that
+SEARCH_QUEUE_BATCH_SIZE = 500
+SEARCH_QUEUE_FLUSH_LOCK_KEY = "search_queue:flush_lock"
+SEARCH_QUEUE_FLUSH_LOCK_TIMEOUT = 10 * 60  # longer than any flush, frees the lock of a killed one
+
+
+def enqueue_post_index(post):
+    _enqueue(SearchIndex.TYPE_POST, post, SearchIndex.update_post_index)
+
+
+def enqueue_comment_index(comment):
+    _enqueue(SearchIndex.TYPE_COMMENT, comment, SearchIndex.update_comment_index)
+
+
+def enqueue_user_index(user):
+    # tags are indexed together with the rest of the user
+    _enqueue(SearchIndex.TYPE_USER, user, SearchIndex.update_user_index)
+
+
+def _enqueue(index_type, obj, update_now):
+    try:
+        pipeline = get_redis_connection("default").pipeline(transaction=False)
+        pipeline.zadd(SEARCH_QUEUE_KEY, {f"{index_type}:{obj.id}": time.time()}, nx=True)
+        pipeline.set(
+            SEARCH_QUEUE_FLUSH_SCHEDULED_KEY,
+            datetime.utcnow().isoformat(),
+            nx=True,
+            ex=SEARCH_QUEUE_FLUSH_SCHEDULED_TTL,
+        )
+        _, is_flush_needed = pipeline.execute()
+    except RedisError:
+        log.exception("Search queue is not available, indexing right away")
+        return update_now(obj)
+
+    if is_flush_needed:
+        # one delayed task per flush period, everything changed until then goes in the same batch
+        schedule(
+            "search.queue.flush_search_queue",
+            schedule_type=Schedule.ONCE,
+            next_run=datetime.utcnow() + settings.SEARCH_QUEUE_FLUSH_DELAY,
+        )
+
+
+def flush_search_queue(batch_size=SEARCH_QUEUE_BATCH_SIZE):
+    """
+    Indexes everything queued so far. Call it directly to have the index up to date right now (e.g. in tests).
+    Returns the number of indexed objects per type.
+    """
+    redis = get_redis_connection("default")
+    redis.delete(SEARCH_QUEUE_FLUSH_SCHEDULED_KEY)
+
+    # django-q and cron can start flushes at the same time, both would insert rows for the same new objects
+    with redis_lock(SEARCH_QUEUE_FLUSH_LOCK_KEY, SEARCH_QUEUE_FLUSH_LOCK_TIMEOUT) as is_locked:
+        if not is_locked:
+            log.info("Search queue is being flushed by somebody else")
+            return {}
+
+        return _flush_search_queue(redis, batch_size)
+
+
+def _flush_search_queue(redis, batch_size):
+    # failed flush leaves its data in the "flushing" key, retry it first and take the new queue next time
+    if not redis.exists(SEARCH_QUEUE_FLUSHING_KEY) and redis.exists(SEARCH_QUEUE_KEY):
+        redis.rename(SEARCH_QUEUE_KEY, SEARCH_QUEUE_FLUSHING_KEY)
+
+    ids_by_type = defaultdict(list)
+    for member in redis.zrange(SEARCH_QUEUE_FLUSHING_KEY, 0, -1):
+        index_type, object_id = member.decode().split(":", 1)
+        ids_by_type[index_type].append(object_id)
+
+    for index_type, object_ids in ids_by_type.items():
+        object_ids.sort()  # concurrent flushes lock rows in the same order
+        for start in range(0, len(object_ids), batch_size):
+            index_objects(index_type, object_ids[start:start + batch_size])
+
+    redis.delete(SEARCH_QUEUE_FLUSHING_KEY)
+    if ids_by_type:
+        bump_search_generation()
+
+    return {index_type: len(object_ids) for index_type, object_ids in ids_by_type.items()}
+
+
+def index_objects(index_type, object_ids):
+    """
+    Updates, inserts or deletes (if they're not searchable anymore) index rows of the objects in one statement
+    """
+    source = INDEX_SOURCES[index_type]
+    table = SearchIndex._meta.db_table
+    column = source.object_column
+    rows = source.rows().filter(id__in=object_ids).order_by()
+    select_sql, params = source.index_rows_sql(rows, updated_at=datetime.utcnow())
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"""
+            with indexed ({source.columns}) as (
+                {select_sql}
+            ),
+            deleted as (
+                delete from {table}
+                where {column} = any(%s::uuid[]) and {column} not in (select {column} from indexed)
+            ),
+            updated as (
+                update {table}
+                set tags = indexed.tags,
+                    created_at = indexed.created_at,
+                    updated_at = indexed.updated_at,
+                    index = indexed.index,
+                    index_simple = indexed.index_simple,
+                    index_russian = indexed.index_russian
+                from indexed
+                where {table}.{column} = indexed.{column}
+                returning {table}.{column}
+            )
+            insert into {table} ({source.columns})
+            select * from indexed where {column} not in (select {column} from updated)
+        """, [*params, object_ids])
+
+
+def search_queue_stats():
+    """
+    Queue depth and lag (seconds since the oldest queued change) for monitoring
+    """
+    redis = get_redis_connection("default")
+    depth = 0
+    oldest_queued_at = None
+    for key in [SEARCH_QUEUE_KEY, SEARCH_QUEUE_FLUSHING_KEY]:
+        depth += redis.zcard(key)
+        oldest = redis.zrange(key, 0, 0, withscores=True)
+        if oldest:
+            queued_at = oldest[0][1]
+            oldest_queued_at = min(oldest_queued_at or queued_at, queued_at)
+
+    return {
+        "depth": depth,
+        "lag": time.time() - oldest_queued_at if oldest_queued_at else 0,
+    }
@@ -0,0 +1,160 @@
+import re
+import time
+from datetime import datetime
+
+from django.db import connection, transaction
+
+from search.indexing import INDEX_SOURCES
+from search.models import SearchIndex
+from search.results_cache import bump_search_generation
+
+# the new index is built next to the live one and swapped with it in one short transaction,
+# search keeps working on the old data until then
+SHADOW_TABLE = "search_index_rebuild"
+SHADOW_SUFFIX = "_rebuild"
+REBUILD_BATCH_SIZE = 5000
+
+
+def rebuild_search_index_in_bulk(batch_size=REBUILD_BATCH_SIZE, log=None):
+    """
+    Rebuilds the whole search index with set-based INSERT ... SELECT batches into a shadow table
+    and swaps it with the live one. Returns stats: rows per type, seconds spent and the swap time,
+    which is the only moment search waits for the rebuild.
+    """
+    log = log or (lambda message: None)
+    table = SearchIndex._meta.db_table
+    started_at = datetime.utcnow()
+    stats = {"rows": {}, "seconds": {}}
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"drop table if exists {SHADOW_TABLE}")
+        cursor.execute(f"create table {SHADOW_TABLE} (like {table} including defaults)")
+
+    for index_type, source in INDEX_SOURCES.items():
+        type_started_at = time.perf_counter()
+        stats["rows"][index_type] = 0
+        for row_count in _insert_batches(source, batch_size, started_at):
+            stats["rows"][index_type] += row_count
+            log(f"Indexed {stats['rows'][index_type]} {index_type}s")
+        stats["seconds"][index_type] = time.perf_counter() - type_started_at
+
+    indexes_started_at = time.perf_counter()
+    constraints = _copy_indexes(table)
+    stats["seconds"]["indexes"] = time.perf_counter() - indexes_started_at
+
+    swap_started_at = time.perf_counter()
+    _swap(table, constraints, started_at)
+    stats["swap_seconds"] = time.perf_counter() - swap_started_at
+    bump_search_generation()
+
+    # foreign keys were added without checking old rows to keep the swap short, check them now without locks
+    with connection.cursor() as cursor:
+        for name, definition in constraints:
+            if definition.startswith("FOREIGN KEY"):
+                cursor.execute(f"alter table {table} validate constraint {name}")
+        cursor.execute(f"analyze {table}")
+
+    return stats
+
+
+def _insert_batches(source, batch_size, started_at):
+    last_id = None
+    while True:
+        rows = source.rows().order_by("id")
+        if last_id is not None:
+            rows = rows.filter(id__gt=last_id)
+
+        select_sql, params = source.index_rows_sql(rows[:batch_size], updated_at=started_at)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"""
+                insert into {SHADOW_TABLE} ({source.columns})
+                {select_sql}
+                returning {source.object_column}
+            """, params)
+            ids = [row[0] for row in cursor.fetchall()]
+
+        if not ids:
+            break
+
+        yield len(ids)
+        last_id = max(ids)
+
+
+def _copy_indexes(table):
+    """
+    Creates the same indexes as the live table has on the shadow one (under temporary names).
+    Returns [(name, definition)] of constraints to add later in the swap.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            select conname, pg_get_constraintdef(oid)
+            from pg_constraint
+            where conrelid = %s::regclass and contype in ('p', 'f', 'u')
+        """, [table])
+        constraints = cursor.fetchall()
+
+        cursor.execute("select indexname, indexdef from pg_indexes where tablename = %s", [table])
+        for name, definition in cursor.fetchall():
+            definition = re.sub(
+                rf"^(CREATE (UNIQUE )?INDEX) {re.escape(name)} ON (\S+\.)?{re.escape(table)} ",
+                rf"\1 {name}{SHADOW_SUFFIX} ON {SHADOW_TABLE} ",
+                definition,
+            )
+            cursor.execute(definition)
+
+    return constraints
+
+
+def _swap(table, constraints, started_at):
+    with transaction.atomic(), connection.cursor() as cursor:
+        # readers still work on the old table until the rename, writers wait for the swap
+        cursor.execute(f"lock table {table} in exclusive mode")
+
+        # objects deleted, hidden or banned while the shadow table was filled are not indexable anymore,
+        # the app has removed their live rows and nothing would remove rebuilt ones
+        for index_type, source in INDEX_SOURCES.items():
+            indexable_sql, params = source.rows().values("id").order_by().query.sql_with_params()
+            cursor.execute(f"""
+                delete from {SHADOW_TABLE} as shadow
+                where shadow.type = %s
+                    and not exists (
+                        select 1 from ({indexable_sql}) as indexable
+                        where indexable.id = shadow.{source.object_column}
+                    )
+            """, [index_type, *params])
+
+        # rows written by the app since the rebuild has started are newer than rebuilt ones
+        for object_column in ["post_id", "comment_id", "user_id"]:
+            cursor.execute(f"""
+                delete from {SHADOW_TABLE} as shadow
+                using {table} as live
+                where live.updated_at >= %s and live.{object_column} = shadow.{object_column}
+            """, [started_at])
+        cursor.execute(f"insert into {SHADOW_TABLE} select * from {table} where updated_at >= %s", [started_at])
+
+        index_names = {name for name, _ in constraints}
+        for name, definition in constraints:
+            if definition.startswith("FOREIGN KEY"):
+                cursor.execute(
+                    f"alter table {SHADOW_TABLE} add constraint {name}{SHADOW_SUFFIX} {definition} not valid"
+                )
+            else:
+                # primary and unique keys take over indexes which were already built
+                cursor.execute(
+                    f"alter table {SHADOW_TABLE} add constraint {name}{SHADOW_SUFFIX} "
+                    f"{definition.split(' (')[0]} using index {name}{SHADOW_SUFFIX}"
+                )
+
+        cursor.execute("select indexname from pg_indexes where tablename = %s", [SHADOW_TABLE])
+        shadow_indexes = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute(f"drop table {table}")
+        cursor.execute(f"alter table {SHADOW_TABLE} rename to {table}")
+
+        # original names, so migrations keep finding them
+        for name, _ in constraints:
+            cursor.execute(f"alter table {table} rename constraint {name}{SHADOW_SUFFIX} to {name}")
+        for shadow_name in shadow_indexes:
+            name = shadow_name[:-len(SHADOW_SUFFIX)]
+            if name not in index_names:
+                cursor.execute(f"alter index {shadow_name} rename to {name}")
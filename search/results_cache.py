@@ -0,0 +1,74 @@
+import hashlib
+import json
+import logging
+import re
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+log = logging.getLogger(__name__)
+
+# Results of popular queries are kept in redis and shared by all pages and visitors.
+# Every change of the index bumps the generation and makes all of them stale at once:
+# finding out which cached queries a changed object affects would cost more than searching again
+SEARCH_GENERATION_KEY = "search:generation"
+SEARCH_RESULTS_KEY = "search:results:{digest}"
+
+QUOTES_RE = re.compile(r"[«»„“”‟″]")
+SPACES_RE = re.compile(r"\s+")
+
+
+def normalize_query(query):
+    """
+    Spelling variants of the same websearch query give the same string:
+    case doesn't matter for postgres (including the "or" operator), fancy quotes are phrases too
+    """
+    query = QUOTES_RE.sub('"', query).lower()
+    return SPACES_RE.sub(" ", query).strip()
+
+
+def cached_search(query, params, search):
+    """
+    Returns search(normalized_query), cached by the query and params which change results (type, ordering, ...)
+    until the index changes. Results have to be JSON-serializable.
+    """
+    query = normalize_query(query)
+    digest = hashlib.md5(json.dumps([query, *params], ensure_ascii=False).encode("utf-8")).hexdigest()
+    key = SEARCH_RESULTS_KEY.format(digest=digest)
+
+    try:
+        redis = get_redis_connection("default")
+        generation, cached = redis.pipeline(transaction=False)\
+            .get(SEARCH_GENERATION_KEY)\
+            .get(key)\
+            .execute()
+    except RedisError:
+        log.exception("Search results cache is not available")
+        return search(query)
+
+    generation = int(generation or 0)
+    if cached:
+        cached = json.loads(cached)
+        if cached["generation"] == generation:
+            return cached["results"]
+
+    # if the index changes while we search, results are saved with the old generation and not used again
+    results = search(query)
+    try:
+        redis.set(
+            key,
+            json.dumps({"generation": generation, "results": results}),
+            ex=settings.SEARCH_RESULTS_CACHE_TIMEOUT,
+        )
+    except RedisError:
+        log.exception("Search results cache is not available")
+
+    return results
+
+
+def bump_search_generation():
+    try:
+        get_redis_connection("default").incr(SEARCH_GENERATION_KEY)
+    except RedisError:
+        log.exception("Search results cache is not available, cached results are stale until they expire")
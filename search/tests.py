@@ -1,12 +1,22 @@
 import re
 from datetime import datetime, timedelta
+from unittest import mock
 
 import django
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django_redis import get_redis_connection
 
 from posts.models.post import Post
 from search.models import SearchIndex
+from common.locks import redis_lock
+from search.queue import enqueue_post_index, flush_search_queue, search_queue_stats, SEARCH_QUEUE_KEY, \
+    SEARCH_QUEUE_FLUSHING_KEY, SEARCH_QUEUE_FLUSH_LOCK_KEY
+from search import rebuild
+from search.rebuild import rebuild_search_index_in_bulk
+from search.results_cache import bump_search_generation, normalize_query
+from search.views import SEARCH_TOP_K_READY_KEY
 
 django.setup()
 
@@ -94,3 +104,106 @@ class SearchViewsTests(TestCase):
         self.assert_search_results('"оригинальный домен"', "ничего не найдено")
         self.assert_search_results("оригинальный домен", "ничего не найдено")
         self.assert_search_results("оригинальный OR домен", "купить домен.*?оригинальный пост")
+
+    def test_exact_ranking_mode(self):
+        with override_settings(SEARCH_TOP_K=0):
+            self.test_exact_results_must_be_first()
+            self.test_advanced_syntax()
+
+    def test_top_k_ranks_only_newest_matches(self):
+        self.assert_search_results("купить", "2 результата.*?купить домен.*?Дом дурачок", not_expected_re="Примерно")
+
+        with override_settings(SEARCH_TOP_K=1):
+            # the total is estimated by the planner, its number depends on table stats
+            self.assert_search_results("купить", r"Примерно \d+.*?купить домен", not_expected_re="Дом дурачок")
+
+    def test_exact_mode_until_old_rows_are_rebuilt(self):
+        cache.delete(SEARCH_TOP_K_READY_KEY)
+        SearchIndex.objects.filter(post__title="Очень оригинальный пост").update(index_simple=None, index_russian=None)
+
+        self.assert_search_results("оригинальный", "Очень оригинальный пост")
+
+        rebuild_search_index_in_bulk()
+        self.assert_search_results("оригинальный", "Очень оригинальный пост")
+        self.assertTrue(cache.get(SEARCH_TOP_K_READY_KEY))
+
+    def test_bulk_rebuild_keeps_results(self):
+        indexed_count = SearchIndex.objects.count()
+
+        stats = rebuild_search_index_in_bulk(batch_size=2)
+
+        self.assertEqual(stats["rows"][SearchIndex.TYPE_POST], 3)
+        self.assertEqual(SearchIndex.objects.count(), indexed_count)
+        self.test_exact_results_must_be_first()
+
+    def test_bulk_rebuild_drops_objects_hidden_meanwhile(self):
+        post = Post.objects.get(title="Очень оригинальный пост")
+        copy_indexes = rebuild._copy_indexes
+
+        def hide_post_and_copy_indexes(table):
+            # the shadow table is filled already when the post is hidden
+            post.is_visible = False
+            post.save()
+            SearchIndex.update_post_index(post)
+            return copy_indexes(table)
+
+        with mock.patch("search.rebuild._copy_indexes", hide_post_and_copy_indexes):
+            rebuild_search_index_in_bulk()
+
+        self.assertFalse(SearchIndex.objects.filter(post=post).exists())
+        self.test_exact_results_must_be_first()
+
+    def test_queued_changes_are_indexed_on_flush(self):
+        get_redis_connection("default").delete(SEARCH_QUEUE_KEY, SEARCH_QUEUE_FLUSHING_KEY)
+        post = Post.objects.create(
+            type=Post.TYPE_POST,
+            slug="queued",
+            title="Квантовые пельмени",
+            author=self.new_user,
+            is_visible=True,
+        )
+
+        enqueue_post_index(post)
+        enqueue_post_index(post)
+        self.assertEqual(search_queue_stats()["depth"], 1)
+        self.assert_search_results("пельмени", "ничего не найдено")
+
+        self.assertEqual(flush_search_queue(), {SearchIndex.TYPE_POST: 1})
+        self.assert_search_results("пельмени", "Квантовые пельмени")
+
+        post.is_visible = False
+        post.save()
+        enqueue_post_index(post)
+        flush_search_queue()
+        self.assert_search_results("пельмени", "ничего не найдено")
+
+    def test_concurrent_queue_flush_is_skipped(self):
+        get_redis_connection("default").delete(SEARCH_QUEUE_KEY, SEARCH_QUEUE_FLUSHING_KEY)
+        post = Post.objects.create(
+            type=Post.TYPE_POST,
+            slug="locked",
+            title="Заблокированные пельмени",
+            author=self.new_user,
+            is_visible=True,
+        )
+        enqueue_post_index(post)
+
+        with redis_lock(SEARCH_QUEUE_FLUSH_LOCK_KEY, 60):
+            self.assertEqual(flush_search_queue(), {})
+
+        self.assertEqual(flush_search_queue(), {SearchIndex.TYPE_POST: 1})
+        self.assertEqual(SearchIndex.objects.filter(post=post).count(), 1)
+
+    def test_results_are_cached_until_index_changes(self):
+        self.assert_search_results("Оригинальный  ПОСТ", "Очень оригинальный пост")
+
+        # changes made behind the indexer's back are not seen until the generation is bumped
+        SearchIndex.objects.filter(post__title="Очень оригинальный пост").delete()
+        self.assert_search_results("оригинальный пост", "Очень оригинальный пост")
+
+        bump_search_generation()
+        self.assert_search_results("оригинальный пост", "ничего не найдено")
+
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query("  Купить\tДОМ "), "купить дом")
+        self.assertEqual(normalize_query("«купить дом» OR -домен"), '"купить дом" or -домен')
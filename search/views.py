@@ -1,13 +1,19 @@
 from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import render, redirect
 
 from authn.decorators.auth import require_auth
 from common.pagination import paginate
 from search.models import SearchIndex
+from search.results_cache import cached_search
 
 ALLOWED_TYPES = {"post", "comment", "user"}
 ALLOWED_ORDERING = {"-rank", "-created_at", "created_at"}
 
+# rows indexed before per-config vectors existed get them with the next bulk rebuild only (weekly in cron),
+# top-k search would never find them, so it waits until there are none of them left
+SEARCH_TOP_K_READY_KEY = "search:top_k_ready"
+
 
 @require_auth
 def search(request):
@@ -15,31 +21,90 @@ def search(request):
     if not query:
         return redirect("index")
 
-    # fetch query results
-    results = SearchIndex\
-        .search(query)\
-        .select_related("post", "user", "comment")
-
-    # filter them by type
     content_type = request.GET.get("type")
-    if content_type in ALLOWED_TYPES:
-        results = results.filter(type=content_type)
-    else:
+    if content_type not in ALLOWED_TYPES:
         content_type = None
 
-    # exclude all deleted comments
-    results = results.exclude(comment__isnull=False, comment__is_deleted=True)
-
-    # ordering
     ordering = request.GET.get("ordering")
     if ordering not in ALLOWED_ORDERING:
         ordering = "-rank"
 
-    results = results.order_by(ordering)
+    if settings.SEARCH_TOP_K and is_top_k_ready():
+        results, total, is_total_estimated = search_top(request, query, content_type, ordering)
+    else:
+        results, total, is_total_estimated = search_all(request, query, content_type, ordering)
 
     return render(request, "search.html", {
         "type": content_type,
         "ordering": ordering,
         "query": query,
-        "results": paginate(request, results, page_size=settings.SEARCH_PAGE_SIZE),
+        "results": results,
+        "total": total,
+        "is_total_estimated": is_total_estimated,
     })
+
+
+def is_top_k_ready():
+    if cache.get(SEARCH_TOP_K_READY_KEY):
+        return True
+
+    # fast while old rows are there, the full scan when they're gone happens once
+    is_ready = not SearchIndex.objects.filter(index_simple__isnull=True).exists()
+    if is_ready:
+        # indexers always fill all vectors, old rows can't come back
+        cache.set(SEARCH_TOP_K_READY_KEY, True, timeout=None)
+    return is_ready
+
+
+def search_all(request, query, content_type, ordering):
+    # ranks and counts every match, exact but slow for popular words
+    results = filter_results(SearchIndex.search(query), content_type)\
+        .select_related("post", "user", "comment")\
+        .order_by(ordering)
+
+    results = paginate(request, results, page_size=settings.SEARCH_PAGE_SIZE)
+    return results, results.paginator.count, False
+
+
+def search_top(request, query, content_type, ordering):
+    found = cached_search(
+        query,
+        params=[content_type, ordering, settings.SEARCH_TOP_K],
+        search=lambda normalized_query: rank_top(normalized_query, content_type, ordering),
+    )
+
+    # paginate ids and load full objects for the current page only
+    results = paginate(request, found["ids"], page_size=settings.SEARCH_PAGE_SIZE)
+    indexed = {
+        str(result.id): result for result in SearchIndex.objects
+        .select_related("post", "user", "comment")
+        .filter(id__in=results.object_list)
+    }
+    results.object_list = [indexed[result_id] for result_id in results.object_list if result_id in indexed]
+
+    return results, found["total"], found["is_total_estimated"]
+
+
+def rank_top(query, content_type, ordering):
+    matches = filter_results(SearchIndex.matching(query), content_type)
+    result_ids = SearchIndex.top(matches, query, ordering=ordering, limit=settings.SEARCH_TOP_K)
+
+    total, is_total_estimated = len(result_ids), False
+    if len(result_ids) >= settings.SEARCH_TOP_K:
+        # there's more than we've ranked, counting all of it is exactly what we try to avoid
+        total, is_total_estimated = max(SearchIndex.estimate_count(matches), len(result_ids)), True
+
+    return {
+        "ids": [str(result_id) for result_id in result_ids],
+        "total": total,
+        "is_total_estimated": is_total_estimated,
+    }
+
+
+def filter_results(results, content_type):
+    # filter them by type
+    if content_type:
+        results = results.filter(type=content_type)
+
+    # exclude all deleted comments
+    return results.exclude(comment__isnull=False, comment__is_deleted=True)
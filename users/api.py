@@ -3,6 +3,7 @@ from django.shortcuts import get_object_or_404
 
 from authn.decorators.api import api
 from club.exceptions import ApiAccessDenied
+from common.conditional import make_etag, not_modified, set_validators
 from users.models.user import User
 
 
@@ -16,9 +17,15 @@ def api_profile(request, user_slug):
     if request.me.moderation_status != User.MODERATION_STATUS_APPROVED and request.me.id != user.id:
         raise ApiAccessDenied(title="Non-approved users can only access their own profiles")
 
-    return JsonResponse({
+    # membership status depends on time, not only on saves
+    etag = make_etag(user.id, user.updated_at, user.upvotes, user.is_active_membership)
+    response = not_modified(request, etag, user.updated_at)
+    if response:
+        return response
+
+    return set_validators(JsonResponse({
         "user": user.to_dict()
-    })
+    }), etag, user.updated_at)
 
 
 @api(require_auth=True)
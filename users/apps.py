@@ -7,3 +7,7 @@ log = logging.getLogger()
 
 class UsersConfig(AppConfig):
     name = "users"
+
+    def ready(self):
+        # register signals here
+        from users.signals import update_member_directory  # NOQA
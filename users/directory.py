@@ -0,0 +1,220 @@
+import json
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import namedtuple
+from uuid import UUID
+
+from django.conf import settings
+from django.db import transaction
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from users.models.user import User
+
+log = logging.getLogger(__name__)
+
+# Autocomplete and @mentions look members up by prefixes of slugs and names all the time.
+# Every process keeps all of them in memory and patches its copy with changes published by post_save.
+# If the channel isn't available, the copy is reloaded every MEMBER_DIRECTORY_UNSUBSCRIBED_TIMEOUT instead
+MEMBER_DIRECTORY_CHANNEL = "member_directory"
+
+Member = namedtuple("Member", ["id", "slug", "full_name", "telegram_id"])
+
+NAME_TOKEN_RE = re.compile(r"\w[\w-]*")
+
+
+class MemberDirectory:
+    """
+    Members sorted by lowercase slugs and tokens of full names, prefix lookups are binary searches.
+    Published directories are never changed, changes are applied to a copy which replaces them,
+    so readers don't need any locks.
+    """
+
+    def __init__(self, members=()):
+        self.by_id = {}
+        self.by_slug = {}
+        self.slug_tokens = []  # sorted (lowercase slug, slug)
+        self.name_tokens = []  # sorted (lowercase name token, slug)
+        for member in members:
+            self.by_id[member.id] = member
+            self.by_slug[member.slug] = member
+            self.slug_tokens.append(slug_token(member))
+            self.name_tokens.extend(name_tokens(member))
+        self.slug_tokens.sort()
+        self.name_tokens.sort()
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def copy(self):
+        directory = MemberDirectory()
+        directory.by_id = dict(self.by_id)
+        directory.by_slug = dict(self.by_slug)
+        directory.slug_tokens = list(self.slug_tokens)
+        directory.name_tokens = list(self.name_tokens)
+        return directory
+
+    def autocomplete(self, prefix, limit=5):
+        """
+        Members whose slug starts with the prefix go first, then the ones with a matching word in their name
+        """
+        prefix = prefix.lower()
+        found = {}
+        for tokens in [self.slug_tokens, self.name_tokens]:
+            index = bisect_left(tokens, (prefix,))
+            while index < len(tokens) and len(found) < limit:
+                token, slug = tokens[index]
+                if not token.startswith(prefix):
+                    break
+                found.setdefault(slug, self.by_slug[slug])
+                index += 1
+        return list(found.values())
+
+    def resolve(self, slugs):
+        """
+        Returns {slug: Member} for slugs of members
+        """
+        return {slug: self.by_slug[slug] for slug in slugs if slug in self.by_slug}
+
+    def update(self, member):
+        self.remove(member.id)
+        self.by_id[member.id] = member
+        self.by_slug[member.slug] = member
+        insort(self.slug_tokens, slug_token(member))
+        for token in name_tokens(member):
+            insort(self.name_tokens, token)
+
+    def remove(self, member_id):
+        member = self.by_id.pop(member_id, None)
+        if not member:
+            return
+
+        self.by_slug.pop(member.slug, None)
+        _remove_sorted(self.slug_tokens, slug_token(member))
+        for token in name_tokens(member):
+            _remove_sorted(self.name_tokens, token)
+
+
+def slug_token(member):
+    return member.slug.lower(), member.slug
+
+
+def name_tokens(member):
+    return {(token, member.slug) for token in NAME_TOKEN_RE.findall((member.full_name or "").lower())}
+
+
+def _remove_sorted(tokens, token):
+    index = bisect_left(tokens, token)
+    if index < len(tokens) and tokens[index] == token:
+        del tokens[index]
+
+
+_directory = None
+_directory_loaded_at = 0
+_directory_lock = threading.Lock()
+_changes_while_loading = None  # list of messages while the directory is loading, None otherwise
+_listener = None
+
+
+def get_member_directory():
+    global _directory, _directory_loaded_at, _changes_while_loading
+
+    with _directory_lock:
+        timeout = settings.MEMBER_DIRECTORY_TIMEOUT if _is_subscribed() \
+            else settings.MEMBER_DIRECTORY_UNSUBSCRIBED_TIMEOUT
+        if _directory is not None and time.monotonic() - _directory_loaded_at < timeout:
+            return _directory
+
+        # subscribe before loading, changes made meanwhile are applied on top of the loaded copy
+        _subscribe()
+        _changes_while_loading = []
+
+    directory = MemberDirectory(
+        Member(*row) for row in User.registered_members()
+        .order_by()
+        .values_list("id", "slug", "full_name", "telegram_id")
+    )
+
+    with _directory_lock:
+        for message in _changes_while_loading or []:
+            _apply_change(directory, message)
+        _changes_while_loading = None
+        _directory = directory
+        _directory_loaded_at = time.monotonic()
+        return _directory
+
+
+def resolve_mentions(slugs):
+    """
+    Returns {slug: Member} for @mentioned slugs. Members come from the directory,
+    other users (not approved yet, for example) are looked up in DB all at once
+    """
+    slugs = set(slugs)
+    found = get_member_directory().resolve(slugs)
+
+    missing_slugs = slugs - set(found)
+    if missing_slugs:
+        for row in User.objects.filter(slug__in=missing_slugs).values_list("id", "slug", "full_name", "telegram_id"):
+            found[row[1]] = Member(*row)
+
+    return found
+
+
+def publish_member_change(user, is_deleted=False):
+    """
+    Sends new slug, name and telegram of the user (or their removal from members) to all processes
+    """
+    if user.moderation_status == User.MODERATION_STATUS_APPROVED and not is_deleted:
+        message = {"id": str(user.id), "member": [user.slug, user.full_name, user.telegram_id]}
+    else:
+        message = {"id": str(user.id), "member": None}
+
+    def publish():
+        try:
+            get_redis_connection("default").publish(MEMBER_DIRECTORY_CHANNEL, json.dumps(message))
+        except RedisError:
+            log.exception("Member directory channel is not available, other processes will see the change later")
+
+    # nobody should see a change which can still be rolled back
+    transaction.on_commit(publish)
+
+
+def _is_subscribed():
+    return bool(_listener and _listener.is_alive())
+
+
+def _subscribe():
+    global _listener
+    if _is_subscribed():
+        return
+
+    try:
+        pubsub = get_redis_connection("default").pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{MEMBER_DIRECTORY_CHANNEL: _on_member_change})
+        _listener = pubsub.run_in_thread(sleep_time=1, daemon=True)
+    except RedisError:
+        log.exception("Member directory channel is not available, changes will be seen after reloads only")
+
+
+def _on_member_change(message):
+    global _directory
+    message = json.loads(message["data"])
+    with _directory_lock:
+        if _changes_while_loading is not None:
+            _changes_while_loading.append(message)
+        if _directory is not None:
+            # readers may be looking through the current one right now
+            changed_directory = _directory.copy()
+            _apply_change(changed_directory, message)
+            _directory = changed_directory
+
+
+def _apply_change(directory, message):
+    member_id = UUID(message["id"])
+    if message["member"]:
+        directory.update(Member(member_id, *message["member"]))
+    else:
+        directory.remove(member_id)
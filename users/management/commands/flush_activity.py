@@ -0,0 +1,12 @@
+from django.core.management import BaseCommand
+
+from common.activity import flush_activity
+
+
+class Command(BaseCommand):
+    help = "Writes buffered last activity of users and rooms from Redis to the database"
+
+    def handle(self, *args, **options):
+        flushed = flush_activity()
+        for table, count in flushed.items():
+            self.stdout.write(f"Flushed last activity of {count} {table}")
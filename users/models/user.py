@@ -4,11 +4,12 @@ from uuid import uuid4
 from django.conf import settings
 from django.contrib.postgres.fields import ArrayField
 from django.db import models
-from django.db.models import F
 from django.urls import reverse
 
 from users.models.geo import Geo
+from common.activity import track_activity
 from common.models import ModelDiffMixin
+from common.vote_counters import increment_upvotes, decrement_upvotes
 from utils.slug import generate_unique_slug
 from utils.strings import random_string
 
@@ -171,7 +172,9 @@ class User(models.Model, ModelDiffMixin):
     def update_last_activity(self):
         now = datetime.utcnow()
         if self.last_activity_at < now - timedelta(minutes=5):
-            return User.objects.filter(id=self.id).update(last_activity_at=now)
+            # written to DB in bulk by flush_activity
+            self.last_activity_at = now
+            track_activity(self, now)
 
     def membership_days_left(self):
         return (self.membership_expires_at - datetime.utcnow()).total_seconds() // 60 // 60 / 24
@@ -180,10 +183,10 @@ class User(models.Model, ModelDiffMixin):
         return (datetime.utcnow() - self.created_at).days
 
     def increment_vote_count(self):
-        return User.objects.filter(id=self.id).update(upvotes=F("upvotes") + 1)
+        return increment_upvotes(User, [self.id])
 
     def decrement_vote_count(self):
-        return User.objects.filter(id=self.id).update(upvotes=F("upvotes") - 1)
+        return decrement_upvotes(User, [self.id])
 
     def get_avatar(self):
         return self.avatar or settings.DEFAULT_AVATAR
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from users.directory import publish_member_change
+from users.models.user import User
+
+
+@receiver(post_save, sender=User)
+def update_member_directory(sender, instance, **kwargs):
+    # moderation, renames and telegram connections, all processes patch their member directories
+    publish_member_change(instance)
+
+
+@receiver(post_delete, sender=User)
+def remove_from_member_directory(sender, instance, **kwargs):
+    publish_member_change(instance, is_deleted=True)
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import django
+from django.test import TestCase
+from django_redis import get_redis_connection
+
+django.setup()  # todo: how to run tests from PyCharm without this workaround?
+
+from common.activity import track_activity, flush_activity, LAST_ACTIVITY_KEY, LAST_ACTIVITY_FLUSHING_KEY
+from users.directory import Member, MemberDirectory, resolve_mentions
+from users.models.user import User
+
+
+class MemberDirectoryTests(TestCase):
+    def setUp(self):
+        self.vas3k = Member(uuid4(), "vas3k", "Вастрик Вастриков", "1")
+        self.vasya = Member(uuid4(), "vasya", "Василий Пупкин", None)
+        self.petr = Member(uuid4(), "petr", "Пётр Вастриков", "3")
+        self.directory = MemberDirectory([self.vas3k, self.vasya, self.petr])
+
+    def test_autocomplete_slugs_and_names(self):
+        self.assertEqual(self.directory.autocomplete("vas"), [self.vas3k, self.vasya])
+        self.assertEqual(self.directory.autocomplete("VAS", limit=1), [self.vas3k])
+        self.assertEqual(self.directory.autocomplete("пупк"), [self.vasya])
+        self.assertEqual(set(self.directory.autocomplete("вастр")), {self.vas3k, self.petr})
+        self.assertEqual(self.directory.autocomplete("nobody"), [])
+
+    def test_slug_matches_go_before_name_matches(self):
+        vasiliy = Member(uuid4(), "zed", "Vasiliy Zed", None)
+        self.directory.update(vasiliy)
+
+        self.assertEqual(self.directory.autocomplete("vas"), [self.vas3k, self.vasya, vasiliy])
+
+    def test_copies_dont_change_the_original(self):
+        directory = self.directory.copy()
+        directory.remove(self.vas3k.id)
+
+        self.assertEqual(directory.autocomplete("vas"), [self.vasya])
+        self.assertEqual(self.directory.autocomplete("vas"), [self.vas3k, self.vasya])
+
+    def test_updates_and_removals(self):
+        renamed = self.vasya._replace(slug="pupkin")
+        self.directory.update(renamed)
+        self.assertEqual(self.directory.autocomplete("vas"), [self.vas3k])
+        self.assertEqual(self.directory.autocomplete("pup"), [renamed])
+
+        self.directory.remove(self.vas3k.id)
+        self.assertEqual(self.directory.autocomplete("вастр"), [self.petr])
+        self.assertEqual(len(self.directory), 2)
+        self.assertEqual(self.directory.resolve(["vas3k", "petr"]), {"petr": self.petr})
+
+    def test_mentions_of_non_members_are_resolved_from_db(self):
+        user = User.objects.create(
+            email="mentioned@xx.com",
+            slug="mentioned",
+            full_name="Упомянутый",
+            telegram_id="42",
+            moderation_status=User.MODERATION_STATUS_ON_REVIEW,
+            membership_started_at=datetime.utcnow() - timedelta(days=5),
+            membership_expires_at=datetime.utcnow() + timedelta(days=5),
+        )
+
+        mentioned = resolve_mentions(["mentioned", "mentioned", "unknown_slug"])
+
+        self.assertEqual(list(mentioned), ["mentioned"])
+        self.assertEqual(mentioned["mentioned"].id, user.id)
+        self.assertEqual(mentioned["mentioned"].telegram_id, "42")
+
+
+class LastActivityTests(TestCase):
+    def setUp(self):
+        self.last_activity_at = datetime.utcnow() - timedelta(days=1)
+        self.user = User.objects.create(
+            email="active@xx.com",
+            slug="active",
+            membership_started_at=datetime.utcnow() - timedelta(days=5),
+            membership_expires_at=datetime.utcnow() + timedelta(days=5),
+        )
+        # last_activity_at is auto_now, only update() can put it in the past
+        User.objects.filter(id=self.user.id).update(last_activity_at=self.last_activity_at)
+
+        self.redis = get_redis_connection("default")
+        table = User._meta.db_table
+        self.redis.delete(LAST_ACTIVITY_KEY.format(table=table), LAST_ACTIVITY_FLUSHING_KEY.format(table=table))
+
+    def test_activity_is_buffered_until_flush(self):
+        now = datetime.utcnow()
+        track_activity(self.user, now)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_activity_at, self.last_activity_at)
+
+        self.assertEqual(flush_activity()[User._meta.db_table], 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_activity_at, now)
+
+        # the buffer is empty after the flush
+        self.assertEqual(flush_activity()[User._meta.db_table], 0)
+
+    def test_flush_never_moves_activity_back(self):
+        now = datetime.utcnow()
+        User.objects.filter(id=self.user.id).update(last_activity_at=now)
+
+        track_activity(self.user, now - timedelta(hours=1))
+        flush_activity()
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_activity_at, now)
@@ -9,6 +9,8 @@ from django.shortcuts import render
 from authn.decorators.auth import require_auth
 from common.models import group_by, top
 from common.pagination import paginate
+from search.models import SearchIndex
+from search.results_cache import cached_search
 from tags.models import Tag
 from users.models.user import User
 
@@ -21,12 +23,7 @@ def people(request):
 
     query = request.GET.get("query")
     if query:
-        users = users.filter(
-            index__index=(
-                SearchQuery(query, config="simple", search_type="websearch") |
-                SearchQuery(query, config="russian", search_type="websearch")
-            )
-        )
+        users = users.filter(id__in=cached_search(query, params=["people"], search=search_people))
 
     tags = request.GET.getlist("tags")
     if tags:
@@ -104,3 +101,18 @@ def people(request):
         "active_countries": active_countries,
         "map_stat_groups": map_stat_groups,
     })
+
+
+def search_people(query):
+    return [
+        str(user_id) for user_id in SearchIndex.objects
+        .filter(
+            type=SearchIndex.TYPE_USER,
+            user__isnull=False,
+            index=(
+                SearchQuery(query, config="simple", search_type="websearch") |
+                SearchQuery(query, config="russian", search_type="websearch")
+            ),
+        )
+        .values_list("user_id", flat=True)
+    ]
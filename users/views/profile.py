@@ -8,9 +8,11 @@ from authn.helpers import check_user_permissions
 from badges.models import UserBadge
 from comments.models import Comment
 from common.pagination import paginate
+from common.vote_counters import merge_pending_upvotes
 from authn.decorators.api import api
+from posts.helpers import load_viewer_state
 from posts.models.post import Post
-from search.models import SearchIndex
+from search.queue import enqueue_user_index
 from users.models.achievements import UserAchievement
 from users.models.friends import Friend
 from users.models.mute import Muted
@@ -60,7 +62,7 @@ def profile(request, user_slug):
     projects = Post.objects.filter(author=user, type=Post.TYPE_PROJECT, is_visible=True).all()
     badges = UserBadge.user_badges_grouped(user=user)
     achievements = UserAchievement.objects.filter(user=user).select_related("achievement")
-    posts = Post.objects_for_user(request.me).filter(is_visible=True)\
+    posts = Post.visible_objects()\
         .filter(Q(author=user) | Q(coauthors__contains=[user.slug]))\
         .exclude(type__in=[Post.TYPE_INTRO, Post.TYPE_PROJECT, Post.TYPE_WEEKLY_DIGEST])\
         .order_by("-published_at")
@@ -86,6 +88,8 @@ def profile(request, user_slug):
             .select_related("user_from")\
             .all()
 
+    merge_pending_upvotes([user])
+
     return render(request, "users/profile.html", {
         "user": user,
         "intro": intro,
@@ -97,7 +101,7 @@ def profile(request, user_slug):
         "achievements": [ua.achievement for ua in achievements],
         "comments": comments[:3] if comments else [],
         "comments_total": comments.count() if comments else 0,
-        "posts": posts[:15],
+        "posts": load_viewer_state(posts[:15], request.me),
         "posts_total": posts.count() if posts else 0,
         "similarity": similarity,
         "friend": friend,
@@ -134,15 +138,14 @@ def profile_posts(request, user_slug):
     if not user.can_view(request.me):
         return render(request, "auth/private_profile.html")
 
-    posts = Post.objects_for_user(request.me) \
-        .filter(is_visible=True) \
+    posts = Post.visible_objects() \
         .filter(Q(author=user) | Q(coauthors__contains=[user.slug])) \
         .exclude(type__in=[Post.TYPE_INTRO, Post.TYPE_PROJECT, Post.TYPE_WEEKLY_DIGEST]) \
         .order_by("-published_at")
 
     return render(request, "users/profile/posts.html", {
         "user": user,
-        "posts": paginate(request, posts, settings.PROFILE_POSTS_PAGE_SIZE),
+        "posts": load_viewer_state(paginate(request, posts, settings.PROFILE_POSTS_PAGE_SIZE), request.me),
     })
 
 
@@ -177,7 +180,7 @@ def toggle_tag(request, tag_code):
     if not is_created:
         user_tag.delete()
 
-    SearchIndex.update_user_tags(request.me)
+    enqueue_user_index(request.me)
 
     return {
         "status": "created" if is_created else "deleted",
@@ -9,7 +9,7 @@ from django_q.tasks import async_task
 from authn.decorators.auth import require_auth
 from gdpr.archive import generate_data_archive
 from gdpr.models import DataRequests
-from search.models import SearchIndex
+from search.queue import enqueue_user_index
 from users.forms.profile import ProfileEditForm, NotificationsEditForm
 from users.models.geo import Geo
 from users.models.user import User
@@ -43,7 +43,7 @@ def edit_profile(request, user_slug):
             user = form.save(commit=False)
             user.save()
 
-            SearchIndex.update_user_index(user)
+            enqueue_user_index(user)
             Geo.update_for_user(user, fuzzy=True)
     else:
         form = ProfileEditForm(instance=user)